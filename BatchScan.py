@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+'''Multi-core batch DVB-T scanner for directories of XDAT/XHDR recordings.
+
+    Walks a directory tree, scans every recording (XDAT with a matching XHDR) on a process pool and writes
+    one CSV row per recording with the detected mode, cyclic prefix, time and frequency offsets and the time
+    every stage took. Workers get only the file names - each one memory maps its recording (Record.XdatReader),
+    so samples are never pickled between processes.
+
+    Rows are flushed as soon as a recording is done, and recordings already in the output file are skipped,
+    so a crashed or stopped scan continues from where it stopped when run again:
+
+        python BatchScan.py D:\\Records --output scan.csv --workers 8 --duration 0.05
+'''
+import os
+# One BLAS/FFT thread per worker - the pool scales over the cores, not the libraries
+for thread_env in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(thread_env, '1')
+
+import argparse
+import csv
+import multiprocessing
+import sys
+import time
+
+RESULT_FIELDS = ['xdat_path', 'fs', 'bw', 'fc', 'num_samples', 'is_DVBT', 'mode', 'cyclic_prefix',
+                 'time_shift', 'freq_shift', 'read_time', 'resample_time', 'detect_time', 'total_time', 'error']
+
+
+def findRecordings(root_dir):
+    '''Returns the sorted paths of all the XDAT files under root_dir that have a matching XHDR file'''
+    recordings = []
+    for (dir_path, dir_names, file_names) in os.walk(root_dir):
+        for file_name in file_names:
+            (name, ext) = os.path.splitext(file_name)
+            if (ext.lower() == '.xdat' and os.path.isfile(os.path.join(dir_path, name + '.xhdr'))):
+                recordings.append(os.path.join(dir_path, file_name))
+    return sorted(recordings)
+
+
+def truncatePartialRow(output_filename):
+    '''Cuts the output file after its last complete line - a scan killed while writing a row leaves a partial
+        row, which would otherwise stay in the file (and could count its recording as scanned)'''
+    if not os.path.isfile(output_filename):
+        return
+    with open(output_filename, 'rb+') as results_file:
+        end = results_file.seek(0, os.SEEK_END)
+        while (end > 0):
+            start = max(end - 4096, 0)
+            results_file.seek(start)
+            last_newline = results_file.read(end - start).rfind(b'\n')
+            if (last_newline >= 0):
+                end = start + last_newline + 1
+                break
+            end = start
+        results_file.truncate(end)
+
+
+def readScannedRecordings(output_filename):
+    '''Returns the set of recordings that already have a complete row in the output file'''
+    if not os.path.isfile(output_filename):
+        return set()
+    with open(output_filename, newline='') as results_file:
+        return {row['xdat_path'] for row in csv.DictReader(results_file)
+                if row.get('xdat_path') and row.get('error') is not None}
+
+
+def scanRecording(xdat_path, duration=0.05):
+    '''Scans the first duration seconds of a recording - returns its result row (a dict of RESULT_FIELDS)'''
+    from dvbt_decoder import MyDVBT, Record
+
+    row = dict.fromkeys(RESULT_FIELDS, '')
+    row['xdat_path'] = xdat_path
+    start_time = time.perf_counter()
+    try:
+        (fs, N, bw, fc) = MyDVBT.extractParamsFromXhdr('', os.path.splitext(xdat_path)[0] + '.xhdr')
+        reader = Record.XdatReader(xdat_path)
+        count = None if duration is None else int(duration*fs)
+        iq_data = reader.read(0, count)
+        read_done_time = time.perf_counter()
+
+        (resampled_signal, fs_new, N_new) = MyDVBT.filterAndResampleToDVBT(iq_data, fs, bw)
+        resample_done_time = time.perf_counter()
+
+        (is_DVBT, mode, cyclic_prefix, time_shift, freq_shift) = MyDVBT.findDVBTSignal(resampled_signal, N_new)
+        detect_done_time = time.perf_counter()
+
+        row.update(fs=fs, bw=bw, fc=fc, num_samples=len(reader), is_DVBT=int(bool(is_DVBT)),
+                   mode=mode, cyclic_prefix=cyclic_prefix, time_shift=time_shift, freq_shift=freq_shift,
+                   read_time='{:.4f}'.format(read_done_time - start_time),
+                   resample_time='{:.4f}'.format(resample_done_time - read_done_time),
+                   detect_time='{:.4f}'.format(detect_done_time - resample_done_time))
+    except Exception as error:
+        row['error'] = '{}: {}'.format(type(error).__name__, error).replace('\n', ' ')
+    row['total_time'] = '{:.4f}'.format(time.perf_counter() - start_time)
+    return row
+
+
+def _scanRecordingTask(task):
+    return scanRecording(*task)
+
+
+def scanDirectory(root_dir, output_filename, num_workers=None, duration=0.05, verbose=True):
+    '''Scans all the recordings under root_dir that are not in output_filename yet, appending their rows.
+        Returns the number of recordings scanned.'''
+    recordings = findRecordings(root_dir)
+    truncatePartialRow(output_filename)
+    scanned = readScannedRecordings(output_filename)
+    pending = [xdat_path for xdat_path in recordings if xdat_path not in scanned]
+    if verbose:
+        print('{} recordings, {} already scanned, {} to scan'.format(len(recordings), len(recordings) - len(pending), len(pending)))
+    if not pending:
+        return 0
+
+    write_header = not os.path.isfile(output_filename) or os.path.getsize(output_filename) == 0
+    with open(output_filename, 'a', newline='') as results_file:
+        writer = csv.DictWriter(results_file, RESULT_FIELDS)
+        if write_header:
+            writer.writeheader()
+        with multiprocessing.Pool(num_workers) as pool:
+            tasks = [(xdat_path, duration) for xdat_path in pending]
+            for (i, row) in enumerate(pool.imap_unordered(_scanRecordingTask, tasks), 1):
+                writer.writerow(row)
+                results_file.flush()
+                os.fsync(results_file.fileno())
+                if verbose:
+                    status = row['error'] or ('DVB-T {}k 1/{}'.format(row['mode'], row['cyclic_prefix']) if row['is_DVBT'] else 'no DVB-T')
+                    print('[{}/{}] {} - {} ({} s)'.format(i, len(pending), row['xdat_path'], status, row['total_time']))
+    return len(pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scan a directory tree of XDAT/XHDR recordings for DVB-T signals')
+    parser.add_argument('root_dir', help='directory to scan (recursively)')
+    parser.add_argument('--output', default='dvbt_scan.csv', help='CSV results file, appended to and used to resume (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: number of cores)')
+    parser.add_argument('--duration', type=float, default=0.05, help='seconds of every recording to scan, 0 for all of it (default: %(default)s)')
+    parser.add_argument('--quiet', action='store_true', help='do not print progress')
+    args = parser.parse_args(argv)
+
+    scanDirectory(args.root_dir, args.output, args.workers, args.duration or None, not args.quiet)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
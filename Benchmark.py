@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+'''Benchmarks of the detection and demodulation hot paths of MyDVBT.
+
+    Every benchmark runs on deterministic synthetic captures (DVBTSynthesizer, seeded per mode and cyclic
+    prefix) for all 8 (mode, cyclic prefix) combinations and for every input size, so runs on the same machine
+    are comparable. Each run is appended to a JSON lines history file and compared with the previous run in it,
+    so every optimization shows its speedup against the last baseline:
+
+        python Benchmark.py --sizes 65536 262144 1048576 --snr 10 --cfo 12000 --time-offset 777
+        python Benchmark.py --filter isAnyDVBTSignal --repeat 10 --no-save
+
+    The first (warm up) call of every benchmark is not timed, so the cached filter designs, pilot tables and
+    unique words are built before the timing. tests/test_Benchmark.py runs every benchmark once on a short capture,
+    so a change of the benchmarked functions that breaks the script fails the test suite.
+'''
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import scipy.signal as sig
+from dvbt_decoder import DVBTSynthesizer, MyDVBT
+
+MODES_AND_CYCLIC_PREFIXES = [(mode, cyclic_prefix) for mode in (2, 8) for cyclic_prefix in (4, 8, 16, 32)]
+DEFAULT_SIZES = (2**16, 2**18, 2**20)
+# Sample rate and bandwidth of the captures of the resampling benchmarks (makeResampledCapture)
+CAPTURE_FS = 20e6
+CAPTURE_BW = 20e6
+
+_captures = {}
+
+def makeCapture(mode, cyclic_prefix, num_samples, snr_db=None, freq_offset=0, time_offset=0, seed=0):
+    '''Returns a deterministic complex64 DVB-T capture at 64/7 MHz of num_samples samples (cached) - the same
+        arguments always give the same samples'''
+    key = (mode, cyclic_prefix, num_samples, snr_db, freq_offset, time_offset, seed)
+    if key not in _captures:
+        (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+        superframe_len = DVBTSynthesizer.FRAMES_PER_SUPERFRAME*DVBTSynthesizer.SYMBOLS_PER_FRAME*(FFT_len + CP_len)
+        num_superframes = -(-(num_samples + time_offset) // superframe_len)
+        (signal, fs) = DVBTSynthesizer.synthesizeDVBTSignal(mode, cyclic_prefix, num_superframes, snr_db=snr_db, freq_offset=freq_offset,
+                                                            time_offset=time_offset, seed=seed*100 + mode*10 + cyclic_prefix)
+        capture = signal[:num_samples]
+        capture.setflags(write=False)
+        _captures[key] = capture
+    return _captures[key]
+
+
+def makeResampledCapture(mode, cyclic_prefix, num_samples, snr_db=None, freq_offset=0, time_offset=0, seed=0):
+    '''Returns the capture of makeCapture resampled to CAPTURE_FS (20 MHz = 64/7 MHz * 35/16), num_samples
+        samples (cached)'''
+    key = ('resampled', mode, cyclic_prefix, num_samples, snr_db, freq_offset, time_offset, seed)
+    if key not in _captures:
+        num_dvbt_samples = -(-num_samples*16 // 35) + 64
+        dvbt_capture = makeCapture(mode, cyclic_prefix, num_dvbt_samples, snr_db, freq_offset, time_offset, seed)
+        capture = sig.resample_poly(dvbt_capture, 35, 16)[:num_samples].astype(np.complex64)
+        capture.setflags(write=False)
+        _captures[key] = capture
+    return _captures[key]
+
+
+def timeFunction(function, repeat):
+    '''Returns the run times of repeat calls of function, after a warm up call'''
+    function()
+    run_times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        run_times.append(time.perf_counter() - start)
+    return run_times
+
+
+def createBenchmarks(sizes, snr_db=None, freq_offset=0, time_offset=0, seed=0):
+    '''Yields (name, mode, cyclic_prefix, num_samples, function, check) of every benchmark - check returns an
+        error message (None when the result is right) for the benchmarks whose result can be checked'''
+    for mode in (2, 8):
+        K = MyDVBT.DVBTModeParams(mode, 4)[1]
+        yield ('createPRBS', mode, None, K, lambda K=K: MyDVBT.createPRBS(K), None)
+
+    for num_samples in sizes:
+        capture = makeCapture(8, 4, num_samples, snr_db, freq_offset, time_offset, seed)
+        fs = int(DVBTSynthesizer.DVBT_FS)
+        yield ('lowPassFilterDVBT', None, None, num_samples, lambda capture=capture: MyDVBT.lowPassFilterDVBT(capture, fs), None)
+        resampling_capture = makeResampledCapture(8, 4, num_samples, snr_db, freq_offset, time_offset, seed)
+        yield ('filterAndResampleToDVBT', None, None, num_samples,
+               lambda capture=resampling_capture: MyDVBT.filterAndResampleToDVBT(capture, CAPTURE_FS, CAPTURE_BW), None)
+
+    for (mode, cyclic_prefix) in MODES_AND_CYCLIC_PREFIXES:
+        (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+        symbol_len_with_cp = FFT_len + CP_len
+
+        capture = makeCapture(mode, cyclic_prefix, 4*symbol_len_with_cp, snr_db, freq_offset, time_offset, seed)
+        unique_word = MyDVBT.getContinuousPilotsUniqueWord(FFT_len, K, CP_len)[0]
+        yield ('checkDVBTSymbolTimeCorrelation', mode, cyclic_prefix, len(capture),
+               lambda capture=capture, unique_word=unique_word, FFT_len=FFT_len, CP_len=CP_len:
+                   MyDVBT.checkDVBTSymbolTimeCorrelation(capture, unique_word, FFT_len, CP_len, 4), None)
+
+        for num_samples in sizes:
+            capture = makeCapture(mode, cyclic_prefix, num_samples, snr_db, freq_offset, time_offset, seed)
+            if (num_samples >= 2*max(4*symbol_len_with_cp, 40960)):
+                def checkDetection(result, mode=mode, cyclic_prefix=cyclic_prefix):
+                    if (tuple(result[:3]) != (True, mode, cyclic_prefix)):
+                        return 'detected {}'.format(tuple(result[:3]))
+                    return None
+                yield ('isAnyDVBTSignal', mode, cyclic_prefix, num_samples,
+                       lambda capture=capture: MyDVBT.isAnyDVBTSignal(capture, DVBTSynthesizer.DVBT_FS, 8e6, len(capture)), checkDetection)
+
+            # The synthetic captures start at a symbol after time_offset samples
+            symbols_signal = capture[time_offset % len(capture):]
+            symbols_signal = symbols_signal[:len(symbols_signal)//symbol_len_with_cp*symbol_len_with_cp]
+            if (len(symbols_signal) == 0):
+                continue
+            carriers = MyDVBT.getFreqDomOFDMSymbolsFromTimeDom(FFT_len, K, CP_len, symbols_signal)
+            yield ('getFreqDomOFDMSymbolsFromTimeDom', mode, cyclic_prefix, len(symbols_signal),
+                   lambda symbols_signal=symbols_signal, FFT_len=FFT_len, K=K, CP_len=CP_len:
+                       MyDVBT.getFreqDomOFDMSymbolsFromTimeDom(FFT_len, K, CP_len, symbols_signal), None)
+            yield ('removeChannelResponse', mode, cyclic_prefix, len(symbols_signal),
+                   lambda carriers=carriers, FFT_len=FFT_len, CP_len=CP_len: MyDVBT.removeChannelResponse(FFT_len, CP_len, carriers), None)
+
+
+def runBenchmarks(sizes=DEFAULT_SIZES, repeat=5, name_filter=None, snr_db=None, freq_offset=0, time_offset=0, seed=0, verbose=True):
+    '''Runs the benchmarks (those with name_filter in their name) - returns a list of result dicts'''
+    results = []
+    for (name, mode, cyclic_prefix, num_samples, function, check) in createBenchmarks(sizes, snr_db, freq_offset, time_offset, seed):
+        if (name_filter is not None and name_filter not in name):
+            continue
+        error = None
+        if (check is not None):
+            error = check(function())
+        run_times = timeFunction(function, repeat)
+        result = {'name': name, 'mode': mode, 'cyclic_prefix': cyclic_prefix, 'num_samples': int(num_samples),
+                  'min_time': min(run_times), 'median_time': float(np.median(run_times)),
+                  'msps': num_samples/min(run_times)/1e6, 'error': error}
+        results.append(result)
+        if verbose:
+            print(formatResult(result), flush=True)
+    return results
+
+
+def resultKey(result):
+    return (result['name'], result['mode'], result['cyclic_prefix'], result['num_samples'])
+
+
+def formatResult(result, baseline=None):
+    line = '{:<34} {:>4} {:>4} {:>9} {:>10.3f} ms {:>9.2f} MS/s'.format(result['name'], result['mode'] or '-', result['cyclic_prefix'] or '-',
+                                                                      result['num_samples'], result['min_time']*1e3, result['msps'])
+    if (baseline is not None):
+        line += '  x{:.2f}'.format(baseline['min_time']/result['min_time'])
+    if result['error']:
+        line += '  ERROR: ' + result['error']
+    return line
+
+
+def getGitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def readHistory(history_filename):
+    '''Returns the runs saved in the history file (oldest first)'''
+    if not os.path.isfile(history_filename):
+        return []
+    with open(history_filename) as history_file:
+        return [json.loads(line) for line in history_file if line.strip()]
+
+
+def saveRun(history_filename, config, results):
+    run = {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': getGitCommit(),
+           'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.platform(),
+           'config': config, 'results': results}
+    with open(history_filename, 'a') as history_file:
+        history_file.write(json.dumps(run) + '\n')
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the DVB-T detection and demodulation hot paths on synthetic captures')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='input sizes in samples (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls of every benchmark (default: %(default)s)')
+    parser.add_argument('--filter', default=None, help='run only the benchmarks whose name contains this')
+    parser.add_argument('--snr', type=float, default=None, help='SNR of the captures in dB (default: no noise)')
+    parser.add_argument('--cfo', type=float, default=0, help='carrier frequency offset of the captures in Hz (default: %(default)s)')
+    parser.add_argument('--time-offset', type=int, default=0, help='noise samples before the first symbol (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the captures (default: %(default)s)')
+    parser.add_argument('--history', default='benchmark_history.jsonl', help='JSON lines file the runs are appended to (default: %(default)s)')
+    parser.add_argument('--no-save', action='store_true', help='do not append this run to the history file')
+    args = parser.parse_args(argv)
+
+    config = {'sizes': args.sizes, 'repeat': args.repeat, 'filter': args.filter, 'snr_db': args.snr, 'freq_offset': args.cfo,
+              'time_offset': args.time_offset, 'seed': args.seed}
+    history = readHistory(args.history)
+    baseline_run = next((run for run in reversed(history) if run['config'] == config), None)
+
+    results = runBenchmarks(args.sizes, args.repeat, args.filter, args.snr, args.cfo, args.time_offset, args.seed)
+
+    if (baseline_run is not None):
+        baseline = {resultKey(result): result for result in baseline_run['results']}
+        print('\nCompared with the run of {} (commit {}):'.format(baseline_run['timestamp'], baseline_run['commit']))
+        for result in results:
+            print(formatResult(result, baseline.get(resultKey(result))))
+    if not args.no_save:
+        saveRun(args.history, config, results)
+
+    return 1 if any(result['error'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
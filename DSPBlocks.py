@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+'''DSPBlocks moved to dvbt_decoder.DSPBlocks - importing DSPBlocks gives that module (the same module object)'''
+import sys
+from dvbt_decoder import DSPBlocks
+
+sys.modules[__name__] = DSPBlocks
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+'''DVBTDecoder moved to dvbt_decoder.DVBTDecoder - importing DVBTDecoder gives that module (the same module object)'''
+import sys
+from dvbt_decoder import DVBTDecoder
+
+sys.modules[__name__] = DVBTDecoder
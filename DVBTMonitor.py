@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+'''Continuous DVB-T channel monitor for a live complex64 IQ stream.
+
+    Reads interleaved float32 I,Q samples (GNU Radio's complex / cfile format) from stdin, a FIFO, a file or a
+    UDP socket, and runs detection, synchronization and equalization incrementally on every block. One JSON line
+    of status is written per OFDM frame (68 symbols), as soon as the frame's last symbol has arrived:
+
+        {"time": 1.523, "lock": "locked", "mode": 8, "cyclic_prefix": 4, "cfo_hz": 1203.4, "sco_ppm": 2.1,
+         "mer_db": 24.8, "pilot_snr_db": 27.3, "frame_index": 2, "constellation": "16QAM", "code_rate": "2/3", ...}
+
+    lock is "searching" (no DVB-T signal found yet), "sync" (symbols tracked, the TPS not decoded yet) or
+    "locked" (frames aligned on their TPS). An acquisition whose first symbols show no continuous pilots is
+    dropped at once, and after max_failed_frames frames without a valid TPS the monitor searches again. Memory use is bounded - at most one acquisition window and three frames of symbols are kept.
+
+    At the DVB-T sample rate (64/7 MHz) the monitor runs 1.4-1.9 times faster than real time on one core, in 2k and 8k.
+    Other rates are resampled first (Pipeline.resampleStream), which handles about 9-13 MS/s of input on one core -
+    a 20 MHz stream falls behind, and is only monitored as a replay.
+
+        mkfifo /tmp/iq; python DVBTMonitor.py /tmp/iq --fs 10e6 --bw 10e6
+        rtl_sdr ... | python DVBTMonitor.py - --fs 2.4e6
+        python DVBTMonitor.py udp://0.0.0.0:5000
+        python DVBTMonitor.py capture.cfile --realtime      # replays a recording at its sample rate
+'''
+import argparse
+import json
+import socket
+import sys
+import time
+import numpy as np
+from dvbt_decoder import DSPBlocks, DVBTDecoder, DVBTSynthesizer, MyDVBT, Pipeline
+
+DVBT_FS = int(64e6/7)
+SYMBOLS_PER_FRAME = DVBTSynthesizer.SYMBOLS_PER_FRAME
+# Symbols whose continuous pilots confirm an acquisition - below MIN_PILOT_SNR_DB the detection was false
+# (e.g. a window only partly filled by the signal) and the monitor searches again at once
+CHECK_SYMBOLS = 8
+MIN_PILOT_SNR_DB = 0
+# Carriers measureFrame measures the MER of at a time
+MER_GROUP_CELLS = 2**15
+
+
+def readIQStream(stream, block_size=2**16):
+    '''Yields the complex64 samples read from a binary stream (stdin, a FIFO or a file) in blocks of up to
+        block_size samples - whatever has arrived, so a live stream is not held back to fill a block'''
+    read = getattr(stream, 'read1', stream.read)
+    remainder = b''
+    while True:
+        data = read(block_size*8)
+        if not data:
+            return
+        data = remainder + data
+        num_bytes = len(data)//8*8
+        remainder = data[num_bytes:]
+        if (num_bytes > 0):
+            yield np.frombuffer(data[:num_bytes], dtype = np.complex64)
+
+
+def readUDPStream(host, port, block_size=2**16):
+    '''Yields the complex64 samples of the datagrams received on a UDP port, in blocks of block_size samples.
+        A lost datagram is a jump in the stream, which the monitor sees as a loss of lock.'''
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+        udp_socket.bind((host, port))
+        buffer = bytearray()
+        while True:
+            buffer += udp_socket.recv(65536)
+            if (len(buffer) >= block_size*8):
+                num_bytes = len(buffer)//8*8
+                yield np.frombuffer(bytes(buffer[:num_bytes]), dtype = np.complex64)
+                del buffer[:num_bytes]
+
+
+def throttleStream(blocks, fs):
+    '''Passes the blocks on at the rate of fs samples per second (like GNU Radio's throttle block)'''
+    start_time = time.monotonic()
+    num_samples = 0
+    for block in blocks:
+        num_samples += len(block)
+        delay = start_time + num_samples/fs - time.monotonic()
+        if (delay > 0):
+            time.sleep(delay)
+        yield block
+
+
+def measureFrame(symbols, mode, constellation=None, symbol_index_in_frame=0):
+    '''Returns (mer_db, pilot_snr_db) of (num_symbols, K) tracked carriers.
+
+        The pilot SNR compares the continuous pilots (divided by their values) of all the symbols - their mean
+        is the channel and their spread over the symbols is the noise, so a channel that changes within the frame
+        also counts as noise. The MER is measured on the data cells equalized by the same channel (the mean at
+        the continuous pilots, interpolated over the carriers), each compared with the nearest point of the
+        constellation (None when the constellation is not known yet).'''
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, 4)
+    tables = MyDVBT.getPilotTables(K)
+    channel_at_pilots = symbols[:, tables.continuous_pilots_pos] / tables.continuous_pilots_values
+    channel = np.mean(channel_at_pilots, axis=0)
+    pilot_noise = np.mean(np.abs(channel_at_pilots - channel)**2)
+    pilot_power = np.mean(np.abs(channel)**2)
+    pilot_snr_db = 10*np.log10(pilot_power/max(pilot_noise, np.finfo(float).tiny))
+
+    mer_db = None
+    if (constellation is not None):
+        carriers = np.arange(K)
+        inverse_channel = 1/(np.interp(carriers, tables.continuous_pilots_pos, channel.real) + 1j*np.interp(carriers, tables.continuous_pilots_pos, channel.imag))
+        # The levels of an axis are uniformly spaced, so the nearest one is a rounding - on the real and the
+        # imaginary parts of the cells at once, in level spacings and in place
+        levels = DVBTDecoder.getAxisLLRTable(DVBTSynthesizer.BITS_PER_CELL[constellation])[0].astype(float)
+        spacing = levels[1] - levels[0]
+        error_power = ideal_power = 0.0
+        # The data cells of a few symbols of one scattered pilot pattern at a time, so the arrays are small enough
+        # to be reused from frame to frame instead of mapped anew
+        group_len = max(MER_GROUP_CELLS//K, 1)
+        for (pattern, data_mask) in enumerate(tables.data_mask):
+            pattern_symbols = symbols[(pattern - symbol_index_in_frame) % 4::4]
+            for start in range(0, len(pattern_symbols), group_len):
+                cells = pattern_symbols[start:start+group_len, data_mask] * inverse_channel[data_mask]
+                axes = cells.reshape(-1).view(float)
+                axes *= 1/spacing
+                axes -= levels[0]/spacing
+                ideal_axes = np.rint(axes)
+                np.clip(ideal_axes, 0, len(levels) - 1, out=ideal_axes)
+                axes -= ideal_axes
+                ideal_axes += levels[0]/spacing
+                error_power += np.dot(axes, axes)
+                ideal_power += np.dot(ideal_axes, ideal_axes)
+        mer_db = 10*np.log10(ideal_power/max(error_power, np.finfo(float).tiny))
+
+    return (mer_db, pilot_snr_db)
+
+
+class ChannelMonitor:
+    '''Incremental DVB-T receiver producing a status per frame of a stream at the DVB-T sample rate.
+
+        process(block) takes any number of samples and returns the status dicts of the frames completed by
+        the block. Searching, a status is returned for every status_interval samples without a signal.
+        The tracked symbols wait in a buffer of 3 frames until a whole frame is in it.'''
+
+    def __init__(self, fs=DVBT_FS, channel=None, acquisition_len=65536, max_failed_frames=4, status_interval=None):
+        self.fs = fs
+        self.channel = channel
+        self.acquisition_len = acquisition_len
+        self.max_failed_frames = max_failed_frames
+        self.status_interval = int(0.1*fs) if status_interval is None else status_interval
+        self.num_samples = 0
+        self.reset()
+
+    def reset(self):
+        '''Drops the lock and searches for the signal again'''
+        self.lock = 'searching'
+        self.acquisition_blocks = []
+        self.num_acquired = 0
+        self.samples_since_status = 0
+        self.mode = None
+        self.cyclic_prefix = None
+        self.tracker = None
+        self.symbol_buffer = None
+        self.num_buffered = 0
+        self.pilots_checked = False
+        self.tps = None
+        self.num_failed_frames = 0
+
+    def _status(self, **values):
+        status = {'time': round(self.num_samples/self.fs, 6), 'lock': self.lock, 'mode': self.mode, 'cyclic_prefix': self.cyclic_prefix,
+                  'cfo_hz': None, 'sco_ppm': None, 'mer_db': None, 'pilot_snr_db': None, 'frame_index': None,
+                  'constellation': None, 'code_rate': None, 'tps_ok': None}
+        if (self.tracker is not None):
+            status['cfo_hz'] = round(float(self.tracker.frequency_offset), 1)
+            status['sco_ppm'] = round(float(self.tracker.sampling_offset_ppm), 2)
+        if (self.tps is not None):
+            status['constellation'] = self.tps.constellation
+            status['code_rate'] = self.tps.code_rate_HP
+        status.update(values)
+        return status
+
+    def _acquire(self, block):
+        self.acquisition_blocks.append(block)
+        self.num_acquired += len(block)
+        self.samples_since_status += len(block)
+        if (self.num_acquired < self.acquisition_len):
+            return []
+        signal = np.concatenate(self.acquisition_blocks)
+        self.acquisition_blocks = []
+        self.num_acquired = 0
+        (is_DVBT, mode, cyclic_prefix, time_shift, freq_shift) = MyDVBT.findDVBTSignal(signal, len(signal))
+        if not is_DVBT:
+            if (self.samples_since_status < self.status_interval):
+                return []
+            self.samples_since_status = 0
+            return [self._status()]
+
+        self.lock = 'sync'
+        (self.mode, self.cyclic_prefix) = (mode, cyclic_prefix)
+        self.tracker = MyDVBT.DVBTSynchronizationTracker(mode, cyclic_prefix, self.fs, freq_shift)
+        self.symbol_buffer = np.empty((3*SYMBOLS_PER_FRAME, self.tracker.K), dtype = complex)
+        self.num_buffered = 0
+        return self._track(signal[time_shift:])
+
+    def _dropSymbols(self, num_symbols):
+        self.symbol_buffer[:self.num_buffered-num_symbols] = self.symbol_buffer[num_symbols:self.num_buffered]
+        self.num_buffered -= num_symbols
+
+    def _track(self, block):
+        new_symbols = self.tracker.process(block).reshape(-1, self.tracker.K)
+        statuses = []
+        # At most a frame at a time, so the buffer (under 2 frames after every frame is handled) never overflows
+        for start in range(0, len(new_symbols), SYMBOLS_PER_FRAME):
+            symbols = new_symbols[start:start+SYMBOLS_PER_FRAME]
+            self.symbol_buffer[self.num_buffered:self.num_buffered+len(symbols)] = symbols
+            self.num_buffered += len(symbols)
+            statuses += self._handleFrames()
+            if (self.lock == 'searching'):
+                break
+        return statuses
+
+    def _handleFrames(self):
+        statuses = []
+        if (self.lock == 'sync' and not self.pilots_checked and self.num_buffered >= CHECK_SYMBOLS):
+            self.pilots_checked = True
+            pilot_snr_db = measureFrame(self.symbol_buffer[:CHECK_SYMBOLS], self.mode)[1]
+            if (pilot_snr_db < MIN_PILOT_SNR_DB):
+                statuses.append(self._status(pilot_snr_db=round(float(pilot_snr_db), 2), tps_ok=False))
+                self.reset()
+                return statuses
+
+        if (self.lock == 'sync' and self.num_buffered >= SYMBOLS_PER_FRAME):
+            tps = DVBTDecoder.decodeTPS(self.symbol_buffer[:self.num_buffered], self.mode, self.channel)
+            if (tps is not None):
+                # Frames start at the TPS frame start from now on
+                self.tps = tps
+                self.lock = 'locked'
+                self._dropSymbols(tps.frame_start)
+            elif (self.num_buffered >= 2*SYMBOLS_PER_FRAME - 1):
+                # No frame start in a whole frame's worth of symbol pairs - report the oldest frame's worth
+                statuses.append(self._frameStatus(self.symbol_buffer[:SYMBOLS_PER_FRAME], None))
+                self._dropSymbols(SYMBOLS_PER_FRAME)
+                self.num_failed_frames += 1
+
+        while (self.lock == 'locked' and self.num_buffered >= SYMBOLS_PER_FRAME):
+            frame = self.symbol_buffer[:SYMBOLS_PER_FRAME]
+            tps = DVBTDecoder.decodeTPS(frame, self.mode, self.channel)
+            if (tps is not None):
+                self.tps = tps
+                self.num_failed_frames = 0
+            else:
+                self.num_failed_frames += 1
+            statuses.append(self._frameStatus(frame, tps))
+            self._dropSymbols(SYMBOLS_PER_FRAME)
+
+        if (self.num_failed_frames >= self.max_failed_frames):
+            self.reset()
+        return statuses
+
+    def _frameStatus(self, frame, tps):
+        if (tps is not None or self.lock == 'locked'):
+            symbol_index_in_frame = 0
+        else:
+            symbol_index_in_frame = MyDVBT.findScatteredPilotsPhase(frame[:8])
+        constellation = self.tps.constellation if self.tps is not None else None
+        (mer_db, pilot_snr_db) = measureFrame(frame, self.mode, constellation, symbol_index_in_frame)
+        # The stream time of the frame's last symbol (the other symbols in the buffer come after it)
+        num_later_symbols = self.num_buffered - SYMBOLS_PER_FRAME
+        frame_time = (self.num_samples - len(self.tracker.pending) - num_later_symbols*self.tracker.symbol_len_with_cp)/self.fs
+        return self._status(time=round(frame_time, 6), mer_db=None if mer_db is None else round(float(mer_db), 2),
+                            pilot_snr_db=round(float(pilot_snr_db), 2), frame_index=None if tps is None else tps.frame_index,
+                            tps_ok=tps is not None)
+
+    def process(self, block):
+        self.num_samples += len(block)
+        if (self.lock == 'searching'):
+            return self._acquire(block)
+        return self._track(block)
+
+
+def monitorStream(blocks, fs=DVBT_FS, bw=8e6, channel=None, max_failed_frames=4):
+    '''Yields the status of every frame of a stream of IQ blocks at sample rate fs (resampled to the DVB-T
+        rate, with the channel filter when bw > 8 MHz, like Pipeline.acquireStream)'''
+    if (DSPBlocks.getResamplingRatio(fs) != (1, 1)):
+        blocks = Pipeline.resampleStream(blocks, fs, ch_bw=7.61e6 if bw > 8e6 else None)
+    elif (bw > 8e6):
+        blocks = Pipeline.lowPassFilterStream(blocks, fs)
+    monitor = ChannelMonitor(DVBT_FS, channel, max_failed_frames=max_failed_frames)
+    for block in blocks:
+        yield from monitor.process(block)
+
+
+def openSource(source, block_size):
+    '''Returns the blocks of the source - "-" for stdin, "udp://host:port", or a FIFO or file name'''
+    if (source == '-'):
+        return readIQStream(sys.stdin.buffer, block_size)
+    if source.startswith('udp://'):
+        (host, port) = source[len('udp://'):].rsplit(':', 1)
+        return readUDPStream(host, int(port), block_size)
+    def fileBlocks():
+        with open(source, 'rb', buffering=0) as stream:
+            yield from readIQStream(stream, block_size)
+    return fileBlocks()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Monitor a DVB-T channel in a live complex64 IQ stream - one JSON status line per frame')
+    parser.add_argument('source', help='"-" for stdin, udp://host:port, or a FIFO or cfile name')
+    parser.add_argument('--fs', type=float, default=DVBT_FS, help='sample rate of the stream (default: %(default)s)')
+    parser.add_argument('--bw', type=float, default=8e6, help='bandwidth of the stream - the channel is filtered above 8 MHz (default: %(default)s)')
+    parser.add_argument('--channel', default=None, help='channel name, the key of the TPS parameters kept (default: the source)')
+    parser.add_argument('--block-size', type=int, default=2**16, help='samples per read (default: %(default)s)')
+    parser.add_argument('--max-failed-frames', type=int, default=4, help='frames without a valid TPS before searching again (default: %(default)s)')
+    parser.add_argument('--realtime', action='store_true', help='replay the source at its sample rate (for files)')
+    parser.add_argument('--output', default=None, help='file to append the status lines to (default: stdout)')
+    args = parser.parse_args(argv)
+
+    fs = int(args.fs) if float(args.fs).is_integer() else args.fs
+    blocks = openSource(args.source, args.block_size)
+    if args.realtime:
+        blocks = throttleStream(blocks, fs)
+
+    output = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        for status in monitorStream(blocks, fs, args.bw, args.channel or args.source, args.max_failed_frames):
+            output.write(json.dumps(status) + '\n')
+            output.flush()
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # The reader of the status lines (e.g. head) has exited
+        sys.stdout = None
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
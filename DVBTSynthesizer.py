@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+'''DVBTSynthesizer moved to dvbt_decoder.DVBTSynthesizer - importing DVBTSynthesizer gives that module (the same module object)'''
+import sys
+from dvbt_decoder import DVBTSynthesizer
+
+sys.modules[__name__] = DVBTSynthesizer
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+'''Pipeline moved to dvbt_decoder.Pipeline - importing Pipeline gives that module (the same module object)'''
+import sys
+from dvbt_decoder import Pipeline
+
+sys.modules[__name__] = Pipeline
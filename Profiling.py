@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+'''Profiling moved to dvbt_decoder.Profiling - importing Profiling gives that module (the same module object)'''
+import sys
+from dvbt_decoder import Profiling
+
+sys.modules[__name__] = Profiling
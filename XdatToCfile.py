@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+'''XDAT to GNU Radio cfile converter.
+
+    A cfile is the raw complex64 (interleaved float32 I,Q) samples, which is exactly the memory layout of a
+    complex64 numpy array, so the converter never interleaves by hand. The recording is streamed in blocks
+    (Record.XdatReader) through the optional scale, channel filter and resample stages, so the whole capture
+    is converted in one pass with memory use that depends only on the block size. Without filtering or
+    resampling the int16 samples are converted straight into a memory mapped output file:
+
+        python XdatToCfile.py Records_xdat/DVB-T_8Mhz2019-05-30_13-32-29.xdat --scale --resample
+'''
+import argparse
+import os
+import sys
+import numpy as np
+from dvbt_decoder import Pipeline, Record
+
+
+def convertXdatToCfile(xdat_filename, cfile_filename=None, xhdr_filename=None, scale=False, lowpass=False, resample=False, block_size=2**20):
+    '''Converts an XDAT recording to a cfile.
+
+        Inputs:
+        -------
+        scale : bool
+            Multiply the samples by the XHDR scale factor (the int16 samples are written as is otherwise)
+        lowpass : bool
+            Filter the DVB-T channel (lowPassFilterDVBT)
+        resample : bool
+            Resample to the DVB-T sample rate of 64/7 MHz (with lowpass, the channel filter is part of the
+            resampling filter). The filter delay is not removed.
+
+        Outputs:
+        --------
+        (cfile_filename, fs, num_samples) of the cfile written
+        '''
+
+    if (cfile_filename is None):
+        cfile_filename = os.path.splitext(xdat_filename)[0] + '.cfile'
+    if (xhdr_filename is None):
+        xhdr_filename = os.path.splitext(xdat_filename)[0] + '.xhdr'
+
+    reader = Record.XdatReader(xdat_filename, block_size)
+    attributes = None
+    if (scale or lowpass or resample):
+        attributes = Record.parse_xhdr(xhdr_filename)
+        if not attributes:
+            raise ValueError("Invalid XHDR file {}".format(xhdr_filename))
+    fs = attributes.fs if attributes else None
+
+    if not (lowpass or resample):
+        if (len(reader) == 0):
+            open(cfile_filename, 'wb').close()
+            return (cfile_filename, fs, 0)
+        out = np.memmap(cfile_filename, dtype=np.complex64, mode='w+', shape=(len(reader),))
+        for start in range(0, len(reader), block_size):
+            block = reader.read(start, block_size, out=out[start:start+block_size])
+            if scale:
+                block *= attributes.scale
+        out.flush()
+        return (cfile_filename, fs, len(reader))
+
+    blocks = reader.blocks()
+    if scale:
+        blocks = (block * np.float32(attributes.scale) for block in blocks)
+    if resample:
+        blocks = Pipeline.resampleStream(blocks, fs, ch_bw=7.61e6 if lowpass else None)
+        fs = int(64e6/7)
+    else:
+        blocks = Pipeline.lowPassFilterStream(blocks, fs)
+
+    num_samples = 0
+    with open(cfile_filename, 'wb') as cfile:
+        for block in blocks:
+            block.astype(np.complex64).tofile(cfile)
+            num_samples += len(block)
+
+    return (cfile_filename, fs, num_samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert an XDAT recording to a GNU Radio cfile (complex64)')
+    parser.add_argument('xdat', help='XDAT file to convert')
+    parser.add_argument('--output', default=None, help='cfile to write (default: the XDAT name with a .cfile extension)')
+    parser.add_argument('--xhdr', default=None, help='XHDR file (default: the XDAT name with a .xhdr extension)')
+    parser.add_argument('--scale', action='store_true', help='multiply the samples by the XHDR scale factor')
+    parser.add_argument('--lowpass', action='store_true', help='filter the DVB-T channel')
+    parser.add_argument('--resample', action='store_true', help='resample to the DVB-T sample rate (64/7 MHz)')
+    parser.add_argument('--block-size', type=int, default=2**20, help='samples per block (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    (cfile_filename, fs, num_samples) = convertXdatToCfile(args.xdat, args.output, args.xhdr, args.scale, args.lowpass, args.resample, args.block_size)
+    print('Saved {} samples{} as {}'.format(num_samples, '' if fs is None else ' at {} Hz'.format(fs), cfile_filename))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
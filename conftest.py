@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+'''pytest configuration - the repository root is on sys.path, so the tests import the dvbt_decoder package
+    from the working tree'''
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+'''Stateful DSP building blocks for processing a signal block by block.
+
+    Every block keeps the state it needs between calls, so feeding a signal in blocks of any size gives
+    the same output as feeding it in one piece.'''
+from fractions import Fraction
+import functools
+import numpy as np
+from . import Profiling
+
+DVBT_FS = Fraction(64000000, 7)
+
+
+def getResamplingRatio(fs, fs_new=DVBT_FS, max_down=1000):
+    '''Returns (up, down) - the reduced integer ratio fs_new/fs.
+    
+        The ratio is exact for the common SDR rates, e.g. to 64/7 MHz from 10 MHz (32/35), 20 MHz (16/35),
+        25 MHz (64/175), 40 MHz (8/35) or 61.44 MHz (25/168). Rates without a ratio of small integers get
+        the nearest ratio with down <= max_down (9142857 Hz gets 1/1).'''
+    ratio = (Fraction(fs_new).limit_denominator(1000) / Fraction(fs).limit_denominator(1000)).limit_denominator(max_down)
+    return (ratio.numerator, ratio.denominator)
+
+
+@functools.lru_cache(maxsize=None)
+@Profiling.profiled()
+def designResamplingFilter(up, down, fs, ch_bw=None, attenuation_db=60):
+    '''Returns the (read only) taps of a polyphase resampler from fs by up/down, designed once per ratio.
+    
+        Without ch_bw this is the anti aliasing filter sig.resample_poly uses. With ch_bw the filter is also
+        the channel low pass filter - it passes ch_bw/2 and stops from half the new sample rate, so filtering
+        and resampling are done in a single pass.'''
+    import scipy.signal as sig
+    if (ch_bw is None):
+        if (up == down):
+            taps = np.ones(1)
+        else:
+            max_rate = max(up, down)
+            taps = sig.firwin(2*10*max_rate + 1, 1/max_rate, window=('kaiser', 5.0)) * up
+    else:
+        fs_up = fs*up
+        stop_freq = min(fs, fs*up/down)/2
+        if (ch_bw/2 >= stop_freq):
+            raise ValueError("Invalid channel bandwidth! Must be below the new sample rate")
+        (num_taps, beta) = sig.kaiserord(attenuation_db, (stop_freq - ch_bw/2)/(fs_up/2))
+        taps = sig.firwin(num_taps | 1, (stop_freq + ch_bw/2)/2, window=('kaiser', beta), fs=fs_up) * up
+    taps.setflags(write=False)
+    return taps
+
+
+class PolyphaseResampler:
+    '''Rational up/down resampler keeping its input history and output phase between blocks.
+
+        The output equals sig.upfirdn(taps, x, up, down) - the filter delay is not removed.
+        If taps is None the filter sig.resample_poly would use is designed. The output and the kept history
+        are of the complex dtype - with np.complex64 the taps are float32 too, so a complex64 capture stays
+        complex64.'''
+
+    def __init__(self, up, down, taps=None, dtype=complex):
+        if (taps is None):
+            taps = designResamplingFilter(up, down, 1)
+        self.up = up
+        self.down = down
+        self.dtype = np.dtype(dtype)
+        taps_per_phase = -(-len(taps) // up)
+        padded_taps = np.zeros(taps_per_phase*up, dtype=np.finfo(self.dtype).dtype)
+        padded_taps[:len(taps)] = taps
+        # Row p holds the taps of phase p, reversed so a phase is a dot product with an input window
+        self.phase_taps = padded_taps.reshape(taps_per_phase, up).T[:, ::-1].copy()
+        self.history = np.zeros(taps_per_phase - 1, dtype=self.dtype)
+        self.num_input = 0
+        self.num_output = 0
+
+    def process(self, block):
+        buffer = np.concatenate((self.history, block)).astype(self.dtype, copy=False)
+        num_input = self.num_input + len(block)
+        output_end = -(-num_input*self.up // self.down)
+        num_new_outputs = output_end - self.num_output
+        resampled_block = np.zeros(max(num_new_outputs, 0), dtype=self.dtype)
+
+        if (num_new_outputs > 0):
+            taps_per_phase = self.phase_taps.shape[1]
+            # The taps are real, so the I and Q samples (interleaved in the float view of the buffer) are
+            # filtered together - a (taps_per_phase, 2) window per output, which matmul handles faster than
+            # complex rows times real taps
+            windows = np.lib.stride_tricks.sliding_window_view(buffer.view(self.phase_taps.dtype), 2*taps_per_phase)
+            for r in range(min(self.up, num_new_outputs)):
+                n = self.num_output + r
+                phase = (n*self.down) % self.up
+                first_window = (n*self.down) // self.up - self.num_input
+                count = len(range(r, num_new_outputs, self.up))
+                rows = windows[2*first_window::2*self.down][:count].reshape(count, taps_per_phase, 2)
+                resampled_block[r::self.up] = (self.phase_taps[phase] @ rows).view(self.dtype)[:, 0]
+            self.num_output = output_end
+
+        if (len(self.history) > 0):
+            self.history = buffer[len(buffer)-len(self.history):]
+        self.num_input = num_input
+        return resampled_block
+
+    def flush(self):
+        '''Returns the outputs still in the filter (fed with zeros), for the end of a signal'''
+        return self.process(np.zeros(len(self.history) + 1, dtype=self.dtype))
+
+
+def getSignalDtype(x):
+    '''The complex dtype a signal is processed in - complex64 for complex64 (or int16, float32) samples,
+        complex128 otherwise'''
+    return np.result_type(np.asarray(x).dtype, np.complex64)
+
+
+def resampleWithTaps(x, up, down, taps):
+    '''Resamples a whole signal by up/down with a linear phase filter and removes the filter delay,
+        like sig.resample_poly. The output is complex64 for a complex64 signal (getSignalDtype).'''
+    # Leading zeros make the filter delay a whole number of output samples
+    half_len = (len(taps) - 1)//2
+    num_pre_pad = -half_len % down
+    delay = (half_len + num_pre_pad)//down
+    resampler = PolyphaseResampler(up, down, np.concatenate((np.zeros(num_pre_pad), taps)), dtype=getSignalDtype(x))
+    resampled_signal = np.concatenate((resampler.process(x), resampler.flush()))
+    return resampled_signal[delay:delay + -(-len(x)*up // down)]
+
+
+@Profiling.profiled(samples_arg='x')
+def resample(x, fs, fs_new=DVBT_FS, ch_bw=None):
+    '''Polyphase resampling of a whole signal from fs to fs_new (optionally with the channel filter of
+        designResamplingFilter), with the filter delay removed like sig.resample_poly.
+        
+        Returns (resampled_signal, up, down)'''
+    (up, down) = getResamplingRatio(fs, fs_new)
+    return (resampleWithTaps(x, up, down, designResamplingFilter(up, down, fs, ch_bw)), up, down)
+
+
+@functools.lru_cache(maxsize=None)
+@Profiling.profiled()
+def designDecimationStages(fs, ch_bw, min_fs=2*DVBT_FS, attenuation_db=60):
+    '''Returns the (taps, factor) of every stage of a multistage decimator by 2 from fs down to (not below)
+        min_fs. Each stage passes ch_bw/2 and stops only where the aliases would fall into the channel, so
+        the early (high rate) stages are short and the decimated signal can be resampled cheaply.'''
+    if (min_fs <= ch_bw):
+        raise ValueError("Invalid min_fs! Must be above the channel bandwidth")
+    import scipy.signal as sig
+    stages = []
+    while (fs/2 >= min_fs):
+        (num_taps, beta) = sig.kaiserord(attenuation_db, (fs/2 - ch_bw)/(fs/2))
+        taps = sig.firwin(num_taps | 1, fs/4, window=('kaiser', beta), fs=fs)
+        taps.setflags(write=False)
+        stages.append((taps, 2))
+        fs = fs/2
+    return tuple(stages)
+
+
+@Profiling.profiled(samples_arg='x')
+def decimate(x, fs, ch_bw, min_fs=2*DVBT_FS):
+    '''Multistage decimation of a whole signal (see designDecimationStages) - returns (decimated_signal, fs_new)'''
+    for (taps, factor) in designDecimationStages(fs, ch_bw, min_fs):
+        x = resampleWithTaps(x, 1, factor, taps)
+        fs = fs/factor
+    return (x, fs)
+
+
+def exponentialRamp(phase_step, num_samples, phase=0.0):
+    '''Returns exp(1j*(phase_step*n + phase)) for n in range(num_samples) (complex128). When phase_step or
+        phase are arrays, returns a ramp for every element of them - (*shape, num_samples).
+
+        The samples n = i*fine_len + j are the products of a coarse and a fine oscillator, so this costs about
+        2*sqrt(num_samples) transcendental calls and a complex multiply per sample, instead of a
+        transcendental call per sample.'''
+    shape = np.broadcast_shapes(np.shape(phase_step), np.shape(phase))
+    phase_step = np.asarray(phase_step, dtype=float)[..., None]
+    phase = np.asarray(phase, dtype=float)[..., None]
+    fine_len = max(int(np.ceil(np.sqrt(num_samples))), 1)
+    fine = np.exp(1j*phase_step*np.arange(fine_len))
+    coarse = np.exp(1j*(phase_step*fine_len*np.arange(-(-num_samples // fine_len)) + phase))
+    ramps = coarse[..., :, None] * fine[..., None, :]
+    return ramps.reshape(shape + (-1,))[..., :num_samples]
+
+
+class NCO:
+    '''Numerically controlled oscillator exp(1j*(2*pi*frequency/fs*n + phase)) with a phase that continues
+        from block to block.
+        
+        The oscillator of a chunk of table_len samples is computed once per frequency, so every chunk
+        costs one complex multiply per sample (the table rotated to the chunk's start phase) instead of a
+        transcendental call per sample. setFrequency() changes the frequency mid-stream without a phase
+        jump - it only changes the phase step, and the table is rebuilt (by exponentialRamp) when the next
+        block is mixed, so a loop may retune it every block.
+        generate() returns complex64 samples, mix() multiplies a block by the oscillator (in place with
+        out=block).'''
+    
+    def __init__(self, frequency, fs, phase=0.0, table_len=4096):
+        self.fs = fs
+        self.table_len = table_len
+        self.phase = float(phase)
+        self.frequency = None
+        self.setFrequency(frequency)
+    
+    def setFrequency(self, frequency):
+        if (frequency == self.frequency):
+            return
+        self.frequency = frequency
+        self.phase_step = 2*np.pi*frequency/self.fs
+        self.table = None
+        self.table64 = None
+    
+    def _getTable(self, dtype):
+        '''Returns the oscillator of a chunk (of dtype complex64 or complex128), built on first use'''
+        if (self.table is None):
+            self.table = exponentialRamp(self.phase_step, self.table_len)
+        if (dtype != np.complex64):
+            return self.table
+        if (self.table64 is None):
+            self.table64 = self.table.astype(np.complex64)
+        return self.table64
+    
+    def _chunks(self, num_samples):
+        '''Yields (start, end, oscillator) for every chunk and advances the phase'''
+        for start in range(0, num_samples, self.table_len):
+            end = min(start + self.table_len, num_samples)
+            yield (start, end, complex(np.exp(1j*self.phase)))
+            self.phase = (self.phase + self.phase_step*(end - start)) % (2*np.pi)
+    
+    def generate(self, num_samples, out=None):
+        if (out is None):
+            out = np.empty(num_samples, dtype=np.complex64)
+        table = self._getTable(np.complex64)
+        for (start, end, rotation) in self._chunks(num_samples):
+            np.multiply(table[:end-start], rotation, out=out[start:end])
+        return out
+    
+    def mix(self, block, out=None):
+        block = np.asarray(block)
+        if (out is None):
+            out = np.empty(len(block), dtype=np.result_type(block.dtype, np.complex64))
+        table = self._getTable(out.dtype)
+        for (start, end, rotation) in self._chunks(len(block)):
+            np.multiply(block[start:end], table[:end-start]*rotation, out=out[start:end])
+        return out
+
+
+class FFTCorrelator:
+    '''Overlap-save FFT correlation against a fixed template, whose conjugate spectrum is computed once.
+
+        correlate(x) equals np.correlate(x, template) ('valid' mode). process(block) correlates a long
+        stream block by block - it keeps the last len(template)-1 samples, so the concatenated outputs
+        equal the correlation of the whole stream.'''
+
+    def __init__(self, template, fft_len=None):
+        self.template_len = len(template)
+        if (fft_len is None):
+            fft_len = 1 << int(np.ceil(np.log2(4*self.template_len)))
+        self.fft_len = fft_len
+        self.step = fft_len - self.template_len + 1
+        self.template_spectrum_conj = np.conj(np.fft.fft(template, fft_len))
+        self.history = np.zeros(0, dtype=complex)
+
+    def correlate(self, x):
+        num_outputs = len(x) - self.template_len + 1
+        if (num_outputs <= 0):
+            return np.zeros(0, dtype=complex)
+
+        num_segments = -(-num_outputs // self.step)
+        padded_x = np.zeros((num_segments - 1)*self.step + self.fft_len, dtype=complex)
+        padded_x[:len(x)] = x
+        segments = np.lib.stride_tricks.as_strided(padded_x, shape=(num_segments, self.fft_len),
+                                                   strides=(self.step*padded_x.itemsize, padded_x.itemsize), writeable=False)
+
+        circular_corr = np.fft.ifft(np.fft.fft(segments, axis=1) * self.template_spectrum_conj, axis=1)
+        return circular_corr[:, :self.step].reshape(-1)[:num_outputs]
+
+    def process(self, block):
+        buffer = np.concatenate((self.history, block))
+        self.history = buffer[max(len(buffer) - self.template_len + 1, 0):]
+        return self.correlate(buffer)
+
+
+class FFTConvolver(FFTCorrelator):
+    '''Overlap-save FFT FIR filter for long filters (same output as sig.lfilter(taps, 1.0, x)).
+
+        process(block) filters a stream block by block and filter(x) filters a whole signal in blocks of
+        block_size samples, so the FFT buffers stay small.'''
+
+    def __init__(self, taps, fft_len=None):
+        taps = np.asarray(taps)
+        # Convolution with taps is correlation with the conjugated reversed taps
+        super().__init__(np.conj(taps[::-1]), fft_len)
+        self.history = np.zeros(len(taps) - 1, dtype=complex)
+
+    def filter(self, x, block_size=2**20):
+        # Only the FFT buffers of a block are complex128 - the filtered signal keeps a complex64 input's dtype
+        filtered_signal = np.empty(len(x), dtype=getSignalDtype(x))
+        for start in range(0, len(x), block_size):
+            filtered_signal[start:start+block_size] = self.process(x[start:start+block_size])
+        return filtered_signal
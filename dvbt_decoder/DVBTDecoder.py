@@ -0,0 +1,670 @@
+# -*- coding: utf-8 -*-
+'''DVB-T channel decoder (ETSI EN 300 744) - from equalized carriers to MPEG-2 transport stream packets.
+
+    A NumPy version of the GNU Radio dtv receive chain of dvbt_rx_demo_8k: dvbt_demap,
+    dvbt_symbol_inner_interleaver, dvbt_bit_inner_deinterleaver, dvbt_viterbi_decoder,
+    dvbt_convolutional_deinterleaver, dvbt_reed_solomon_dec and dvbt_energy_descramble. Every stage takes
+    whole OFDM symbols (or whole packets) as arrays, and the interleavers are precomputed index arrays:
+
+        equalized_signal = MyDVBT.removeChannelResponse(FFT_len, CP_len, ofdm_symbols)
+        (packets, num_corrected_bytes) = decodeTransportStream(equalized_signal, 8, constellation='16QAM', code_rate='2/3')
+        writeTransportStream(packets, 'capture.ts')
+'''
+import functools
+import multiprocessing
+import numpy as np
+from . import DVBTSynthesizer
+from . import MyDVBT
+from . import Profiling
+
+TS_PACKET_LEN = 188
+RS_PACKET_LEN = 204
+RS_PARITY_LEN = RS_PACKET_LEN - TS_PACKET_LEN
+TS_SYNC_BYTE = 0x47
+TS_INVERTED_SYNC_BYTE = 0xB8
+PACKETS_PER_SCRAMBLING_GROUP = 8
+
+# Bit interleaver (EN 300 744 section 4.3.4.1): the demultiplexing of the bit stream to the v sub-streams
+# (non hierarchical) and the cyclic shift of the permutation of every sub-stream in blocks of 126 bits
+BIT_INTERLEAVER_BLOCK_LEN = 126
+BIT_INTERLEAVER_SHIFTS = (0, 63, 105, 42, 21, 84)
+BIT_DEMUX_ORDER = {2: (0, 1), 4: (0, 2, 1, 3), 6: (0, 2, 4, 1, 3, 5)}
+
+# Symbol interleaver: the feedback taps of the R' register and the permutation of its bits into R
+SYMBOL_INTERLEAVER_TAPS = {2: (0, 3), 8: (0, 1, 4, 6)}
+SYMBOL_INTERLEAVER_BIT_PERMUTATION = {2: (4, 3, 9, 6, 2, 8, 1, 5, 7, 0),          # R'_i bit 0...9 goes to R_i bit
+                                      8: (7, 1, 4, 2, 9, 6, 8, 10, 0, 3, 11, 5)}  # R'_i bit 0...11 goes to R_i bit
+
+# Convolutional code: generators G1 = 171 (X) and G2 = 133 (Y) octal, and the puncturing patterns (X, Y) of
+# every code rate (EN 300 744 table 2). The punctured stream sends X then Y of every input bit (if not punctured)
+CONV_CODE_G1 = 0o171
+CONV_CODE_G2 = 0o133
+# Decoded bits per block of the block-parallel Viterbi decoder, and the steps its windows extend on both sides
+# of a block (enough for the survivor paths of the 7/8 punctured code to merge)
+VITERBI_BLOCK_LEN = 2048
+VITERBI_TRACEBACK_LEN = 128
+PUNCTURING_PATTERNS = {'1/2': ((1,), (1,)),
+                       '2/3': ((1, 0), (1, 1)),
+                       '3/4': ((1, 0, 1), (1, 1, 0)),
+                       '5/6': ((1, 0, 1, 0, 1), (1, 1, 0, 1, 0)),
+                       '7/8': ((1, 0, 0, 0, 1, 0, 1), (1, 1, 1, 1, 0, 1, 0))}
+
+# Outer interleaver: 12 branches, branch j delays by j*17 bytes
+CONV_INTERLEAVER_BRANCHES = 12
+CONV_INTERLEAVER_DEPTH = 17
+
+# Reed-Solomon RS(204,188, t=8), shortened from RS(255,239) over GF(256) with x^8 + x^4 + x^3 + x^2 + 1,
+# generator roots lambda^0...lambda^15 (lambda = 0x02)
+GF_POLY = 0x11d
+
+
+# Syndromes of at most this many packets are computed at once (a (packets, 204, 16) table lookup)
+RS_SYNDROME_BATCH = 4096
+
+
+def _buildGaloisFieldTables():
+    '''Returns (GF_EXP, GF_LOG, GF_MUL) - the antilog table (doubled, so exponents up to 509 need no modulo),
+        the log table and the full 256x256 multiplication table'''
+    gf_exp = np.zeros(512, dtype = np.int64)
+    gf_log = np.zeros(256, dtype = np.int64)
+    value = 1
+    for i in range(255):
+        gf_exp[i] = value
+        gf_log[value] = i
+        value <<= 1
+        if (value & 0x100):
+            value ^= GF_POLY
+    gf_exp[255:510] = gf_exp[:255]
+    gf_mul = gf_exp[gf_log[:, None] + gf_log[None, :]].astype(np.uint8)
+    gf_mul[0, :] = 0
+    gf_mul[:, 0] = 0
+    for array in (gf_exp, gf_log, gf_mul):
+        array.setflags(write=False)
+    return (gf_exp, gf_log, gf_mul)
+
+(GF_EXP, GF_LOG, GF_MUL) = _buildGaloisFieldTables()
+
+
+def gfMultiply(a, b):
+    return int(GF_MUL[a, b])
+
+
+def gfInverse(a):
+    return int(GF_EXP[255 - GF_LOG[a]])
+
+
+def gfPolyAdd(a, b):
+    if (len(a) < len(b)):
+        (a, b) = (b, a)
+    return [coefficient ^ (b[i] if i < len(b) else 0) for (i, coefficient) in enumerate(a)]
+
+
+def gfPolyEval(poly, x):
+    '''Evaluates a polynomial (lowest degree coefficient first) at x'''
+    result = 0
+    for coefficient in reversed(poly):
+        result = gfMultiply(result, x) ^ coefficient
+    return result
+
+
+def extractDataCells(equalized_signal, K, symbol_index_in_frame=0):
+    '''Returns the (num_symbols, data_carriers_per_symbol) data cells of the equalized K carriers of every
+        OFDM symbol (as removeChannelResponse returns them) - the carriers that are not continuous, scattered
+        or TPS pilots. symbol_index_in_frame is the index of the first symbol in its frame.'''
+    equalized_signal = np.asarray(equalized_signal).reshape(-1)
+    symbols = equalized_signal[:len(equalized_signal)//K*K].reshape(-1, K)
+    data_mask = MyDVBT.getPilotTables(K).data_mask[(symbol_index_in_frame + np.arange(len(symbols))) % 4]
+    # Every symbol has data_carriers_per_symbol data carriers, so the masked carriers are whole rows
+    return symbols[data_mask].reshape(len(symbols), -1)
+
+
+@functools.lru_cache(maxsize=None)
+def getSymbolInterleaverPermutation(mode):
+    '''Returns H(q) of the symbol interleaver of the mode (2 or 8) - the (read only) index array of length
+        data_carriers_per_symbol. The interleaver sends data cell q to carrier H(q) in the even symbols of a
+        frame, and carrier q gets data cell H(q) in the odd symbols.'''
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, 4)
+    Nr = int(np.log2(FFT_len))
+    taps = SYMBOL_INTERLEAVER_TAPS[mode]
+    bit_weights = 2**np.array(SYMBOL_INTERLEAVER_BIT_PERMUTATION[mode])
+
+    register = [0]*(Nr - 1)     # R'_i bits 0...Nr-2
+    permutation = []
+    for i in range(FFT_len):
+        if (i == 2):
+            register = [1] + [0]*(Nr - 2)
+        elif (i > 2):
+            feedback = 0
+            for tap in taps:
+                feedback ^= register[tap]
+            register = register[1:] + [feedback]
+        H = (i % 2)*2**(Nr - 1) + int(np.dot(register, bit_weights))
+        if (H < data_carriers_per_symbol):
+            permutation.append(H)
+
+    permutation = np.array(permutation)
+    if (len(permutation) != data_carriers_per_symbol):
+        raise ValueError("Invalid symbol interleaver! Got {} of {} cells".format(len(permutation), data_carriers_per_symbol))
+    permutation.setflags(write=False)
+    return permutation
+
+
+@functools.lru_cache(maxsize=None)
+def getSymbolDeinterleaverIndices(mode):
+    '''Returns the (2, data_carriers_per_symbol) read only gather indices of the symbol deinterleaver of the
+        even (row 0) and odd (row 1) symbols of a frame - data cell q of a symbol is its carrier indices[p, q]'''
+    permutation = getSymbolInterleaverPermutation(mode)
+    indices = np.stack((permutation, np.argsort(permutation)))
+    indices.setflags(write=False)
+    return indices
+
+
+def symbolDeinterleave(data_cells, mode, symbol_index_in_frame=0):
+    '''Inverse of the symbol interleaver - returns the data cells of every symbol in the order they were mapped'''
+    indices = getSymbolDeinterleaverIndices(mode)[(symbol_index_in_frame + np.arange(len(data_cells))) % 2]
+    return np.take_along_axis(data_cells, indices, axis=1)
+
+
+@functools.lru_cache(maxsize=None)
+def getAxisDecisionTable(bits_per_cell, alpha=1):
+    '''Returns (thresholds, axis_bits) of the hard decision on one axis of the constellation - the decision
+        thresholds between its sorted levels and the bits (y0,y2,... on the real axis, y1,y3,... on the
+        imaginary axis) of every level'''
+    constellation = DVBTSynthesizer.createQAMConstellation(bits_per_cell, alpha)
+    bits = (np.arange(len(constellation))[:, None] >> np.arange(bits_per_cell - 1, -1, -1)) & 1
+    # The points with all the imaginary axis bits 0 hold every level of the real axis once
+    on_axis = np.all(bits[:, 1::2] == 0, axis=1)
+    levels = constellation[on_axis].real
+    order = np.argsort(levels)
+    thresholds = (levels[order][1:] + levels[order][:-1])/2
+    axis_bits = bits[on_axis][order][:, 0::2].astype(np.uint8)
+    for array in (thresholds, axis_bits):
+        array.setflags(write=False)
+    return (thresholds, axis_bits)
+
+
+@functools.lru_cache(maxsize=None)
+def getAxisLLRTable(bits_per_cell, alpha=1):
+    '''Returns (levels, zero_levels, one_levels) of the max-log LLRs on one axis of the constellation - its
+        levels, and the (bits_per_axis, num_levels/2) indices of the levels whose bit (y0,y2,... on the real
+        axis, y1,y3,... on the imaginary axis) is 0 and is 1'''
+    (thresholds, axis_bits) = getAxisDecisionTable(bits_per_cell, alpha)
+    constellation = DVBTSynthesizer.createQAMConstellation(bits_per_cell, alpha)
+    levels = np.unique(constellation.real).astype(np.float32)
+    zero_levels = np.stack([np.flatnonzero(bits == 0) for bits in axis_bits.T])
+    one_levels = np.stack([np.flatnonzero(bits == 1) for bits in axis_bits.T])
+    for array in (levels, zero_levels, one_levels):
+        array.setflags(write=False)
+    return (levels, zero_levels, one_levels)
+
+
+def demapCellsLLR(cells, constellation='16QAM', alpha=1, noise_var=1):
+    '''Soft decision (max-log) demapping - returns the (..., v) LLRs log(P(0)/P(1)) of the bits y0...y(v-1) of
+        every cell, positive for a 0 bit. The Gray mapping separates the real and imaginary axes, so the LLR of
+        a bit is the squared distance to the nearest level with the bit 1 minus the one to the nearest level
+        with the bit 0 on its axis. noise_var (the noise variance of every cell, or of all of them) scales the
+        LLRs - the Viterbi decoder does not need it unless it changes from cell to cell.'''
+    bits_per_cell = DVBTSynthesizer.BITS_PER_CELL[constellation]
+    (levels, zero_levels, one_levels) = getAxisLLRTable(bits_per_cell, alpha)
+    # (..., 2 axes, num_levels) squared distances, then the (..., 2 axes, bits_per_axis) LLRs
+    axes = np.stack((np.real(cells), np.imag(cells)), axis=-1).astype(np.float32)
+    distances = (axes[..., None] - levels)**2
+    llrs = distances[..., one_levels].min(axis=-1) - distances[..., zero_levels].min(axis=-1)
+    # y0,y1,y2,... alternate between the axes
+    llrs = np.swapaxes(llrs, -1, -2).reshape(np.shape(cells) + (bits_per_cell,))
+    noise_var = np.asarray(noise_var, dtype = np.float32)
+    return llrs / (noise_var[..., None] if noise_var.ndim > 0 else noise_var)
+
+
+@functools.lru_cache(maxsize=None)
+def getBitDeinterleaverIndices(bits_per_cell):
+    '''Returns (word_index, bit_index) - bit j of demultiplexing cycle c of a block of 126 words is bit
+        word_index[c, j] of word bit_index[c, j] of the block (read only arrays)'''
+    demux_order = np.array(BIT_DEMUX_ORDER[bits_per_cell])
+    shifts = np.array(BIT_INTERLEAVER_SHIFTS[:bits_per_cell])
+    cycles = np.arange(BIT_INTERLEAVER_BLOCK_LEN)[:, None]
+    # Sub-stream e is permuted by H_e(w) = (w + shift_e) % 126, so its bit w is in word w - shift_e
+    word_index = (cycles - shifts[demux_order]) % BIT_INTERLEAVER_BLOCK_LEN
+    bit_index = np.broadcast_to(demux_order, word_index.shape).copy()
+    for array in (word_index, bit_index):
+        array.setflags(write=False)
+    return (word_index, bit_index)
+
+
+def bitDeinterleave(words):
+    '''Inverse of the bit interleaver and demultiplexer - returns the coded bit stream of the (num_words, v)
+        bit words, or the stream of LLRs of (num_words, v) LLR words (num_words a multiple of 126, which every
+        whole OFDM symbol is)'''
+    bits_per_cell = words.shape[1]
+    (word_index, bit_index) = getBitDeinterleaverIndices(bits_per_cell)
+    blocks = words.reshape(-1, BIT_INTERLEAVER_BLOCK_LEN, bits_per_cell)
+    return blocks[:, word_index, bit_index].reshape(-1)
+
+
+@functools.lru_cache(maxsize=None)
+def getButterflySigns():
+    '''Returns the (64, 2) signs (+1 for a 0 bit) of the X and Y outputs of the transitions from the even states
+        into every state. State s holds the last 6 input bits (bit 5 the newest), so states 2j and 2j+1 both
+        lead to states j (input 0) and j+32 (input 1). Both generators tap the input and the oldest bit, so
+        the transition from 2j+1 outputs the inverted bits of the one from 2j, and so does the other input.'''
+    registers = 2*np.arange(32)
+    parity = lambda values: np.array([bin(value).count('1') & 1 for value in values])
+    signs = 1 - 2*np.stack((parity(registers & CONV_CODE_G1), parity(registers & CONV_CODE_G2)), axis=1).astype(np.float32)
+    signs = np.concatenate((signs, -signs))
+    signs.setflags(write=False)
+    return signs
+
+
+def depuncture(coded_llrs, code_rate):
+    '''Returns the (num_bits, 2) LLRs of the X and Y outputs of every input bit of the punctured coded stream,
+        with 0 (no information) for the punctured ones. An LLR is log(P(0)/P(1)) - positive for a 0 bit.'''
+    pattern = np.array(PUNCTURING_PATTERNS[code_rate]).T.reshape(-1).astype(bool)
+    num_periods = len(coded_llrs)//pattern.sum()
+    llrs = np.zeros((num_periods, len(pattern)), dtype = np.float32)
+    llrs[:, pattern] = np.reshape(coded_llrs[:num_periods*pattern.sum()], (num_periods, -1))
+    return llrs.reshape(-1, 2)
+
+
+def _viterbiDecodeWindows(windows, traceback_len):
+    '''Decodes (num_steps, 2, num_windows) windows of LLRs in lockstep - the add-compare-select of a step runs on
+        the 64 states of all the windows at once (as (64, num_windows) arrays). Returns the
+        (num_windows, num_steps - 2*traceback_len) bits of the middle of every window: the first traceback_len
+        steps only settle the path metrics and the last traceback_len steps let the survivor paths merge.'''
+    (num_steps, _, num_windows) = windows.shape
+    signs = getButterflySigns()
+    # Decision bit of state s goes to bit s % 8 of byte s // 8
+    decision_weights = np.zeros((8, 64), dtype = np.float32)
+    decision_weights[np.arange(64)//8, np.arange(64)] = 2**(np.arange(64) % 8)
+
+    path_metrics = np.zeros((64, num_windows), dtype = np.float32)
+    new_metrics = np.empty_like(path_metrics)
+    from_even = np.empty_like(path_metrics)
+    from_odd = np.empty_like(path_metrics)
+    is_odd = np.empty_like(path_metrics)
+    decisions = np.empty((num_steps, 8, num_windows), dtype = np.uint8)
+
+    for t in range(num_steps):
+        branch_metrics = (signs @ windows[t]).reshape(2, 32, num_windows)
+        np.add(path_metrics[0::2], branch_metrics, out=from_even.reshape(2, 32, num_windows))
+        np.subtract(path_metrics[1::2], branch_metrics, out=from_odd.reshape(2, 32, num_windows))
+        np.greater(from_odd, from_even, out=is_odd)
+        np.maximum(from_even, from_odd, out=new_metrics)
+        decisions[t] = decision_weights @ is_odd
+        (path_metrics, new_metrics) = (new_metrics, path_metrics)
+        if (t % 64 == 63):
+            path_metrics -= path_metrics.max(axis=0)
+
+    windows_range = np.arange(num_windows)
+    states = np.argmax(path_metrics, axis=0)
+    decoded_bits = np.empty((num_steps, num_windows), dtype = np.uint8)
+    for t in range(num_steps - 1, -1, -1):
+        decoded_bits[t] = states >> 5
+        chosen_odd = (decisions[t, states >> 3, windows_range] >> (states & 7)) & 1
+        states = ((states & 31) << 1) | chosen_odd
+    return decoded_bits[traceback_len:num_steps - traceback_len].T
+
+
+@Profiling.profiled(samples_arg='llrs')
+def viterbiDecode(llrs, block_len=VITERBI_BLOCK_LEN, traceback_len=VITERBI_TRACEBACK_LEN, num_workers=1):
+    '''Soft decision Viterbi decoding of the (num_bits, 2) X and Y LLRs of the convolutional code (depuncture) -
+        returns the decoded bits.
+
+        The bits are decoded in blocks of block_len. The window of every block starts traceback_len steps
+        before it and ends traceback_len steps after it (LLRs of 0 beyond the ends of the stream), and all the
+        windows are decoded in lockstep, so the Python loop runs over block_len + 2*traceback_len steps
+        whatever the length of the stream. With num_workers > 1 the blocks are split between processes.'''
+    llrs = np.asarray(llrs, dtype = np.float32).reshape(-1, 2)
+    num_bits = len(llrs)
+    num_blocks = -(-num_bits // block_len)
+    padded_llrs = np.zeros((num_blocks*block_len + 2*traceback_len, 2), dtype = np.float32)
+    padded_llrs[traceback_len:traceback_len + num_bits] = llrs
+    window_len = block_len + 2*traceback_len
+    windows = np.lib.stride_tricks.sliding_window_view(padded_llrs, window_len, axis=0)[::block_len][:num_blocks]
+    # (num_steps, 2, num_windows), so every step of the lockstep loop reads contiguous memory
+    windows = np.ascontiguousarray(windows.transpose(2, 1, 0))
+
+    if (num_workers > 1 and num_blocks > 1):
+        chunks = np.array_split(np.arange(num_blocks), min(num_workers, num_blocks))
+        with multiprocessing.Pool(num_workers) as pool:
+            decoded_chunks = pool.starmap(_viterbiDecodeWindows, [(windows[:, :, chunk], traceback_len) for chunk in chunks])
+        decoded_blocks = np.concatenate(decoded_chunks)
+    else:
+        decoded_blocks = _viterbiDecodeWindows(windows, traceback_len)
+    return decoded_blocks.reshape(-1)[:num_bits]
+
+
+def findPacketSync(decoded_bits):
+    '''Returns (bit_offset, byte_offset) of the first sync byte in the decoded bit stream. The outer
+        interleaver does not delay the sync bytes, so they are RS_PACKET_LEN bytes apart before deinterleaving.'''
+    best = (0, 0, -1)
+    for bit_offset in range(8):
+        stream = np.packbits(decoded_bits[bit_offset:])
+        num_packets = len(stream)//RS_PACKET_LEN
+        if (num_packets == 0):
+            break
+        packets = stream[:num_packets*RS_PACKET_LEN].reshape(num_packets, RS_PACKET_LEN)
+        sync_counts = np.sum((packets == TS_SYNC_BYTE) | (packets == TS_INVERTED_SYNC_BYTE), axis=0)
+        byte_offset = int(np.argmax(sync_counts))
+        if (sync_counts[byte_offset] > best[2]):
+            best = (bit_offset, byte_offset, sync_counts[byte_offset])
+    return best[:2]
+
+
+@Profiling.profiled(samples_arg='interleaved_bytes')
+def convolutionalDeinterleave(interleaved_bytes):
+    '''Inverse of the outer interleaver - interleaved_bytes must start with a sync byte. Returns the
+        deinterleaved bytes of the whole packets (the first 11 packets of the stream are still in the
+        deinterleaver and are lost).'''
+    delay = (CONV_INTERLEAVER_BRANCHES - 1)*CONV_INTERLEAVER_DEPTH*CONV_INTERLEAVER_BRANCHES
+    num_packets = (len(interleaved_bytes) - delay)//RS_PACKET_LEN
+    if (num_packets <= 0):
+        return np.zeros(0, dtype = np.uint8)
+    n = delay + np.arange(num_packets*RS_PACKET_LEN)
+    # Branch j = n % 12 of the deinterleaver delays by (11 - j)*17 branch cycles
+    return interleaved_bytes[n - (CONV_INTERLEAVER_BRANCHES - 1 - n % CONV_INTERLEAVER_BRANCHES)*CONV_INTERLEAVER_DEPTH*CONV_INTERLEAVER_BRANCHES]
+
+
+@functools.lru_cache(maxsize=None)
+def getSyndromePowers():
+    '''Returns the (read only) (204, 16) table of lambda^(j*(203-i)) - byte i of a codeword is the coefficient of
+        x^(203-i), so syndrome j (the codeword evaluated at lambda^j) is the XOR over i of byte i times
+        lambda^(j*(203-i))'''
+    byte_powers = RS_PACKET_LEN - 1 - np.arange(RS_PACKET_LEN)
+    powers = GF_EXP[(byte_powers[:, None]*np.arange(RS_PARITY_LEN)[None, :]) % 255].astype(np.uint8)
+    powers.setflags(write=False)
+    return powers
+
+
+def rsSyndromes(packets):
+    '''Returns the (num_packets, 16) syndromes of (num_packets, 204) codewords, computed for a whole batch of
+        packets at once with the multiplication table (all 0 for a codeword without errors)'''
+    powers = getSyndromePowers()
+    syndromes = np.zeros((len(packets), RS_PARITY_LEN), dtype = np.uint8)
+    for start in range(0, len(packets), RS_SYNDROME_BATCH):
+        batch = packets[start:start+RS_SYNDROME_BATCH]
+        syndromes[start:start+RS_SYNDROME_BATCH] = np.bitwise_xor.reduce(GF_MUL[batch[:, :, None], powers[None, :, :]], axis=1)
+    return syndromes
+
+
+def _rsSolve(syndromes):
+    '''Berlekamp-Massey, Chien search and Forney algorithm - returns (positions, values) of the errors of a
+        codeword (position 0 the first byte) from its syndromes, or None when they cannot be corrected'''
+    syndromes = [int(syndrome) for syndrome in syndromes]
+    error_locator = [1]
+    previous_locator = [1]
+    for n in range(RS_PARITY_LEN):
+        discrepancy = syndromes[n]
+        for i in range(1, min(len(error_locator), n + 1)):
+            discrepancy ^= gfMultiply(error_locator[i], syndromes[n - i])
+        previous_locator = [0] + previous_locator
+        if (discrepancy != 0):
+            if (len(previous_locator) > len(error_locator)):
+                new_locator = [gfMultiply(coefficient, discrepancy) for coefficient in previous_locator]
+                previous_locator = [gfMultiply(coefficient, gfInverse(discrepancy)) for coefficient in error_locator]
+                error_locator = new_locator
+            error_locator = gfPolyAdd(error_locator, [gfMultiply(coefficient, discrepancy) for coefficient in previous_locator])
+    while (len(error_locator) > 1 and error_locator[-1] == 0):
+        error_locator.pop()
+    num_errors = len(error_locator) - 1
+    if (2*num_errors > RS_PARITY_LEN):
+        return None
+
+    # Chien search of all the byte positions at once: the error locator of byte i is lambda^(203-i), so byte i
+    # is in error when the locator polynomial is 0 at lambda^-(203-i)
+    byte_powers = RS_PACKET_LEN - 1 - np.arange(RS_PACKET_LEN)
+    inverse_powers = GF_EXP[(-np.arange(len(error_locator))[:, None]*byte_powers[None, :]) % 255]
+    locator_values = np.bitwise_xor.reduce(GF_MUL[np.array(error_locator)[:, None], inverse_powers], axis=0)
+    positions = np.flatnonzero(locator_values == 0)
+    if (len(positions) != num_errors):
+        return None
+
+    # Forney algorithm (first root lambda^0): e = X * Omega(1/X) / Lambda'(1/X)
+    error_evaluator = [0]*RS_PARITY_LEN
+    for i in range(RS_PARITY_LEN):
+        for j in range(min(i + 1, len(error_locator))):
+            error_evaluator[i] ^= gfMultiply(error_locator[j], syndromes[i - j])
+    locator_derivative = [error_locator[i] if i % 2 == 1 else 0 for i in range(1, len(error_locator))]
+    values = []
+    for power in byte_powers[positions]:
+        X_inverse = int(GF_EXP[255 - power])
+        values.append(gfMultiply(int(GF_EXP[power]), gfMultiply(gfPolyEval(error_evaluator, X_inverse), gfInverse(gfPolyEval(locator_derivative, X_inverse)))))
+    return (positions, np.array(values, dtype = np.uint8))
+
+
+@Profiling.profiled(samples_arg='packets')
+def rsDecode(packets):
+    '''Reed-Solomon decoding of (num_packets, 204) bytes. The syndromes of all the packets are computed in
+        batches, and only the packets with errors go through the error locator search.
+
+        Returns (decoded_packets, num_corrected_bytes) - the (num_packets, 188) packets and the number of bytes
+        corrected in every packet (-1 for a packet with more errors than the code corrects)'''
+    packets = np.array(packets, dtype = np.uint8).reshape(-1, RS_PACKET_LEN)
+    num_corrected_bytes = np.zeros(len(packets), dtype = int)
+    syndromes = rsSyndromes(packets)
+    for i in np.flatnonzero(np.any(syndromes, axis=1)):
+        errors = _rsSolve(syndromes[i])
+        if (errors is None):
+            num_corrected_bytes[i] = -1
+            continue
+        (positions, values) = errors
+        packets[i, positions] ^= values
+        num_corrected_bytes[i] = len(positions)
+    return (packets[:, :TS_PACKET_LEN], num_corrected_bytes)
+
+
+@functools.lru_cache(maxsize=None)
+def getEnergyDispersalSequence():
+    '''Returns the (read only) 8*188 bytes the energy dispersal PRBS (1 + x^14 + x^15, initialized to
+        100101010000000 at every inverted sync byte) adds to a group of 8 packets. The PRBS runs during the
+        next 7 sync bytes, but is not added to them.'''
+    register = [1,0,0,1,0,1,0,1,0,0,0,0,0,0,0]
+    prbs_bits = np.zeros(8*(PACKETS_PER_SCRAMBLING_GROUP*TS_PACKET_LEN - 1), dtype = np.uint8)
+    for i in range(len(prbs_bits)):
+        prbs_bits[i] = register[13] ^ register[14]
+        register = [prbs_bits[i]] + register[:-1]
+    sequence = np.zeros(PACKETS_PER_SCRAMBLING_GROUP*TS_PACKET_LEN, dtype = np.uint8)
+    sequence[1:] = np.packbits(prbs_bits)
+    sequence[::TS_PACKET_LEN] = 0
+    sequence.setflags(write=False)
+    return sequence
+
+
+def findScramblingGroupStart(packets):
+    '''Returns the index of the first packet of the first whole group of 8 packets - the groups start at the
+        inverted sync bytes (0 when there is none)'''
+    group_starts = np.flatnonzero(packets[:, 0] == TS_INVERTED_SYNC_BYTE)
+    return group_starts[0] % PACKETS_PER_SCRAMBLING_GROUP if len(group_starts) > 0 else 0
+
+
+@Profiling.profiled(samples_arg='packets')
+def energyDescramble(packets):
+    '''Removes the energy dispersal from the whole groups of 8 packets of (num_packets, 188) packets, from
+        findScramblingGroupStart(packets) on. Returns the descrambled packets with 0x47 sync bytes.'''
+    first = findScramblingGroupStart(packets)
+    num_groups = (len(packets) - first)//PACKETS_PER_SCRAMBLING_GROUP
+    groups = packets[first:first + num_groups*PACKETS_PER_SCRAMBLING_GROUP].reshape(num_groups, -1) ^ getEnergyDispersalSequence()
+    descrambled_packets = groups.reshape(-1, TS_PACKET_LEN)
+    descrambled_packets[:, 0] = TS_SYNC_BYTE
+    return descrambled_packets
+
+
+class TPSParameters:
+    '''Transmission parameters signalled by the TPS carriers of a frame (EN 300 744 section 4.6.2).
+        frame_start is the index of the frame's first symbol in the symbols decoded, so the
+        symbol_index_in_frame of the first symbol is (-frame_start) % 68.'''
+    def __init__(self, frame_index, constellation, hierarchy, code_rate_HP, code_rate_LP, cyclic_prefix, mode, cell_id, frame_start):
+        self.frame_index = frame_index
+        self.constellation = constellation
+        self.hierarchy = hierarchy
+        self.code_rate_HP = code_rate_HP
+        self.code_rate_LP = code_rate_LP
+        self.cyclic_prefix = cyclic_prefix
+        self.mode = mode
+        self.cell_id = cell_id
+        self.frame_start = frame_start
+
+    @property
+    def symbol_index_in_frame(self):
+        return (-self.frame_start) % DVBTSynthesizer.SYMBOLS_PER_FRAME
+
+    def __repr__(self):
+        return ("TPSParameters(frame_index={}, constellation='{}', hierarchy={}, code_rate_HP='{}', code_rate_LP='{}', "
+                "cyclic_prefix={}, mode={}, cell_id={}, frame_start={})").format(self.frame_index, self.constellation, self.hierarchy,
+                self.code_rate_HP, self.code_rate_LP, self.cyclic_prefix, self.mode, self.cell_id, self.frame_start)
+
+
+def _invertTable(table):
+    return {value: key for (key, value) in table.items()}
+
+TPS_CONSTELLATION_VALUES = _invertTable(DVBTSynthesizer.TPS_CONSTELLATIONS)
+TPS_HIERARCHY_VALUES = _invertTable(DVBTSynthesizer.TPS_HIERARCHIES)
+TPS_CODE_RATE_VALUES = _invertTable(DVBTSynthesizer.TPS_CODE_RATES)
+TPS_GUARD_INTERVAL_VALUES = _invertTable(DVBTSynthesizer.TPS_GUARD_INTERVALS)
+TPS_MODE_VALUES = _invertTable(DVBTSynthesizer.TPS_MODES)
+
+
+def _bitsToInt(bits):
+    return int(np.dot(bits, 1 << np.arange(len(bits) - 1, -1, -1)))
+
+
+def demodulateTPSBits(symbols, K):
+    '''DBPSK demodulation of the TPS carriers of (num_symbols, K) carriers - returns the num_symbols-1 bits
+        of the phase changes from every symbol to the next, all the TPS carriers of a symbol combined. The
+        carriers need not be equalized, as long as the channel changes slowly from symbol to symbol.'''
+    tps_carriers = np.asarray(symbols)[:, MyDVBT.getPilotTables(K).TPS_pos]
+    phase_changes = np.sum((tps_carriers[1:] * np.conj(tps_carriers[:-1])).real, axis=1)
+    return (phase_changes < 0).astype(np.uint8)
+
+
+def parseTPSBits(tps_bits, frame_start=0):
+    '''Returns the TPSParameters of the 68 TPS bits s0...s67 of a frame, or None when they are not a valid TPS
+        block (no sync word, unknown values or a BCH parity error)'''
+    tps_bits = np.asarray(tps_bits)
+    sync_word = tps_bits[1:17].tolist()
+    if sync_word not in DVBTSynthesizer.TPS_SYNC_WORDS:
+        return None
+    length_indicator = tps_bits[17:23].tolist()
+    if length_indicator not in ([0,1,0,1,1,1], [0,1,1,1,1,1]):
+        return None
+    if not np.array_equal(DVBTSynthesizer.encodeTPSBCH(tps_bits[1:54]), tps_bits[54:68]):
+        return None
+
+    fields = [_bitsToInt(tps_bits[start:end]) for (start, end) in ((23, 25), (25, 27), (27, 30), (30, 33), (33, 36), (36, 38), (38, 40), (40, 48))]
+    (frame_index, constellation, hierarchy, code_rate_HP, code_rate_LP, guard_interval, mode, cell_id) = fields
+    if (constellation not in TPS_CONSTELLATION_VALUES or hierarchy not in TPS_HIERARCHY_VALUES or mode not in TPS_MODE_VALUES
+            or code_rate_HP not in TPS_CODE_RATE_VALUES or code_rate_LP not in TPS_CODE_RATE_VALUES):
+        return None
+    # Frames 1 and 3 carry the cell id's high byte, frames 2 and 4 its low byte
+    if (length_indicator[2] == 0):
+        cell_id = None
+
+    return TPSParameters(frame_index, TPS_CONSTELLATION_VALUES[constellation], TPS_HIERARCHY_VALUES[hierarchy],
+                         TPS_CODE_RATE_VALUES[code_rate_HP], TPS_CODE_RATE_VALUES[code_rate_LP],
+                         TPS_GUARD_INTERVAL_VALUES[guard_interval], TPS_MODE_VALUES[mode], cell_id, frame_start)
+
+
+_channel_tps = {}
+
+def getChannelTPS(channel):
+    '''Returns the TPSParameters last decoded for channel (any key, e.g. the center frequency), or None'''
+    return _channel_tps.get(channel)
+
+
+@Profiling.profiled(samples_arg='symbols')
+def decodeTPS(symbols, mode, channel=None):
+    '''Decodes the TPS of the first whole frame in (num_symbols, K) carriers (or the flat output of
+        removeChannelResponse) - needs up to 2 frames (136 symbols) when the symbols do not start a frame.
+        The TPS of every frame is checked (sync word and BCH parity) until one is valid.
+
+        Returns the TPSParameters (also kept as the channel's parameters when channel is given), or None
+        when no frame has a valid TPS block.'''
+    K = MyDVBT.DVBTModeParams(mode, 4)[1]
+    symbols = np.asarray(symbols).reshape(-1, K)
+    # Bit j of the frame starting at symbol f is the phase change from symbol f+j-1 to f+j (s0 is not sent)
+    phase_change_bits = demodulateTPSBits(symbols, K)
+    frame_len = DVBTSynthesizer.SYMBOLS_PER_FRAME
+    sync_words = [np.array(sync_word) for sync_word in DVBTSynthesizer.TPS_SYNC_WORDS]
+    for frame_start in range(len(symbols) - frame_len + 1):
+        frame_bits = phase_change_bits[frame_start:frame_start + frame_len - 1]
+        if not any(np.array_equal(frame_bits[:16], sync_word) for sync_word in sync_words):
+            continue
+        tps = parseTPSBits(np.concatenate(([0], frame_bits)), frame_start)
+        if (tps is not None):
+            if (channel is not None):
+                _channel_tps[channel] = tps
+            return tps
+    return None
+
+
+@Profiling.profiled(samples_arg='equalized_signal')
+def demodulateLLRs(equalized_signal, mode, constellation='16QAM', alpha=1, symbol_index_in_frame=0, noise_var=1):
+    '''Returns the LLRs of the coded (punctured) bit stream of the equalized K carriers of every OFDM symbol -
+        data cell extraction, symbol deinterleaving, soft demapping (demapCellsLLR) and bit deinterleaving, each
+        a single gather or array expression over all the symbols. With hierarchical transmission (alpha > 1)
+        the stream holds the high and low priority bits as the demultiplexer interleaved them. noise_var is
+        a scalar or the noise variance of every carrier, in the (num_symbols, K) shape of the carriers.'''
+    K = MyDVBT.DVBTModeParams(mode, 4)[1]
+    data_cells = extractDataCells(equalized_signal, K, symbol_index_in_frame)
+    data_cells = symbolDeinterleave(data_cells, mode, symbol_index_in_frame)
+    if (np.ndim(noise_var) == 2):
+        noise_var = symbolDeinterleave(extractDataCells(noise_var, K, symbol_index_in_frame), mode, symbol_index_in_frame).reshape(-1)
+    llr_words = demapCellsLLR(data_cells.reshape(-1), constellation, alpha, noise_var)
+    return bitDeinterleave(llr_words)
+
+
+@Profiling.profiled(samples_arg='equalized_signal')
+def decodeTransportStream(equalized_signal, mode, constellation=None, code_rate=None, symbol_index_in_frame=None, num_workers=1):
+    '''Decodes the equalized K carriers of every OFDM symbol (removeChannelResponse) to transport stream packets.
+
+        Inputs:
+        -------
+        mode : int
+            2 or 8 (2k or 8k mode)
+        constellation, code_rate : str
+            'QPSK', '16QAM' or '64QAM', and the (high priority) code rate '1/2', '2/3', '3/4', '5/6' or '7/8'
+            (non hierarchical transmission) - decoded from the TPS (decodeTPS) when None
+        symbol_index_in_frame : int
+            Index of the first symbol in its frame (only its value modulo 4 matters) - taken from the TPS when
+            it is decoded, and found from the scattered pilots otherwise
+        num_workers : int
+            Processes the Viterbi decoder splits its blocks between
+
+        Outputs:
+        --------
+        (packets, num_corrected_bytes) : the (num_packets, 188) uint8 packets and the bytes the Reed-Solomon
+            decoder corrected in every packet - -1 when it could not (their transport error indicator is set)
+        '''
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, 4)
+    equalized_signal = np.asarray(equalized_signal).reshape(-1)
+    symbols = equalized_signal[:len(equalized_signal)//K*K].reshape(-1, K)
+    if (constellation is None or code_rate is None):
+        tps = decodeTPS(symbols, mode)
+        if (tps is None):
+            raise ValueError("No valid TPS found! The constellation and code rate must be given")
+        if (tps.hierarchy is not None):
+            raise ValueError("Hierarchical transmission is not supported")
+        constellation = tps.constellation if constellation is None else constellation
+        code_rate = tps.code_rate_HP if code_rate is None else code_rate
+        symbol_index_in_frame = tps.symbol_index_in_frame if symbol_index_in_frame is None else symbol_index_in_frame
+    if (symbol_index_in_frame is None):
+        symbol_index_in_frame = MyDVBT.findScatteredPilotsPhase(symbols[:8])
+
+    coded_llrs = demodulateLLRs(symbols, mode, constellation, 1, symbol_index_in_frame)
+    decoded_bits = viterbiDecode(depuncture(coded_llrs, code_rate), num_workers=num_workers)
+
+    (bit_offset, byte_offset) = findPacketSync(decoded_bits)
+    interleaved_bytes = np.packbits(decoded_bits[bit_offset:])[byte_offset:]
+    (packets, num_corrected_bytes) = rsDecode(convolutionalDeinterleave(interleaved_bytes))
+
+    first = findScramblingGroupStart(packets)
+    packets = energyDescramble(packets)
+    num_corrected_bytes = num_corrected_bytes[first:first + len(packets)]
+    packets[num_corrected_bytes < 0, 1] |= 0x80
+
+    return (packets, num_corrected_bytes)
+
+
+def writeTransportStream(packets, Filename, append=False):
+    '''Writes the (num_packets, 188) packets to a .ts file'''
+    with open(Filename, 'ab' if append else 'wb') as ts_file:
+        np.asarray(packets, dtype = np.uint8).tofile(ts_file)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+'''DVB-T test signal synthesizer (ETSI EN 300 744).
+
+    Generates whole superframes (4 frames of 68 OFDM symbols) with random data cells, continuous pilots,
+    scattered pilots and TPS pilots for any mode and guard interval, at the DVB-T sample rate of 64/7 MHz.
+    The OFDM modulation of a whole frame is a single batched IFFT (MyDVBT.modulateOFDMSymbols), so
+    synthesis runs faster than real time and can produce long captures for load testing:
+
+        for superframe in synthesizeDVBTStream(8, 4, num_superframes=100, snr_db=20):
+            ...
+'''
+import functools
+import numpy as np
+from . import DSPBlocks
+from . import MyDVBT
+
+DVBT_FS = int(64e6/7)
+SYMBOLS_PER_FRAME = 68
+FRAMES_PER_SUPERFRAME = 4
+
+BITS_PER_CELL = {'QPSK': 2, '16QAM': 4, '64QAM': 6}
+
+# TPS field values (EN 300 744 section 4.6.2)
+TPS_SYNC_WORDS = ([0,0,1,1,0,1,0,1,1,1,1,0,1,1,1,0], [1,1,0,0,1,0,1,0,0,0,0,1,0,0,0,1])
+TPS_CONSTELLATIONS = {'QPSK': 0, '16QAM': 1, '64QAM': 2}
+TPS_HIERARCHIES = {None: 0, 1: 1, 2: 2, 4: 3}
+TPS_CODE_RATES = {'1/2': 0, '2/3': 1, '3/4': 2, '5/6': 3, '7/8': 4}
+TPS_GUARD_INTERVALS = {32: 0, 16: 1, 8: 2, 4: 3}
+TPS_MODES = {2: 0, 8: 1}
+TPS_BCH_GENERATOR = [1,0,0,0,0,1,1,0,1,1,1,0,1,1,1]   # x^14 + x^9 + x^8 + x^6 + x^5 + x^4 + x^2 + x + 1
+
+
+def toBits(value, num_bits):
+    return [(value >> (num_bits - 1 - i)) & 1 for i in range(num_bits)]
+
+
+def createQAMConstellation(bits_per_cell, alpha=1):
+    '''Returns the normalized constellation points, indexed by the cell's bits y0...y(v-1) (y0 is the MSB).
+        Real part is set by y0,y2,y4 and imaginary part by y1,y3,y5 (Gray mapping, y0/y1 are the signs).
+        alpha is the hierarchical constellation ratio (1 for non hierarchical transmission).'''
+
+    bits = (np.arange(2**bits_per_cell)[:, None] >> np.arange(bits_per_cell - 1, -1, -1)) & 1
+
+    def axisLevels(axis_bits):
+        sign = 1 - 2*axis_bits[:, 0]
+        if (axis_bits.shape[1] == 1):
+            return sign
+        if (axis_bits.shape[1] == 2):
+            return sign * (alpha + 1 + (1 - 2*axis_bits[:, 1]))
+        return sign * (alpha + 3 + (1 - 2*axis_bits[:, 1]) * (2 + (1 - 2*axis_bits[:, 2])))
+
+    constellation = axisLevels(bits[:, 0::2]) + 1j*axisLevels(bits[:, 1::2])
+
+    return constellation / np.sqrt(np.mean(np.abs(constellation)**2))
+
+
+def encodeTPSBCH(info_bits):
+    '''Returns the 14 parity bits of the shortened BCH(67,53) code protecting TPS bits s1-s53'''
+    register = np.concatenate((info_bits, np.zeros(14, dtype=int)))
+    for i in range(len(info_bits)):
+        if register[i]:
+            register[i:i+15] ^= TPS_BCH_GENERATOR
+    return register[len(info_bits):]
+
+
+def createTPSBits(frame_index, mode, cyclic_prefix, constellation='16QAM', hierarchy=None, code_rate_HP='2/3', code_rate_LP='1/2', cell_id=None):
+    '''Returns the 68 TPS bits s0-s67 of frame frame_index (0-3) in the superframe'''
+
+    bits = [0]
+    bits += TPS_SYNC_WORDS[frame_index % 2]
+    bits += [0,1,1,1,1,1] if cell_id is not None else [0,1,0,1,1,1]
+    bits += toBits(frame_index, 2)
+    bits += toBits(TPS_CONSTELLATIONS[constellation], 2)
+    bits += toBits(TPS_HIERARCHIES[hierarchy], 3)
+    bits += toBits(TPS_CODE_RATES[code_rate_HP], 3)
+    bits += toBits(TPS_CODE_RATES[code_rate_LP], 3)
+    bits += toBits(TPS_GUARD_INTERVALS[cyclic_prefix], 2)
+    bits += toBits(TPS_MODES[mode], 2)
+    bits += toBits(0 if cell_id is None else (cell_id >> (8 if frame_index % 2 == 0 else 0)) & 0xff, 8)
+    bits += [0,0,0,0,0,0]
+    bits = np.array(bits)
+
+    return np.concatenate((bits, encodeTPSBCH(bits[1:])))
+
+
+def createTPSFrame(tps_reference, tps_bits):
+    '''DBPSK modulation of the TPS bits - returns a (68, num_TPS_carriers) array of the TPS carriers' values.
+        tps_reference is the value of the TPS carriers in symbol 0, 2(1/2 - w_k).'''
+
+    # Every 1 bit after s0 inverts the phase of all the TPS carriers
+    signs = np.cumprod(np.concatenate(([1], 1 - 2*tps_bits[1:])))
+
+    return signs[:, None] * tps_reference[None, :]
+
+
+@functools.lru_cache(maxsize=None)
+def getFrameTemplate(mode):
+    '''Returns (pilots, data_mask, tps_pos, tps_reference) of a frame - pilots is a (68, K) array of the
+        continuous and scattered pilots, data_mask marks the data carriers of each symbol'''
+
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, 4)
+    tables = MyDVBT.getPilotTables(K)
+
+    pilots = np.tile(tables.scattered_pilots_symbols + tables.continuous_pilots_vec, (SYMBOLS_PER_FRAME//4, 1))
+    data_mask = np.tile(tables.data_mask, (SYMBOLS_PER_FRAME//4, 1))
+
+    if not np.all(data_mask.sum(axis=1) == data_carriers_per_symbol):
+        raise ValueError("Invalid pilot tables! Every symbol must have {} data carriers".format(data_carriers_per_symbol))
+
+    for array in (pilots, data_mask):
+        array.setflags(write=False)
+
+    return (pilots, data_mask, tables.TPS_pos, tables.TPS_reference)
+
+
+def createDVBTFrameCarriers(mode, cyclic_prefix, frame_index, constellation='16QAM', hierarchy=None, code_rate_HP='2/3', code_rate_LP='1/2', data_cells=None, rng=None, out=None):
+    '''Returns the (68, K) carriers of frame frame_index (0-3) of a superframe.
+        data_cells (68*data_carriers_per_symbol constellation points) are random when not given.'''
+
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+    (pilots, data_mask, tps_pos, tps_reference) = getFrameTemplate(mode)
+
+    if (data_cells is None):
+        if (rng is None):
+            rng = np.random.default_rng()
+        points = createQAMConstellation(BITS_PER_CELL[constellation], 1 if hierarchy is None else hierarchy)
+        data_cells = points[rng.integers(0, len(points), SYMBOLS_PER_FRAME*data_carriers_per_symbol)]
+
+    if (out is None):
+        out = np.empty((SYMBOLS_PER_FRAME, K), dtype=complex)
+    out[:] = pilots
+    out[data_mask] = data_cells
+    tps_bits = createTPSBits(frame_index, mode, cyclic_prefix, constellation, hierarchy, code_rate_HP, code_rate_LP)
+    out[:, tps_pos] = createTPSFrame(tps_reference, tps_bits)
+
+    return out
+
+
+def synthesizeDVBTSuperframe(mode, cyclic_prefix, constellation='16QAM', hierarchy=None, code_rate_HP='2/3', code_rate_LP='1/2', rng=None, out=None):
+    '''Returns the time domain samples of a whole superframe (4*68 OFDM symbols) with random data cells'''
+
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+
+    carriers = np.empty((FRAMES_PER_SUPERFRAME*SYMBOLS_PER_FRAME, K), dtype=complex)
+    for frame_index in range(FRAMES_PER_SUPERFRAME):
+        createDVBTFrameCarriers(mode, cyclic_prefix, frame_index, constellation, hierarchy, code_rate_HP, code_rate_LP, rng=rng,
+                                out=carriers[frame_index*SYMBOLS_PER_FRAME:(frame_index+1)*SYMBOLS_PER_FRAME])
+
+    return MyDVBT.modulateOFDMSymbols(FFT_len, K, CP_len, carriers, out)
+
+
+def addChannelImpairments(signal, fs, snr_db=None, freq_offset=0, rng=None):
+    '''Adds a carrier frequency offset (in Hz) and white gaussian noise at snr_db to the signal (in place)'''
+
+    if (freq_offset != 0):
+        DSPBlocks.NCO(freq_offset, fs).mix(signal, out=signal)
+    if (snr_db is not None):
+        if (rng is None):
+            rng = np.random.default_rng()
+        noise_std = np.sqrt(np.vdot(signal, signal).real / len(signal) / 10**(snr_db/10) / 2)
+        noise = rng.standard_normal(2*len(signal), dtype=np.float32).view(np.complex64)
+        noise *= noise_std
+        signal += noise
+
+    return signal
+
+
+def synthesizeDVBTStream(mode, cyclic_prefix, num_superframes=1, constellation='16QAM', hierarchy=None, code_rate_HP='2/3', code_rate_LP='1/2', snr_db=None, seed=None):
+    '''Yields num_superframes consecutive superframes as complex64 blocks (num_superframes=None never stops)'''
+
+    rng = np.random.default_rng(seed)
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+    superframe_len = FRAMES_PER_SUPERFRAME*SYMBOLS_PER_FRAME*(FFT_len + CP_len)
+    superframe_index = 0
+    while (num_superframes is None or superframe_index < num_superframes):
+        superframe = np.empty(superframe_len, dtype=np.complex64)
+        synthesizeDVBTSuperframe(mode, cyclic_prefix, constellation, hierarchy, code_rate_HP, code_rate_LP, rng, out=superframe)
+        yield addChannelImpairments(superframe, DVBT_FS, snr_db, 0, rng)
+        superframe_index += 1
+
+
+def synthesizeDVBTSignal(mode, cyclic_prefix, num_superframes=1, constellation='16QAM', hierarchy=None, code_rate_HP='2/3', code_rate_LP='1/2', snr_db=None, freq_offset=0, time_offset=0, seed=None):
+    '''Returns a complex64 DVB-T capture at 64/7 MHz of num_superframes superframes, preceded by time_offset
+        samples of noise (or zeros) and shifted by freq_offset Hz.
+
+        Returns (signal, fs)'''
+
+    rng = np.random.default_rng(seed)
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+    superframe_len = FRAMES_PER_SUPERFRAME*SYMBOLS_PER_FRAME*(FFT_len + CP_len)
+
+    signal = np.zeros(time_offset + num_superframes*superframe_len, dtype=np.complex64)
+    for i in range(num_superframes):
+        start = time_offset + i*superframe_len
+        synthesizeDVBTSuperframe(mode, cyclic_prefix, constellation, hierarchy, code_rate_HP, code_rate_LP, rng, out=signal[start:start+superframe_len])
+
+    return (addChannelImpairments(signal, DVBT_FS, snr_db, freq_offset, rng), DVBT_FS)
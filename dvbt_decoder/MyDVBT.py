@@ -0,0 +1,1141 @@
+import cmath
+import os
+import numpy as np
+from xml.dom import minidom
+from . import DSPBlocks
+from . import Profiling
+from . import Record
+def extractParamsFromXhdr(samples_file_path, xhdr_filename):
+    
+    header_file = minidom.parse(samples_file_path + xhdr_filename)
+    parameters = header_file.getElementsByTagName('capture')
+    # Record.writeXhdr writes the rates with str(), e.g. "20000000.0" - whole rates are returned as int
+    fs = float(parameters[0].attributes['sample_rate'].value)
+    fs = int(fs) if fs.is_integer() else fs
+    bw = float(parameters[0].attributes['span'].value)
+    bw = int(bw) if bw.is_integer() else bw
+    fc = float(parameters[0].attributes['center_frequency'].value)
+    parameters = header_file.getElementsByTagName('data')
+    N = int(parameters[0].attributes['samples'].value)
+    
+    return (fs, N, bw, fc)
+
+
+def extractSamplesFromXdat(samples_file_path, xdat_filename, offset=0, count=None):
+    '''Reads count complex64 samples (default - all) starting at sample offset through a memory map,
+        so only the requested part of the recording is read from disk'''
+    
+    iq_data = Record.parse_xdat(samples_file_path + xdat_filename, offset, count)
+    
+    return iq_data
+
+def getSamplesFromRecording(samples_file_path, xdat_filename, xhdr_filename, offset=0, duration=None):
+    '''duration (in seconds) limits the samples read, e.g. duration=5e-3 is enough for isAnyDVBTSignal'''
+    
+    (fs, N, bw, fc) = extractParamsFromXhdr(samples_file_path, xhdr_filename)
+    count = None if duration is None else int(np.ceil(duration*fs))
+    iq_data = extractSamplesFromXdat(samples_file_path, xdat_filename, offset, count)
+    N = len(iq_data)
+    
+    return (iq_data, fs, N, bw, fc)
+    
+def saveSamplesToXDAT(data, samples_file_path, xdat_filename, data_type="int16"):
+    data.astype(data_type).tofile(samples_file_path + xdat_filename)
+    
+# The plot functions are in the Plotting submodule, which loads matplotlib - it is imported on first use
+PLOT_FUNCTIONS = ('plotPSD', 'plotScatter', 'plotStem', 'plotPlot')
+
+def __getattr__(name):
+    if name in PLOT_FUNCTIONS:
+        from . import Plotting
+        return getattr(Plotting, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    
+    
+def printValues(values, *value_names):
+    try:
+        if len(value_names) == 0:
+            i = 1
+            for value in values:
+                print("Value{} = {}".format(i,value))
+                i += 1
+        else:
+            i = 0
+            for value in values:
+                print("{} = {}".format(value_names[i],value))
+                i += 1
+    
+    except TypeError:
+        if len(value_names) == 0:
+            print("Value1 = {}".format(values))
+
+        else:
+            print("{} = {}".format(value_names,values))
+            
+    except IndexError:
+        print("Not enough variable names indicated!")
+        
+
+# Directory where lowPassFilterDVBT designs are kept between runs (None - keep them in memory only)
+FILTER_CACHE_DIR = os.environ.get('DVBT_FILTER_CACHE_DIR')
+
+_lpf_designs = {}
+
+def designLowPassFilterDVBT(fs, ch_bw=7.61e6, transition_bw=5e3, n_taps=5000, cache_dir=None):
+    '''Returns the (read only) taps of the DVB-T channel low pass filter.
+    
+        The remez design takes seconds, so every design is done once and kept in memory, and also saved
+        to cache_dir (default - FILTER_CACHE_DIR) when given, to be loaded by later runs.'''
+    key = (float(fs), float(ch_bw), float(transition_bw), int(n_taps))
+    if key in _lpf_designs:
+        return _lpf_designs[key]
+    
+    if (cache_dir is None):
+        cache_dir = FILTER_CACHE_DIR
+    cache_filename = None
+    if (cache_dir is not None):
+        cache_filename = os.path.join(cache_dir, 'lpf_{!r}_{!r}_{!r}_{}.npy'.format(*key))
+    
+    if (cache_filename is not None and os.path.isfile(cache_filename)):
+        lpf = np.load(cache_filename)
+    else:
+        import scipy.signal as sig
+        with Profiling.stage('remez', n_taps):
+            lpf = sig.remez(n_taps, [0, ch_bw/2, ch_bw/2 + transition_bw, fs/2], [1,0], fs=fs)
+        if (cache_filename is not None):
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(cache_filename, lpf)
+    
+    lpf.setflags(write=False)
+    _lpf_designs[key] = lpf
+    return lpf
+
+
+@Profiling.profiled(samples_arg='iq_data')
+def lowPassFilterDVBT(iq_data, fs, ch_bw=7.61e6, transition_bw=5e3, n_taps=5000, get_plot=False):
+    '''Filters the DVB-T channel with an overlap-save FFT convolution (same output as sig.lfilter with the
+        designLowPassFilterDVBT taps), done in blocks so the memory use does not grow with the filter'''
+    lpf = designLowPassFilterDVBT(fs, ch_bw, transition_bw, n_taps)
+    filtered_signal = DSPBlocks.FFTConvolver(lpf).filter(iq_data)
+    if (get_plot):
+        from . import Plotting
+        Plotting.plotFilterResponse(lpf, fs)
+    return filtered_signal
+
+
+def DVBTModeParams(mode, cyclic_prefix):
+    """Returns the DVBT signal's parameters based on the mode and cyclic prefix factor.
+
+        Inputs:
+        -------
+        mode : int
+            Possible modes are: 2 (for 2k mode) or 8 (for 8k mode).
+        
+        cyclic_prefix : int
+            Possible factor values are: 4 (for 1/4), 8 (for 1/8), 16 (for 1/16) or 32 (for 1/32).
+
+        Outputs:
+        --------
+        FFT_len : int
+            The length of the FFT - 2048 for 2k mode or 8192 for 8k mode.
+        
+        K : int
+            The number of carriers in the signal in frequency domain without the guardband - 
+            1705 for 2k mode and 6817 for 8k mode.
+            These carriers include the data carriers, the pilot carriers and the TPS pilot carriers.
+            
+        CP_len : int
+            The number of cyclic prefix bins - equals to the FFT length divided by the cyclic prefix
+            factor, rounded down.
+        
+        data_carriers_per_symbol : int
+            The number of data subcarriers in frequency domain - 1512 for 2k mode or 6048 for 8k mode.
+        """
+    if (mode == 2):
+        FFT_len = 2048
+        K = 1705
+        data_carriers_per_symbol = 1512
+    elif (mode == 8):
+        FFT_len = 8192
+        K = 6817
+        data_carriers_per_symbol = 6048
+    else:
+        raise ValueError("Invalid mode! Possible modes are: 2 (2k mode) or 8 (8k mode)") 
+    
+    if not (cyclic_prefix == 4 or cyclic_prefix == 8 or cyclic_prefix == 16 or cyclic_prefix == 32):  
+        raise ValueError("Invalid cyclic prefix! Possible values are: 4 (1/4), 8 (1/8), 16 (1/16) or 32 (1/32)")
+    
+    return (FFT_len, K, FFT_len//cyclic_prefix, data_carriers_per_symbol)
+
+
+# Continuous and TPS pilot positions of 8k mode - 2k mode uses the ones below 1705
+CONTINUOUS_PILOTS_POS = np.array([0,    48,   54,   87,   141,  156,  192,  201,  255,  279,  282,  333,
+                                  432,  450,  483,  525,  531,  618,  636,  714,  759,  765,  780,  804,
+                                  873,  888,  918,  939,  942,  969,  984,  1050, 1101, 1107, 1110, 1137,
+                                  1140, 1146, 1206, 1269, 1323, 1377, 1491, 1683, 1704, 1752, 1758, 1791,
+                                  1845, 1860, 1896, 1905, 1959, 1983, 1986, 2037, 2136, 2154, 2187, 2229,
+                                  2235, 2322, 2340, 2418, 2463, 2469, 2484, 2508, 2577, 2592, 2622, 2643,
+                                  2646, 2673, 2688, 2754, 2805, 2811, 2814, 2841, 2844, 2850, 2910, 2973,
+                                  3027, 3081, 3195, 3387, 3408, 3456, 3462, 3495, 3549, 3564, 3600, 3609,
+                                  3663, 3687, 3690, 3741, 3840, 3858, 3891, 3933, 3939, 4026, 4044, 4122,
+                                  4167, 4173, 4188, 4212, 4281, 4296, 4326, 4347, 4350, 4377, 4392, 4458,
+                                  4509, 4515, 4518, 4545, 4548, 4554, 4614, 4677, 4731, 4785, 4899, 5091,
+                                  5112, 5160, 5166, 5199, 5253, 5268, 5304, 5313, 5367, 5391, 5394, 5445,
+                                  5544, 5562, 5595, 5637, 5643, 5730, 5748, 5826, 5871, 5877, 5892, 5916,
+                                  5985, 6000, 6030, 6051, 6054, 6081, 6096, 6162, 6213, 6219, 6222, 6249,
+                                  6252, 6258, 6318, 6381, 6435, 6489, 6603, 6795, 6816])
+
+TPS_PILOTS_POS = np.array([34,   50,   209,  346,  413,  569,  595,  688,  790,  901,  1073, 1219,
+                           1262, 1286, 1469, 1594, 1687, 1738, 1754, 1913, 2050, 2117, 2273, 2299,
+                           2392, 2494, 2605, 2777, 2923, 2966, 2990, 3173, 3298, 3391, 3442, 3458,
+                           3617, 3754, 3821, 3977, 4003, 4096, 4198, 4309, 4481, 4627, 4670, 4694,
+                           4877, 5002, 5095, 5146, 5162, 5321, 5458, 5525, 5681, 5707, 5800, 5902,
+                           6013, 6185, 6331, 6374, 6398, 6581, 6706, 6799])
+
+
+def createPRBS(K):
+    '''Create PRBS (Pseudo-Random Binary Sequence) for pilot values.
+        Use getPilotTables(K).PRBS instead of calling this for every symbol.'''
+    # Bit i of the register is init_seq[i] of the X^11 + X^2 + 1 generator, all ones initially
+    register = 0b11111111111
+    PRBS = np.zeros(K)
+
+    for i in range(0,K):
+        output_bit = (register >> 10) & 1
+        PRBS[i] = output_bit
+        register = ((register << 1) & 0b11111111111) | (output_bit ^ ((register >> 8) & 1))
+    
+    return PRBS
+
+
+class PilotTables:
+    '''Pilot tables of one transmission mode (the pilots do not depend on the cyclic prefix).
+        All the arrays are read only.
+        
+        PRBS : the pilot PRBS w_k of the K carriers
+        continuous_pilots_pos, continuous_pilots_values : positions and values of the continuous pilots
+        continuous_pilots_vec : length K vector of the continuous pilots
+        scattered_pilots_pos[p], scattered_pilots_values[p] : positions and values of the scattered pilots of
+            the symbols with symbol_index_in_frame % 4 == p (including the ones on continuous pilots)
+        scattered_pilots_symbols : (4, K) scattered pilots without the ones on continuous pilots
+        TPS_pos, TPS_reference : positions of the TPS pilots and their values in the frame's first symbol
+        data_mask : (4, K) boolean mask of the data carriers of pattern p
+    '''
+    
+    def __init__(self, K):
+        self.K = K
+        self.PRBS = createPRBS(K)
+        pilot_values = 4*(1-2*self.PRBS)/3
+        
+        self.continuous_pilots_pos = CONTINUOUS_PILOTS_POS[CONTINUOUS_PILOTS_POS < K]
+        self.continuous_pilots_values = pilot_values[self.continuous_pilots_pos].astype(complex)
+        self.continuous_pilots_vec = np.zeros(K, dtype = complex)
+        self.continuous_pilots_vec[self.continuous_pilots_pos] = self.continuous_pilots_values
+        
+        self.scattered_pilots_pos = tuple(np.arange(3*p, K, 12) for p in range(4))
+        self.scattered_pilots_values = tuple(pilot_values[pos].astype(complex) for pos in self.scattered_pilots_pos)
+        self.scattered_pilots_symbols = np.zeros((4, K), dtype = complex)
+        for p in range(4):
+            self.scattered_pilots_symbols[p, self.scattered_pilots_pos[p]] = self.scattered_pilots_values[p]
+        self.scattered_pilots_symbols[:, self.continuous_pilots_pos] = 0
+        
+        self.TPS_pos = TPS_PILOTS_POS[TPS_PILOTS_POS < K]
+        self.TPS_reference = 1 - 2*self.PRBS[self.TPS_pos]
+        
+        self.data_mask = (self.scattered_pilots_symbols == 0)
+        self.data_mask[:, self.continuous_pilots_pos] = False
+        self.data_mask[:, self.TPS_pos] = False
+        
+        for array in (self.PRBS, self.continuous_pilots_pos, self.continuous_pilots_values, self.continuous_pilots_vec,
+                      self.scattered_pilots_symbols, self.TPS_pos, self.TPS_reference, self.data_mask) + self.scattered_pilots_pos + self.scattered_pilots_values:
+            array.setflags(write=False)
+
+
+_pilot_tables = {}
+
+def getPilotTables(K):
+    '''Returns the cached PilotTables of the mode with K carriers (1705 or 6817), built on first use'''
+    if K not in _pilot_tables:
+        _pilot_tables[K] = PilotTables(K)
+    return _pilot_tables[K]
+
+
+def toggleOFDMSymbolGuardBand(OFDM_symbol_freq_dom, FFT_len, K, add_or_rmv):
+    '''add_or_rmv can receive the values:
+            ** "add" or "a" to add guard band to the OFDM symbol
+            ** "remove" or "rmv" or "r" to remove the guard band from the OFDM symbol '''
+    
+    guard_band_low_len = int(np.ceil((FFT_len - K)/2))
+    guard_band_high_len = int(np.floor((FFT_len - K)/2))
+    
+    if (add_or_rmv == "add" or add_or_rmv == "a"):
+        guard_band_low = np.zeros(guard_band_low_len,dtype = complex)
+        guard_band_high = np.zeros(guard_band_high_len,dtype = complex)
+        return np.concatenate((guard_band_low, OFDM_symbol_freq_dom, guard_band_high))
+    
+    elif (add_or_rmv == "rmv" or add_or_rmv == "remove" or add_or_rmv == "r"):
+        return OFDM_symbol_freq_dom[guard_band_low_len:FFT_len-guard_band_high_len]
+    
+    else:
+        raise ValueError("Invalid action! Possible actions: 'add' or 'remove'")
+        
+        
+def getActiveCarriersSplit(FFT_len, K):
+    '''Returns the number of active carriers below DC.
+        
+        In an FFT output that was not fftshift-ed the K active carriers (lowest frequency first) are
+        fft[FFT_len-split:] followed by fft[:K-split], so picking these two slices is the same as fftshift
+        followed by removing the guard band.'''
+    
+    guard_band_low_len = int(np.ceil((FFT_len - K)/2))
+    
+    return FFT_len//2 - guard_band_low_len
+
+
+def toggleCyclicPrefix(OFDM_symbol_time_dom, CP_len, add_or_rmv):
+    '''add_or_rmv can receive the values:
+            ** "add" or "a" to add CP to the OFDM symbol
+            ** "remove" or "rmv" or "r" to remove the CP from the OFDM symbol '''
+    
+    if (add_or_rmv == "add" or add_or_rmv == "a"):
+        cp = OFDM_symbol_time_dom[-CP_len:]
+        return np.concatenate([cp, OFDM_symbol_time_dom])
+    
+    elif (add_or_rmv == "rmv" or add_or_rmv == "remove" or add_or_rmv == "r"):
+        return OFDM_symbol_time_dom[CP_len:]
+    
+    else:
+        raise ValueError("Invalid action! Possible actions: 'add' or 'remove'")
+        
+        
+@Profiling.profiled(samples_arg='time_synced_orig_sig_with_CP')
+def demodulateOFDMSymbols(FFT_len, K, CP_len, time_synced_orig_sig_with_CP, out=None, symbols_per_batch=68):
+    '''Batched OFDM demodulation - removes CP, converts to frequency domain and removes guard band.
+    
+        Inputs:
+        -------
+        time_synced_orig_sig_with_CP : numpy array of complex values
+            Time synchronized signal - starts at the beginning of an OFDM symbol's CP. Samples after the
+            last whole OFDM symbol are ignored.
+        
+        out : numpy array of complex values
+            Optional output buffer of num_symbols*K (or shape (num_symbols, K)) carriers.
+        
+        symbols_per_batch : int
+            Number of OFDM symbols transformed by each 2-D FFT (68 = one frame).
+        
+        Outputs:
+        --------
+        out : numpy array of complex values
+            The K active carriers of every OFDM symbol, one symbol after the other.
+        '''
+    
+    symbol_len_with_cp = FFT_len + CP_len
+    num_symbols_in_signal = len(time_synced_orig_sig_with_CP)//symbol_len_with_cp
+    
+    if (out is None):
+        out = np.empty(num_symbols_in_signal*K, dtype = complex)
+    out_symbols = out.reshape(num_symbols_in_signal, K)
+    
+    # Strided (num_symbols, FFT_len) view of the signal without the CPs - nothing is copied
+    symbols_no_cp = time_synced_orig_sig_with_CP[:num_symbols_in_signal*symbol_len_with_cp].reshape(num_symbols_in_signal, symbol_len_with_cp)[:, CP_len:]
+    split = getActiveCarriersSplit(FFT_len, K)
+    
+    for start in range(0, num_symbols_in_signal, symbols_per_batch):
+        end = min(start + symbols_per_batch, num_symbols_in_signal)
+        spectrum = np.fft.fft(symbols_no_cp[start:end], axis=1)
+        out_symbols[start:end, :split] = spectrum[:, FFT_len-split:]
+        out_symbols[start:end, split:] = spectrum[:, :K-split]
+    
+    return out
+
+
+def getFreqDomOFDMSymbolsFromTimeDom(FFT_len, K, CP_len, time_synced_orig_sig_with_CP):
+    '''Removes CP, converts to frequency domain and removes guard band'''
+    
+    return demodulateOFDMSymbols(FFT_len, K, CP_len, time_synced_orig_sig_with_CP)
+
+
+def modulateOFDMSymbols(FFT_len, K, CP_len, freq_orig_sig_no_guardband, out=None, symbols_per_batch=68):
+    '''Batched OFDM modulation - adds guard band, converts to time domain and adds CP.
+    
+        Inputs:
+        -------
+        freq_orig_sig_no_guardband : numpy array of complex values
+            The K active carriers of every OFDM symbol, one symbol after the other (or shape (num_symbols, K)).
+        
+        CP_len : int
+            Number of CP samples - may be 0 for OFDM symbols without CP.
+        
+        out : numpy array of complex values
+            Optional output buffer of num_symbols*(FFT_len+CP_len) samples.
+        
+        symbols_per_batch : int
+            Number of OFDM symbols transformed by each 2-D IFFT (68 = one frame).
+        
+        Outputs:
+        --------
+        out : numpy array of complex values
+            The time domain signal.
+        '''
+    
+    symbol_len_with_cp = FFT_len + CP_len
+    carriers = np.reshape(freq_orig_sig_no_guardband, (-1, K))
+    num_symbols_in_signal = len(carriers)
+    
+    if (out is None):
+        out = np.empty(num_symbols_in_signal*symbol_len_with_cp, dtype = complex)
+    out_symbols = out.reshape(num_symbols_in_signal, symbol_len_with_cp)
+    
+    # The guard band carriers of the spectrum buffer stay zero, only the active carriers are rewritten
+    spectrum = np.zeros((min(symbols_per_batch, num_symbols_in_signal), FFT_len), dtype = complex)
+    split = getActiveCarriersSplit(FFT_len, K)
+    
+    for start in range(0, num_symbols_in_signal, symbols_per_batch):
+        end = min(start + symbols_per_batch, num_symbols_in_signal)
+        spectrum[:end-start, FFT_len-split:] = carriers[start:end, :split]
+        spectrum[:end-start, :K-split] = carriers[start:end, split:]
+        symbols_no_cp = np.fft.ifft(spectrum[:end-start], axis=1)
+        out_symbols[start:end, CP_len:] = symbols_no_cp
+        out_symbols[start:end, :CP_len] = symbols_no_cp[:, FFT_len-CP_len:]
+    
+    return out
+
+
+def getTimeDomOFDMSymbolsFromFreqDom(FFT_len, K, CP_len, freq_orig_sig_no_guardband):
+    '''Adds guard band, converts to time domain and adds CP'''
+    
+    return modulateOFDMSymbols(FFT_len, K, CP_len, freq_orig_sig_no_guardband)
+
+
+_channel_interpolation_weights = {}
+
+def getChannelInterpolationWeights(K, interp_kind='linear', pilots_to_use="continuous"):
+    '''Returns a cached sparse (K, num_pilots) matrix W, so that W @ values_at_pilots is the
+        interp1d(pilot_pos, values_at_pilots, interp_kind) interpolation over all the K carriers.
+        pilot_pos are the continuous pilots, or every 3rd carrier for pilots_to_use="scattered"
+        (the scattered pilots of 4 consecutive symbols).
+        
+        interp1d is linear in the interpolated values for all its kinds, so W is the interpolation of
+        the identity matrix (one unit pilot at a time).'''
+    key = (K, interp_kind, pilots_to_use)
+    if key not in _channel_interpolation_weights:
+        import scipy.interpolate
+        import scipy.sparse
+        if (pilots_to_use == "continuous"):
+            pilot_pos = getPilotTables(K).continuous_pilots_pos
+        elif (pilots_to_use == "scattered"):
+            pilot_pos = np.arange(0, K, 3)
+        else:
+            raise ValueError("Invalid pilots_to_use! Must be continuous or scattered")
+        # Built 256 pilots at a time, so the dense interpolation of the identity stays small
+        weights = []
+        for start in range(0, len(pilot_pos), 256):
+            unit_pilots = np.eye(len(pilot_pos), min(256, len(pilot_pos) - start), -start)
+            chunk_weights = scipy.interpolate.interp1d(pilot_pos, unit_pilots, kind=interp_kind, axis=0)(np.arange(K))
+            chunk_weights[np.abs(chunk_weights) < 1e-12] = 0
+            weights.append(scipy.sparse.csr_matrix(chunk_weights))
+        _channel_interpolation_weights[key] = scipy.sparse.hstack(weights, format='csr')
+    return _channel_interpolation_weights[key]
+
+
+def estimateChannel(FFT_len, K, symbols_FD_no_guardband, interp_kind='linear'):
+    '''Channel estimation of a block of OFDM symbols from the continuous pilots.
+    
+        Inputs:
+        -------
+        symbols_FD_no_guardband : (num_symbols, K) array of the symbols' carriers
+            
+        Outputs:
+        --------
+        Hest : (num_symbols, K) array of the channel response - the magnitude and the phase at the pilots
+            are interpolated over the carriers (as interp1d with interp_kind) for all the symbols at once
+        '''
+    tables = getPilotTables(K)
+    weights = getChannelInterpolationWeights(K, interp_kind)
+    
+    Hest_at_pilots = symbols_FD_no_guardband[:, tables.continuous_pilots_pos] / tables.continuous_pilots_values
+    
+    Hest_abs = (weights @ np.abs(Hest_at_pilots).T).T
+    Hest_phase = (weights @ np.angle(Hest_at_pilots).T).T.astype(np.float32)
+    
+    # Single precision cos/sin are several times faster than the complex exp and accurate to ~1e-7
+    Hest = np.empty(Hest_abs.shape, dtype = complex)
+    np.multiply(Hest_abs, np.cos(Hest_phase), out=Hest.real)
+    np.multiply(Hest_abs, np.sin(Hest_phase), out=Hest.imag)
+    
+    return Hest
+
+
+def estimateChannelInOFDMSymbol(FFT_len, K, orig_sig_FD_no_guardband, interp_kind='linear'):
+    
+    return estimateChannel(FFT_len, K, orig_sig_FD_no_guardband[None, :K], interp_kind)[0]
+
+
+def findScatteredPilotsPhase(symbols):
+    '''Returns the symbol_index_in_frame % 4 of symbols[0] (a (num_symbols, K) array) - the pattern of boosted
+        scattered pilot carriers with the most power'''
+    power = np.abs(symbols[:, 0::3])**2
+    scores = [sum(power[l, ((l + h) % 4)::4].sum() for l in range(len(symbols))) for h in range(4)]
+    return int(np.argmax(scores))
+
+
+class ScatteredPilotChannelEstimator:
+    '''Streaming channel estimation and equalization from the scattered pilots (a time/frequency 2-D estimate).
+    
+        Symbol l carries scattered pilots on carriers 3*(l%4) + 12p, so over 4 consecutive symbols there is a
+        pilot on every 3rd carrier. For every one of these carriers the estimator keeps its last two pilot
+        estimates (4 symbols apart) and interpolates linearly between them in time, then interpolates over
+        the carriers in frequency (as interp1d with interp_kind). The 4 symbols waiting for their next pilots
+        are kept in a ring buffer, so the output is delayed by 3 symbols and every symbol costs O(K).
+        
+        process(symbols) takes a (num_symbols, K) block and returns the equalized symbols that are ready,
+        flush() returns the last 3 symbols (estimated with the last pilots, without time interpolation).
+        symbol_index_in_frame is the index of the first symbol in its frame - when None it is found from the
+        power of the boosted pilots in the first 4 symbols.'''
+    
+    def __init__(self, K, interp_kind='linear', symbol_index_in_frame=None):
+        self.K = K
+        self.weights = getChannelInterpolationWeights(K, interp_kind, "scattered")
+        grid_len = self.weights.shape[1]
+        # Pilot grid column m (carrier 3m) is a scattered pilot in the symbols with symbol_index_in_frame % 4 == m % 4
+        self.grid_pattern_columns = tuple(np.arange(p, grid_len, 4) for p in range(4))
+        self.grid_reference = (4*(1-2*getPilotTables(K).PRBS[0::3])/3).astype(complex)
+        self.symbol_phase = None if symbol_index_in_frame is None else symbol_index_in_frame % 4
+        
+        self.ring = np.zeros((4, K), dtype = complex)
+        self.H_last = np.zeros(grid_len, dtype = complex)
+        self.H_prev = np.zeros(grid_len, dtype = complex)
+        self.t_last = np.full(grid_len, -4)
+        self.num_input = 0
+        self.num_output = 0
+        self.pending = []
+    
+    def findSymbolPhase(self, symbols):
+        return findScatteredPilotsPhase(symbols)
+    
+    def _pushSymbol(self, symbol):
+        n = self.num_input
+        columns = self.grid_pattern_columns[(n + self.symbol_phase) % 4]
+        self.H_prev[columns] = self.H_last[columns]
+        self.H_last[columns] = symbol[3*columns] / self.grid_reference[columns]
+        self.t_last[columns] = n
+        self.ring[n % 4] = symbol
+        self.num_input += 1
+    
+    def _popSymbol(self):
+        d = self.num_output
+        time_to_last = self.t_last - d
+        # Linear interpolation between the pilots at t_last-4 and t_last, the last pilot alone when there is no pilot before or after d
+        last_weight = np.where((time_to_last > 0) & (self.t_last >= 4), (4 - time_to_last)/4, 1.0)
+        H_grid = self.H_prev + last_weight*(self.H_last - self.H_prev)
+        Hest = self.weights @ H_grid
+        self.num_output += 1
+        return self.ring[d % 4] / Hest
+    
+    def process(self, symbols):
+        symbols = np.asarray(symbols).reshape(-1, self.K)
+        if (self.symbol_phase is None):
+            self.pending.append(symbols)
+            buffered = np.concatenate(self.pending)
+            if (len(buffered) < 4):
+                return np.zeros((0, self.K), dtype = complex)
+            self.pending = []
+            self.symbol_phase = self.findSymbolPhase(buffered[:4])
+            symbols = buffered
+        
+        equalized_symbols = np.zeros((len(symbols), self.K), dtype = complex)
+        num_equalized = 0
+        for symbol in symbols:
+            self._pushSymbol(symbol)
+            if (self.num_input - self.num_output > 3):
+                equalized_symbols[num_equalized] = self._popSymbol()
+                num_equalized += 1
+        return equalized_symbols[:num_equalized]
+    
+    def flush(self):
+        if (self.symbol_phase is None):
+            if not self.pending:
+                return np.zeros((0, self.K), dtype = complex)
+            buffered = np.concatenate(self.pending)
+            self.pending = []
+            self.symbol_phase = self.findSymbolPhase(buffered)
+            self.process(buffered)
+        equalized_symbols = np.zeros((self.num_input - self.num_output, self.K), dtype = complex)
+        for i in range(len(equalized_symbols)):
+            equalized_symbols[i] = self._popSymbol()
+        return equalized_symbols
+
+
+@Profiling.profiled(samples_arg='noisy_signal_FD_no_guardband')
+def removeChannelResponse(FFT_len, CP_len, noisy_signal_FD_no_guardband, interp_kind='linear', symbols_per_batch=68, pilots_to_use="continuous"):
+    '''Equalizes the K carriers of every OFDM symbol.
+        pilots_to_use="continuous" - estimates each symbol from its continuous pilots, symbols_per_batch
+            symbols at a time (estimateChannel)
+        pilots_to_use="scattered" - 2-D estimation from the scattered pilots (ScatteredPilotChannelEstimator),
+            for channels that change from symbol to symbol'''
+
+    K = DVBTModeParams(FFT_len//1024, 4)[1]
+    num_symbols_in_signal = len(noisy_signal_FD_no_guardband)//K
+    symbols = np.reshape(noisy_signal_FD_no_guardband[:num_symbols_in_signal*K], (num_symbols_in_signal, K))
+
+    equalized_signal = np.zeros(len(noisy_signal_FD_no_guardband), dtype = complex)
+    equalized_symbols = equalized_signal[:num_symbols_in_signal*K].reshape(num_symbols_in_signal, K)
+
+    if (pilots_to_use == "scattered"):
+        estimator = ScatteredPilotChannelEstimator(K, interp_kind)
+        equalized_symbols[:] = np.concatenate((estimator.process(symbols), estimator.flush()))
+        return equalized_signal
+
+    for start in range(0, num_symbols_in_signal, symbols_per_batch):
+        batch = symbols[start:start+symbols_per_batch]
+        np.divide(batch, estimateChannel(FFT_len, K, batch, interp_kind), out=equalized_symbols[start:start+symbols_per_batch])
+        
+    return equalized_signal
+
+
+def findN_Peaks(vector, n, min_distance=1):
+    '''Indices of the n largest values of vector, at least min_distance apart (vector is zeroed around them)'''
+    n_peaks = np.zeros(n)
+    for i in range(0,n):
+        n_peaks[i] = np.argmax(vector)
+        vector[max(int(n_peaks[i]) - min_distance + 1, 0):int(n_peaks[i]) + min_distance] = 0
+    return n_peaks
+
+
+
+def checkAndProcessInputParameters(N, mode, cyclic_prefix):
+        
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = DVBTModeParams(mode, cyclic_prefix)
+
+    if (N < 30720): # 30720 = number of samples of 3 OFDM symbols ; 3.36 msec = duration of 2 OFDM symbols
+        raise ValueError("Acquisition too short - at least 3.36 msec needed")
+    
+    if (N < 40960): # Check how many symbols are in original signal
+        num_symbols_to_correlate = 3
+    else:
+        num_symbols_to_correlate = 4
+    
+    return (FFT_len, K, CP_len, data_carriers_per_symbol, num_symbols_to_correlate)
+    
+
+@Profiling.profiled(samples_arg='iq_data')
+def filterAndResampleToDVBT(iq_data, fs, bw, ch_bw=7.61e6, multistage=False):
+    '''Filters the DVB-T channel (when bw > 8 MHz) and resamples to 64/7 MHz with a polyphase resampler.
+        When resampling, the channel filter is part of the resampler's (cached) filter, so both are done
+        in a single pass.
+        With multistage, high rate captures are first decimated by 2 in stages (DSPBlocks.decimate) down
+        to at least twice the DVB-T rate, which is cheaper than a single long resampling filter.'''
+    
+    fs_new = int(64e6/7)
+    
+    if (multistage and bw > 8e6):
+        (iq_data, fs) = DSPBlocks.decimate(iq_data, fs, ch_bw)
+    
+    if (fs == fs_new):
+        if (bw > 8e6):
+            filtered_signal = lowPassFilterDVBT(iq_data, fs, ch_bw)
+        else:
+            filtered_signal = iq_data
+        return (filtered_signal, fs, len(filtered_signal))
+    
+    else:
+        (resampled_signal, up, down) = DSPBlocks.resample(iq_data, fs, ch_bw=ch_bw if bw > 8e6 else None)
+        N_new = len(resampled_signal)
+        return (resampled_signal, fs_new, N_new)
+
+
+def createContinuousPilotsSymbol(K, get_pilot_pos=False):
+
+    tables = getPilotTables(K)
+    continuous_pilots_vec = tables.continuous_pilots_vec.copy()
+    
+    if (get_pilot_pos):
+        return (continuous_pilots_vec, tables.continuous_pilots_pos)
+    
+    return continuous_pilots_vec
+
+
+def createScatteredPilotsSymbol(K, symbol_index_in_frame, continuous_pilots_vec):
+    
+    tables = getPilotTables(K)
+    pattern = np.mod(symbol_index_in_frame, 4)
+    scattered_pilots_pos = tables.scattered_pilots_pos[pattern]
+    
+    scattered_pilots_symbol = np.zeros(K,dtype = complex)
+    not_on_continuous_pilot = (continuous_pilots_vec[scattered_pilots_pos] == 0)
+    scattered_pilots_symbol[scattered_pilots_pos[not_on_continuous_pilot]] = tables.scattered_pilots_values[pattern][not_on_continuous_pilot]
+    
+    return scattered_pilots_symbol
+
+
+def createScatteredPilotsFrame(K, continuous_pilots_vec=np.zeros(1)):
+    symbols_per_frame = 68
+    
+    if (len(continuous_pilots_vec) == 1):
+        continuous_pilots_vec = np.zeros(K,dtype = complex)
+    
+    # The scattered pilots repeat every 4 symbols
+    scattered_pilots_patterns = np.concatenate([createScatteredPilotsSymbol(K, i, continuous_pilots_vec) for i in range(0,4)])
+    
+    return np.tile(scattered_pilots_patterns, symbols_per_frame//4)
+
+
+def createUniqueWordVector(K, pilots_to_include="both"): 
+    '''Create a vector of length K in frequency domain containing only the pilot subcarriers (without guard band). 
+        The unique word can include only the continuous pilots, only the scattered pilots, or both.'''
+    
+    if (pilots_to_include == "continuous" or pilots_to_include == "c"):
+        return createContinuousPilotsSymbol(K)
+    
+    elif (pilots_to_include == "scattered" or pilots_to_include == "s"):
+        return createScatteredPilotsFrame(K)
+    
+    elif (pilots_to_include == "both" or pilots_to_include == "b"):
+        continuous_pilots_vec = createContinuousPilotsSymbol(K)
+        scattered_pilots_frame = createScatteredPilotsFrame(K, continuous_pilots_vec)
+        
+        for i in range(0, len(scattered_pilots_frame)//K):
+            unique_word_frame = scattered_pilots_frame[i*K:(i+1)*K] + continuous_pilots_vec
+        
+        return unique_word_frame
+        
+    else:
+        raise ValueError("Invalid pilots to include! Possible values: 'continuous', 'scattered' or 'both'")
+
+    
+def createUniqueWordTimeDomain(FFT_len, K, pilots_to_include="both", includeCP=False, CP=0):
+    '''Create a vector in time domain containing only pilot subcarriers (includes the guard band in frequency domain). 
+    
+        The unique word can include only the continuous pilots, only the scattered pilots, or both.
+    
+        The returned vector can be without the cyclic prefix and be of length FFT_len, or it can include the cyclic prefix 
+        (in which case the user must enter its length) and thus be of length FFT_len+CP. '''
+        
+    unique_word_vec_freq_dom = createUniqueWordVector(K, pilots_to_include)   
+    
+    if includeCP:
+        if CP == 0:
+            raise ValueError("Invalid CP value!")
+        return (getTimeDomOFDMSymbolsFromFreqDom(FFT_len, K, CP, unique_word_vec_freq_dom),unique_word_vec_freq_dom)
+    
+    else:
+        return (modulateOFDMSymbols(FFT_len, K, 0, unique_word_vec_freq_dom), unique_word_vec_freq_dom)
+
+    
+# Minimal ratio between the symbol-folded pilot correlation power peak and its median (noise gives up to ~4,
+# DVB-T at 0 dB SNR gives ~20 in 2k mode and ~100 in 8k mode)
+TIME_CORR_PEAK_TO_MEDIAN = 8
+
+_fft_correlators = {}
+
+def getFFTCorrelator(unique_word_corr_vec):
+    '''Returns a cached DSPBlocks.FFTCorrelator of the unique word, so its spectrum is computed only once'''
+    key = np.asarray(unique_word_corr_vec, dtype = complex).tobytes()
+    if key not in _fft_correlators:
+        with Profiling.stage('FFTCorrelator'):
+            _fft_correlators[key] = DSPBlocks.FFTCorrelator(unique_word_corr_vec)
+    return _fft_correlators[key]
+
+
+@Profiling.profiled(samples_arg='orig_sig_corr_vec')
+def checkDVBTSymbolTimeCorrelation(orig_sig_corr_vec, unique_word_corr_vec, FFT_len, CP, num_symbols_to_correlate, get_plot=False):
+    '''Check time correlation between original signal and unique word of continuous pilots.
+    
+        Inputs:
+        -------
+        orig_sig_corr_vec : numpy array of complex values
+            The original signal suspected of being DVB-T. Its length must be the length of num_symbols_to_correlate
+            OFDM symbols in time domain ( len(orig_sig_corr_vec) == num_symbols_to_correlate*(FFT_len+CP) )
+                                
+        unique_word_corr_vec : numpy array of complex values
+            Unique word of only one OFDM symbol in time domain containing only continuous pilots 
+            ( len(unique_word_corr_vec) == FFT_len+CP )
+        '''
+    
+    distance_between_peaks = FFT_len + CP
+    
+    norm_orig_sig = np.linalg.norm(orig_sig_corr_vec)
+    norm_unique_word = np.linalg.norm(unique_word_corr_vec)
+
+    time_corr_vec = getFFTCorrelator(unique_word_corr_vec).correlate(orig_sig_corr_vec)/np.sqrt(norm_unique_word*norm_orig_sig)
+
+    # The correlation power of every symbol period is summed, so the pilot peaks (a whole number of symbols
+    # apart) add up while the correlation with the data carriers does not. A timing offset between samples
+    # splits a peak over two samples, and a sampling clock offset moves it slowly, so the peak is searched
+    # over pairs of adjacent samples.
+    time_corr_power = np.abs(time_corr_vec)**2
+    num_periods = len(time_corr_power)//distance_between_peaks
+    folded_time_corr = time_corr_power[:num_periods*distance_between_peaks].reshape(num_periods, distance_between_peaks).sum(axis=0)
+    paired_time_corr = folded_time_corr + np.roll(folded_time_corr, -1)
+    peak_offset = int(np.argmax(paired_time_corr))
+    if (folded_time_corr[(peak_offset + 1) % distance_between_peaks] > folded_time_corr[peak_offset]):
+        peak_offset = (peak_offset + 1) % distance_between_peaks
+    
+    is_corr = paired_time_corr.max() > TIME_CORR_PEAK_TO_MEDIAN*np.median(paired_time_corr)
+    max_time_corr_index_vec_sorted = peak_offset + distance_between_peaks*np.arange(num_periods)
+    
+    if get_plot:    
+        from . import Plotting
+        Plotting.plotTimeCorrelation(time_corr_vec, max_time_corr_index_vec_sorted, FFT_len, CP)
+        
+    if (is_corr):
+        return (is_corr, max_time_corr_index_vec_sorted)
+    else:
+        return (is_corr, False)
+
+        
+@Profiling.profiled(samples_arg='orig_sig_1symbol_no_cp')
+def calcDVBTFrequencyShift(FFT_len, K, orig_sig_1symbol_no_cp, unique_word_vec_freq_dom, get_plot=False):
+
+    norm_unique_word_no_cp = np.linalg.norm(unique_word_vec_freq_dom)
+    norm_orig_sig = np.linalg.norm(orig_sig_1symbol_no_cp)
+
+    orig_signal_fft_corr_no_cp = np.fft.fftshift(np.fft.fft(orig_sig_1symbol_no_cp))
+    unique_word_vec_with_guardband = toggleOFDMSymbolGuardBand(unique_word_vec_freq_dom, FFT_len, K, "add")
+    
+    freq_corr_vec = np.correlate(orig_signal_fft_corr_no_cp, unique_word_vec_with_guardband, "same")/np.sqrt(norm_unique_word_no_cp*norm_orig_sig)
+    
+    if get_plot:
+        from . import Plotting
+        Plotting.plotPlot(np.abs(freq_corr_vec), "Frequency Correlation")
+        
+    return np.argmax(np.abs(freq_corr_vec))
+        
+
+@Profiling.profiled()
+def calcDVBTIntegerFrequencyShift(FFT_len, K, CP_len, time_synced_signal, num_symbols=4):
+    '''Returns the frequency offset of the signal in whole carrier spacings (signed), from the continuous pilots.
+    
+        The spectra of consecutive symbols are multiplied (one by the conjugate of the other), so a timing error
+        of the FFT window - a phase slope over the carriers, the same in every symbol - cancels out, and the
+        products on the continuous pilots (the same in every symbol) add up coherently only at the true offset.
+        time_synced_signal starts at the CP of a symbol, with the fractional frequency offset removed.'''
+    
+    symbol_len_with_cp = FFT_len + CP_len
+    num_symbols = min(num_symbols, len(time_synced_signal)//symbol_len_with_cp)
+    if (num_symbols < 2):
+        raise ValueError("Invalid signal length! Must hold at least 2 OFDM symbols")
+    
+    symbols = time_synced_signal[:num_symbols*symbol_len_with_cp].reshape(num_symbols, symbol_len_with_cp)[:, CP_len:]
+    spectra = np.fft.fft(symbols, axis=1)
+    products = np.sum(spectra[1:] * np.conj(spectra[:-1]), axis=0)
+    
+    pilots_mask = np.zeros(FFT_len)
+    pilots_mask[(getPilotTables(K).continuous_pilots_pos - getActiveCarriersSplit(FFT_len, K)) % FFT_len] = 1
+    # Circular correlation of the products with the pilot positions, for every offset at once
+    pilots_corr = np.fft.ifft(np.fft.fft(products) * np.conj(np.fft.fft(pilots_mask)))
+    
+    freq_shift_bins = int(np.argmax(np.abs(pilots_corr)))
+    if (freq_shift_bins >= FFT_len//2):
+        freq_shift_bins -= FFT_len
+    return freq_shift_bins
+
+
+@Profiling.profiled(samples_arg='unsynced_signal_time_dom')
+def getSynchronizedSignal(unsynced_signal_time_dom, fs, time_shift, freq_shift):
+
+    time_synchronized_signal = unsynced_signal_time_dom[time_shift:]
+
+    return DSPBlocks.NCO(-freq_shift, fs).mix(time_synchronized_signal)
+
+
+class DVBTSynchronizationTracker:
+    '''Symbol by symbol OFDM demodulation that tracks the carrier frequency offset, the common phase error
+        and the sampling clock offset, for decoding long captures in a single pass.
+        
+        The input is the signal from the start of an OFDM symbol's CP (after time_shift), and freq_shift is
+        the initial frequency offset in Hz (as returned by findDVBTSignal). For every symbol the continuous
+        pilots are compared with the previous symbol's: the common phase of the pilot products is the
+        residual frequency offset (and the common phase error), and their phase slope over the carriers is
+        the timing drift of the sampling clock.
+        - The residual frequency offset updates the frequency estimate, which the NCO that mixes the signal
+          before the FFT is retuned to.
+        - The timing drift per symbol is tracked, and the timing offset it adds up to is removed as a phase
+          slope over the carriers. Whenever the offset passes half a sample the FFT window moves a sample.
+        - The common phase error left is removed from every symbol.
+        
+        The symbols are demodulated batch_symbols at a time - the NCO mixes a batch and is retuned between
+        batches, and the FFTs and the phase corrections of a batch are single calls. The frequency loop
+        measures its error against the frequency the NCO mixed with, so the NCO lagging the estimate within
+        a batch does not slow the loop down (the phase it adds is common phase error). When the FFT window
+        moves, the symbols after it are demodulated again from the new position.
+        
+        process(block) takes any number of samples and returns the K carriers of every whole symbol ready
+        (one symbol after the other, as getFreqDomOFDMSymbolsFromTimeDom), so it replaces the
+        synchronization and OFDM demodulation stages of a streaming pipeline.'''
+    
+    def __init__(self, mode, cyclic_prefix, fs, freq_shift=0, frequency_gain=0.1, timing_gain=0.2, batch_symbols=16):
+        (self.FFT_len, self.K, self.CP_len, data_carriers_per_symbol) = DVBTModeParams(mode, cyclic_prefix)
+        self.symbol_len_with_cp = self.FFT_len + self.CP_len
+        self.fs = fs
+        self.split = getActiveCarriersSplit(self.FFT_len, self.K)
+        tables = getPilotTables(self.K)
+        self.pilot_pos = tables.continuous_pilots_pos
+        # Frequency of every active carrier in carrier spacings (0 is the DC carrier)
+        self.carrier_bins = np.arange(self.K) - self.split
+        self.pilot_bins = self.carrier_bins[self.pilot_pos]
+        # Phase of every pilot per sample of FFT window delay - the timing correction is a phase slope
+        self.pilot_timing_phase_ramp = -2*np.pi*self.pilot_bins/self.FFT_len
+        
+        self.frequency_gain = frequency_gain
+        self.timing_gain = timing_gain
+        self.batch_symbols = batch_symbols
+        
+        self.frequency_offset = freq_shift
+        self.nco = DSPBlocks.NCO(-freq_shift, fs, table_len=self.symbol_len_with_cp)
+        self.timing_offset = 0.0     # samples the FFT window is late by (the part not moved yet)
+        self.timing_rate = 0.0       # timing drift in samples per symbol
+        self.window_shift = 0        # samples the FFT window was moved by
+        self.common_phase = 0.0
+        self.previous_pilots = None
+        self.num_symbols = 0
+        
+        self.pending = np.zeros(0, dtype = complex)
+        self.mixed_len = 0
+    
+    @property
+    def sampling_offset_ppm(self):
+        return self.timing_rate/self.symbol_len_with_cp*1e6
+    
+    def _trackSymbol(self, pilots):
+        '''Updates the loops from the continuous pilots of one symbol - returns (phase_step, phase) of the phase
+            ramp over its carriers that corrects them'''
+        # The loops need the timing corrected pilots only - the timing and the common phase corrections of
+        # all the carriers are a single phase ramp over the carriers. The pilots are not divided by their
+        # values, which are the same in every symbol and of one magnitude, so the products below are only scaled
+        timing_offset = self.timing_offset
+        pilots = pilots * np.exp(self.pilot_timing_phase_ramp*(1j*timing_offset))
+        
+        if (self.previous_pilots is not None):
+            # Weighted least squares line through the phases of the pilot products: the phase at the DC
+            # carrier is the phase step since the previous symbol and the slope is the timing drift
+            products = pilots * np.conj(self.previous_pilots)
+            products_sum = complex(products.sum())
+            rough_phase_step = cmath.phase(products_sum)
+            residual_phases = np.angle(products * products_sum.conjugate())
+            weights = np.abs(products)
+            weights_sum = weights.sum()
+            mean_bin = (weights @ self.pilot_bins) / weights_sum
+            mean_phase = (weights @ residual_phases) / weights_sum
+            centered_bins = self.pilot_bins - mean_bin
+            weighted_centered_bins = weights*centered_bins
+            phase_slope = (weighted_centered_bins @ residual_phases) / (weighted_centered_bins @ centered_bins)
+            phase_step = rough_phase_step + mean_phase - phase_slope*mean_bin
+            
+            self.common_phase += phase_step
+            # The phase step is the offset left by the NCO's frequency, which lags the estimate within a batch
+            frequency_error = phase_step/(2*np.pi) * self.fs/self.symbol_len_with_cp - (self.frequency_offset + self.nco.frequency)
+            self.frequency_offset += self.frequency_gain*frequency_error
+            
+            # The timing drift left after the correction of the previous symbol
+            timing_error = phase_slope*self.FFT_len/(2*np.pi)
+            self.timing_rate += self.timing_gain*timing_error
+        self.timing_offset += self.timing_rate
+        
+        self.previous_pilots = pilots
+        self.num_symbols += 1
+        timing_phase_step = -2*np.pi*timing_offset/self.FFT_len
+        return (timing_phase_step, -timing_phase_step*self.split - self.common_phase)
+    
+    def process(self, block):
+        self.pending = np.concatenate((self.pending, block))
+        position = 0
+        batches = []
+        
+        while (position + self.symbol_len_with_cp <= len(self.pending)):
+            num_symbols = min((len(self.pending) - position)//self.symbol_len_with_cp, self.batch_symbols)
+            batch_end = position + num_symbols*self.symbol_len_with_cp
+            if (batch_end > self.mixed_len):
+                # The NCO mixes the samples in stream order, so its phase is continuous when the window moves
+                self.nco.setFrequency(-self.frequency_offset)
+                self.nco.mix(self.pending[self.mixed_len:batch_end], out=self.pending[self.mixed_len:batch_end])
+                self.mixed_len = batch_end
+            
+            windows = self.pending[position:batch_end].reshape(num_symbols, self.symbol_len_with_cp)[:, self.CP_len:]
+            spectra = np.fft.fft(windows, axis=1)
+            carriers = np.concatenate((spectra[:, self.FFT_len-self.split:], spectra[:, :self.K-self.split]), axis=1)
+            corrections = []
+            for symbol_pilots in carriers[:, self.pilot_pos]:
+                corrections.append(self._trackSymbol(symbol_pilots))
+                position += self.symbol_len_with_cp
+                if (abs(self.timing_offset) > 0.5):
+                    # The rest of the batch is demodulated again from the moved window
+                    shift = int(np.round(self.timing_offset))
+                    position -= shift
+                    self.timing_offset -= shift
+                    self.window_shift -= shift
+                    break
+            
+            (phase_steps, phases) = np.array(corrections).T
+            carriers = carriers[:len(corrections)]
+            carriers *= DSPBlocks.exponentialRamp(phase_steps, self.K, phases)
+            batches.append(carriers)
+        
+        self.pending = self.pending[position:]
+        self.mixed_len -= position
+        
+        if not batches:
+            return np.zeros(0, dtype = complex)
+        return np.concatenate(batches).reshape(-1)
+
+
+_unique_words = {}
+
+def getContinuousPilotsUniqueWord(FFT_len, K, CP_len=0):
+    '''Cached createUniqueWordTimeDomain(FFT_len, K, "continuous") - with CP_len the time domain word includes
+        the cyclic prefix. The arrays returned are read only'''
+    if (FFT_len, K, CP_len) not in _unique_words:
+        with Profiling.stage('createUniqueWordTimeDomain'):
+            unique_word = createUniqueWordTimeDomain(FFT_len, K, "continuous", includeCP=CP_len > 0, CP=CP_len)
+        for array in unique_word:
+            array.setflags(write=False)
+        _unique_words[(FFT_len, K, CP_len)] = unique_word
+    return _unique_words[(FFT_len, K, CP_len)]
+
+
+@Profiling.profiled()
+def getDVBTSyncParams(resampled_signal, N, mode, cyclic_prefix, get_time_corr_plot=False, get_freq_corr_plot=False):
+    '''Returns (is_DVBT, time_shift, freq_shift) - the values to pass to getSynchronizedSignal.
+        freq_shift is the signal's frequency offset in Hz, a whole number of carrier spacings'''
+           
+    (FFT_len, K, CP, data_carriers_per_symbol, num_symbols_to_correlate) = checkAndProcessInputParameters(N, mode, cyclic_prefix)
+    
+    (unique_word_vec_time_dom, unique_word_vec_freq_dom) = getContinuousPilotsUniqueWord(FFT_len, K, CP)
+    
+    orig_signal_to_correlate = resampled_signal[0:num_symbols_to_correlate*(FFT_len + CP)]
+    
+
+    (is_DVBT, max_time_corr_index_vec) = checkDVBTSymbolTimeCorrelation(orig_signal_to_correlate, unique_word_vec_time_dom, FFT_len, CP, num_symbols_to_correlate, get_plot=get_time_corr_plot)
+    
+    
+    if (is_DVBT):
+        time_shift = int(max_time_corr_index_vec[0])
+        
+        orig_sig_1symbol_no_cp = orig_signal_to_correlate[time_shift+CP:time_shift+FFT_len+CP]
+        freq_shift_bins = calcDVBTFrequencyShift(FFT_len, K, orig_sig_1symbol_no_cp, unique_word_vec_freq_dom, get_plot=get_freq_corr_plot) - FFT_len//2
+        freq_shift = freq_shift_bins*int(64e6/7)/FFT_len
+        
+        return (is_DVBT, time_shift, freq_shift)
+    
+    else:
+        return (is_DVBT, 0, 0)
+
+
+def isDVBTSignal(resampled_signal, fs, bw, N, mode, cyclic_prefix, get_time_corr_plot=False, get_freq_corr_plot=False):
+    
+    (is_DVBT, time_shift, freq_shift) = getDVBTSyncParams(resampled_signal, N, mode, cyclic_prefix, get_time_corr_plot, get_freq_corr_plot)
+    
+    if (is_DVBT):
+        synchronized_signal = getSynchronizedSignal(resampled_signal, fs, time_shift, freq_shift)
+        
+        return (is_DVBT, synchronized_signal)
+    
+    else:
+        return (is_DVBT, False)
+    
+@Profiling.profiled()
+def detectDVBTModeAndGuard(resampled_signal, scan_len=204800):
+    '''Guard interval autocorrelation scan for all the (mode, cyclic prefix) hypotheses in one pass.
+    
+        The CP of an OFDM symbol is a copy of the symbol's tail, so x[n]*conj(x[n+FFT_len]) sums up coherently
+        over the CP. The lagged products and their running sums are computed once per FFT size, and the
+        windowed sums of every CP length are folded modulo the symbol length and averaged over the symbols.
+        
+        Inputs:
+        -------
+        resampled_signal : numpy array of complex values
+            Signal at the DVB-T sample rate. Only the first scan_len samples are used.
+            
+        Outputs:
+        --------
+        hypotheses : list of tuples
+            (metric, mode, cyclic_prefix, cp_start, cfo) for every hypothesis, the most likely first.
+            metric is the normalized guard interval correlation (close to 1 for a clean DVB-T signal),
+            cp_start is the index of the first CP sample of a symbol (modulo the symbol length) and
+            cfo is the fractional carrier frequency offset in subcarrier spacings.
+        '''
+    
+    signal = resampled_signal[:scan_len]
+    hypotheses = []
+    
+    for mode in [2, 8]:
+        FFT_len = DVBTModeParams(mode, 4)[0]
+        if (len(signal) < 2*FFT_len):
+            continue
+        lagged_products = signal[:-FFT_len] * np.conj(signal[FFT_len:])
+        energies = np.abs(signal[:-FFT_len])**2 + np.abs(signal[FFT_len:])**2
+        lagged_products_sum = np.concatenate(([0], np.cumsum(lagged_products)))
+        energies_sum = np.concatenate(([0], np.cumsum(energies)))
+        
+        for cyclic_prefix in [4, 8, 16, 32]:
+            CP_len = FFT_len//cyclic_prefix
+            symbol_len_with_cp = FFT_len + CP_len
+            num_symbols = (len(lagged_products_sum) - CP_len)//symbol_len_with_cp
+            if (num_symbols < 2):
+                continue
+            
+            window_len = num_symbols*symbol_len_with_cp
+            cp_corr = (lagged_products_sum[CP_len:CP_len+window_len] - lagged_products_sum[:window_len]).reshape(num_symbols, symbol_len_with_cp).sum(axis=0)
+            cp_energy = (energies_sum[CP_len:CP_len+window_len] - energies_sum[:window_len]).reshape(num_symbols, symbol_len_with_cp).sum(axis=0)
+            metric = 2*np.abs(cp_corr)/np.maximum(cp_energy, np.finfo(float).tiny)
+            
+            cp_start = int(np.argmax(metric))
+            cfo = -np.angle(cp_corr[cp_start])/(2*np.pi)
+            hypotheses.append((metric[cp_start], mode, cyclic_prefix, cp_start, cfo))
+    
+    hypotheses.sort(key=lambda hypothesis: -hypothesis[0])
+    
+    return hypotheses
+
+
+@Profiling.profiled()
+def findDVBTSignal(resampled_signal, N):
+    '''Finds the mode and cyclic prefix with the guard interval scan, and confirms the hypotheses with the
+        pilot correlator from the most likely one down.
+        
+        The pilot correlator runs on the signal starting at the CP found by the scan, after removing the
+        fractional frequency offset measured by the scan and the whole carrier spacings offset found from
+        the continuous pilots of consecutive symbols (calcDVBTIntegerFrequencyShift), so it stays coherent.
+        
+        Returns (is_DVBT, mode, cyclic_prefix, time_shift, freq_shift) - freq_shift is the signal's
+        frequency offset in Hz (fractional part included)'''
+    
+    fs = int(64e6/7)
+    
+    for (metric, mode, cyclic_prefix, cp_start, cfo) in detectDVBTModeAndGuard(resampled_signal[:N]):
+        (FFT_len, K, CP_len, data_carriers_per_symbol) = DVBTModeParams(mode, cyclic_prefix)
+        signal_to_confirm = resampled_signal[cp_start:min(cp_start + max(5*(FFT_len + CP_len), 40960), N)]
+        if (len(signal_to_confirm) < max(4*(FFT_len + CP_len), 30720)):
+            continue
+        signal_to_confirm = DSPBlocks.NCO(-cfo, FFT_len).mix(signal_to_confirm)
+        
+        freq_shift_bins = calcDVBTIntegerFrequencyShift(FFT_len, K, CP_len, signal_to_confirm)
+        if (freq_shift_bins != 0):
+            DSPBlocks.NCO(-freq_shift_bins, FFT_len).mix(signal_to_confirm, out=signal_to_confirm)
+        
+        (is_DVBT, time_shift, _) = getDVBTSyncParams(signal_to_confirm, len(signal_to_confirm), mode, cyclic_prefix)
+        # The pilots must start a symbol close to where the guard interval scan found it (whose peak is a
+        # few samples wide), and they set the symbol start more precisely
+        symbol_len_with_cp = FFT_len + CP_len
+        if (is_DVBT and min(time_shift, symbol_len_with_cp - time_shift) <= CP_len//8):
+            freq_shift = (freq_shift_bins + cfo)*fs/FFT_len
+            return (is_DVBT, mode, cyclic_prefix, (cp_start + time_shift) % symbol_len_with_cp, freq_shift)
+    
+    return (False, 0, 0, 0, 0)
+
+
+@Profiling.profiled(samples_arg='iq_data')
+def isAnyDVBTSignal(iq_data, fs, bw, N, get_time_corr_plot=False, get_freq_corr_plot=False):
+    '''Checks for all possible values of FFT mode and cyclic prefix length'''
+    
+    (resampled_signal, fs, N) = filterAndResampleToDVBT(iq_data, fs, bw)
+    
+    (is_DVBT, mode, CP, time_shift, freq_shift) = findDVBTSignal(resampled_signal, N)
+    
+    if (is_DVBT):
+        if (get_time_corr_plot or get_freq_corr_plot):
+            getDVBTSyncParams(resampled_signal, N, mode, CP, get_time_corr_plot, get_freq_corr_plot)
+        return (is_DVBT, mode, CP, getSynchronizedSignal(resampled_signal, fs, time_shift, freq_shift))
+    
+    return (False, 0, 0, False)
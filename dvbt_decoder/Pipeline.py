@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+'''Generator based streaming version of the MyDVBT receive chain.
+
+    Every stage takes an iterable of sample blocks and yields processed blocks, keeping its state
+    (filter tail, resampler phase, oscillator phase, symbol alignment) between blocks. The output does not
+    depend on the block size and memory use depends only on the block size, not on the recording length:
+
+        blocks = Record.XdatReader('capture.xdat').blocks()
+        (is_DVBT, mode, cyclic_prefix, equalized_blocks) = receiveStream(blocks, fs, bw)
+        for equalized_symbols in equalized_blocks:
+            ...
+'''
+import itertools
+import numpy as np
+from . import DSPBlocks
+from . import MyDVBT
+from . import Record
+
+
+def lowPassFilterStream(blocks, fs, ch_bw=7.61e6, transition_bw=5e3, n_taps=5000):
+    '''Streaming lowPassFilterDVBT'''
+    fir = DSPBlocks.FFTConvolver(MyDVBT.designLowPassFilterDVBT(fs, ch_bw, transition_bw, n_taps))
+    for block in blocks:
+        yield fir.process(block).astype(DSPBlocks.getSignalDtype(block), copy=False)
+
+
+def resampleStream(blocks, fs, fs_new=DSPBlocks.DVBT_FS, ch_bw=None):
+    '''Streaming polyphase resampling from fs to fs_new (the DVB-T sample rate of 64/7 MHz by default).
+        With ch_bw the resampler's filter is also the channel filter (see DSPBlocks.designResamplingFilter).
+        The resampled blocks are of the first block's dtype (complex64 for complex64 captures).'''
+    (up, down) = DSPBlocks.getResamplingRatio(fs, fs_new)
+    taps = DSPBlocks.designResamplingFilter(up, down, fs, ch_bw)
+    resampler = None
+    for block in blocks:
+        if (resampler is None):
+            resampler = DSPBlocks.PolyphaseResampler(up, down, taps, dtype=DSPBlocks.getSignalDtype(block))
+        yield resampler.process(block)
+
+
+def recordStream(blocks, Filename, attributes, append=False):
+    '''Passes the blocks through unchanged while writing them to Filename.xdat/.xhdr (Record.XdatWriter),
+        e.g. to keep the resampled signal without holding it in memory'''
+    with Record.XdatWriter(Filename, attributes, append) as writer:
+        for block in blocks:
+            writer.write(block)
+            yield block
+
+
+def synchronizeStream(blocks, fs, time_shift, freq_shift):
+    '''Streaming getSynchronizedSignal - drops the first time_shift samples and removes freq_shift
+        with an oscillator whose phase continues from block to block (DSPBlocks.NCO)'''
+    samples_to_skip = time_shift
+    nco = DSPBlocks.NCO(-freq_shift, fs)
+    for block in blocks:
+        if (samples_to_skip > 0):
+            skipped = min(samples_to_skip, len(block))
+            block = block[skipped:]
+            samples_to_skip -= skipped
+        if (len(block) == 0):
+            continue
+        yield nco.mix(block)
+
+
+def trackStream(blocks, fs, mode, cyclic_prefix, time_shift, freq_shift):
+    '''Synchronization and OFDM demodulation with frequency, phase and sampling clock tracking
+        (MyDVBT.DVBTSynchronizationTracker) - yields the carriers of the whole OFDM symbols received so far'''
+    tracker = MyDVBT.DVBTSynchronizationTracker(mode, cyclic_prefix, fs, freq_shift)
+    for block in synchronizeStream(blocks, fs, time_shift, 0):
+        symbols = tracker.process(block)
+        if (len(symbols) > 0):
+            yield symbols
+
+
+def ofdmDemodulateStream(blocks, FFT_len, K, CP_len):
+    '''Streaming getFreqDomOFDMSymbolsFromTimeDom - yields the carriers of the whole OFDM symbols
+        received so far and keeps the partial symbol for the next block'''
+    symbol_len_with_cp = FFT_len + CP_len
+    pending = np.zeros(0, dtype=complex)
+    for block in blocks:
+        pending = np.concatenate((pending, block))
+        num_symbols = len(pending)//symbol_len_with_cp
+        if (num_symbols == 0):
+            continue
+        yield MyDVBT.getFreqDomOFDMSymbolsFromTimeDom(FFT_len, K, CP_len, pending[:num_symbols*symbol_len_with_cp])
+        pending = pending[num_symbols*symbol_len_with_cp:]
+
+
+def equalizeStream(symbol_blocks, FFT_len, CP_len, interp_kind='linear', pilots_to_use="continuous"):
+    '''Streaming removeChannelResponse - every block holds whole OFDM symbols.
+        With pilots_to_use="scattered" the estimator keeps its pilots between blocks, so the output is
+        3 symbols behind the input until the end of the stream.'''
+    if (pilots_to_use == "scattered"):
+        K = MyDVBT.DVBTModeParams(FFT_len//1024, 4)[1]
+        estimator = MyDVBT.ScatteredPilotChannelEstimator(K, interp_kind)
+        for symbols in symbol_blocks:
+            yield estimator.process(symbols).reshape(-1)
+        yield estimator.flush().reshape(-1)
+        return
+    for symbols in symbol_blocks:
+        yield MyDVBT.removeChannelResponse(FFT_len, CP_len, symbols, interp_kind)
+
+
+def demodulateStream(resampled_blocks, fs, mode, cyclic_prefix, time_shift, freq_shift, interp_kind='linear', tracking=False):
+    '''Synchronization, OFDM demodulation and equalization of a signal already at the DVB-T sample rate.
+        With tracking the frequency offset and the sampling clock are tracked symbol by symbol (trackStream).'''
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+    if tracking:
+        symbol_blocks = trackStream(resampled_blocks, fs, mode, cyclic_prefix, time_shift, freq_shift)
+    else:
+        synced_blocks = synchronizeStream(resampled_blocks, fs, time_shift, freq_shift)
+        symbol_blocks = ofdmDemodulateStream(synced_blocks, FFT_len, K, CP_len)
+    return equalizeStream(symbol_blocks, FFT_len, CP_len, interp_kind)
+
+
+def acquireStream(blocks, fs, bw, acquisition_len=65536):
+    '''Filters and resamples the capture blocks and looks for a DVB-T signal in the first acquisition_len
+        resampled samples - exactly those samples, whatever the block size, so the result does not depend on
+        how the capture was split into blocks.
+
+        Returns (is_DVBT, mode, cyclic_prefix, time_shift, freq_shift, resampled_blocks), where
+        resampled_blocks yields the resampled signal from its first sample (including the samples
+        used for the acquisition). An empty stream (e.g. an empty XDAT file) is not a DVB-T signal.'''
+    if (DSPBlocks.getResamplingRatio(fs) == (1, 1)):
+        if (bw > 8e6):
+            blocks = lowPassFilterStream(blocks, fs)
+        resampled_blocks = blocks
+    else:
+        resampled_blocks = resampleStream(blocks, fs, ch_bw=7.61e6 if bw > 8e6 else None)
+
+    acquired_blocks = []
+    num_acquired = 0
+    for block in resampled_blocks:
+        acquired_blocks.append(block)
+        num_acquired += len(block)
+        if (num_acquired >= acquisition_len):
+            break
+    if not acquired_blocks:
+        return (False, 0, 0, 0, 0, iter(()))
+    acquired_signal = np.concatenate(acquired_blocks)
+    resampled_blocks = itertools.chain([acquired_signal], resampled_blocks)
+
+    detection_signal = acquired_signal[:acquisition_len]
+    (is_DVBT, mode, cyclic_prefix, time_shift, freq_shift) = MyDVBT.findDVBTSignal(detection_signal, len(detection_signal))
+
+    return (is_DVBT, mode, cyclic_prefix, time_shift, freq_shift, resampled_blocks)
+
+
+def receiveStream(blocks, fs, bw, interp_kind='linear', acquisition_len=65536):
+    '''Streaming receive chain from capture blocks to equalized carriers.
+
+        Returns (is_DVBT, mode, cyclic_prefix, equalized_blocks) - equalized_blocks yields the
+        equalized K carriers of every whole OFDM symbol, as removeChannelResponse does.'''
+    fs_new = int(DSPBlocks.DVBT_FS)
+    (is_DVBT, mode, cyclic_prefix, time_shift, freq_shift, resampled_blocks) = acquireStream(blocks, fs, bw, acquisition_len)
+    if not is_DVBT:
+        return (False, 0, 0, iter(()))
+    return (is_DVBT, mode, cyclic_prefix, demodulateStream(resampled_blocks, fs_new, mode, cyclic_prefix, time_shift, freq_shift, interp_kind))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+'''Plots of the receive chain (matplotlib).
+
+    The DSP modules import this module only when a plot is asked for (get_plot=True, or MyDVBT.plotPSD and the
+    other plot functions), so matplotlib is never loaded by the processing code or by worker processes. The
+    backend is not changed here - in a notebook choose it with %matplotlib widget (ipympl) or %matplotlib notebook.
+'''
+import numpy as np
+import matplotlib.pyplot as plt
+
+
+def plotPSD(data, fs, title="Data"):
+    plt.figure()
+    plt.title("PSD of {}".format(title))
+    plt.psd(data, NFFT=len(data), Fs=fs)
+
+
+def plotScatter(dataX, dataY, title="X vs Y"):
+    plt.figure()
+    plt.title("Scatter of {}".format(title))
+    plt.scatter(dataX, dataY)
+
+
+def plotStem(data, title="Data"):
+    plt.figure()
+    plt.title("Stem Plot of {}".format(title))
+    plt.stem(data)
+
+
+def plotPlot(data, title="Data"):
+    plt.figure()
+    plt.title("Plot of {}".format(title))
+    plt.plot(data)
+
+
+def plotFilterResponse(taps, fs):
+    '''Plots the frequency response of the filter taps (lowPassFilterDVBT's get_plot)'''
+    import scipy.signal as sig
+    w,h = sig.freqz(taps)
+    plt.figure()
+    plt.plot(w*fs*0.5/np.pi, 20*np.log10(abs(h)))
+    plt.xscale('log')
+    plt.title('Filter Frequency Response')
+    plt.xlabel('Frequency')
+    plt.ylabel('Amplitude')
+    plt.grid(which='both',axis='both')
+    plt.show()
+
+
+def plotTimeCorrelation(time_corr_vec, peaks, FFT_len, CP):
+    '''Plots the pilot time correlation and its peaks (checkDVBTSymbolTimeCorrelation's get_plot)'''
+    plt.figure()
+    plt.title("Time Correlation for {}k mode, CP of 1/{}".format(FFT_len, int(FFT_len/CP)))
+    plt.plot(np.abs(time_corr_vec))
+    plt.plot(peaks, np.abs(time_corr_vec[peaks.astype(int)]), "x")
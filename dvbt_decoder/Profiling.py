@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+'''Per-stage profiling of the receive chain - wall time, samples processed, MSamples/s and peak allocation.
+
+    The processing code marks its stages with the profiled decorator or a stage context:
+
+        @Profiling.profiled(samples_arg='iq_data')
+        def filterAndResampleToDVBT(iq_data, fs, bw, ...):
+            ...
+        with Profiling.stage('remez', n_taps):
+            ...
+
+    When profiling is off a marked stage costs one global check, so the marks stay in the code. Profiling is
+    turned on for a block of code with a Profiler:
+
+        with Profiling.profile() as profiler:
+            MyDVBT.isAnyDVBTSignal(iq_data, fs, bw, N)
+        print(profiler.formatSummary())
+        profiler.saveChromeTrace('scan.trace.json')      # for chrome://tracing or https://ui.perfetto.dev
+
+    or for a whole run with the DVBT_PROFILE environment variable, the file written at exit - a Chrome trace
+    when its name ends with .trace.json, and the JSON summary and events otherwise:
+
+        DVBT_PROFILE=scan.trace.json python BatchScan.py scan/
+
+    The peak allocation of a stage is measured with tracemalloc (NumPy reports its array buffers to it), which
+    slows down code that allocates a lot - Profiler(trace_memory=False) measures the time only.
+'''
+import atexit
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+import numpy as np
+
+PROFILE_ENV_VAR = 'DVBT_PROFILE'
+
+_NULL_STAGE = contextlib.nullcontext()
+_active_profiler = None
+
+
+class _Stage:
+    '''Context of one run of a stage, measuring its time and its peak allocation above the memory in use
+        when it started'''
+
+    def __init__(self, profiler, name, num_samples):
+        self.profiler = profiler
+        self.name = name
+        self.num_samples = num_samples
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = self.profiler._getStack()
+        if self.profiler.trace_memory:
+            (self.start_memory, self.outer_peak) = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        stack = self.profiler._getStack()
+        stack.pop()
+        peak_bytes = 0
+        if self.profiler.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            peak_bytes = max(peak - self.start_memory, 0)
+            # The peak was reset when this stage started, so the enclosing stage keeps the highest one seen
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, self.outer_peak, peak)
+        self.profiler._record(self.name, self.start, end - self.start, self.num_samples, peak_bytes, self.depth)
+        return False
+
+
+class Profiler:
+    '''Collects the runs of the stages while it is active (see profile())'''
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.events = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _getStack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, name, start, duration, num_samples, peak_bytes, depth):
+        event = {'name': name, 'start': start - self.origin, 'duration': duration, 'num_samples': int(num_samples),
+                 'peak_bytes': int(peak_bytes), 'depth': depth, 'thread': threading.get_ident()}
+        with self._lock:
+            self.events.append(event)
+
+    def stage(self, name, num_samples=0):
+        return _Stage(self, name, num_samples)
+
+    def summary(self):
+        '''Returns a list of the stages (in the order they first ended) with their number of calls, total time,
+            samples, MSamples/s (None without samples) and highest peak allocation'''
+        stages = {}
+        for event in self.events:
+            stage_summary = stages.setdefault(event['name'], {'name': event['name'], 'calls': 0, 'total_time': 0.0,
+                                                              'num_samples': 0, 'msps': None, 'peak_bytes': 0})
+            stage_summary['calls'] += 1
+            stage_summary['total_time'] += event['duration']
+            stage_summary['num_samples'] += event['num_samples']
+            stage_summary['peak_bytes'] = max(stage_summary['peak_bytes'], event['peak_bytes'])
+        for stage_summary in stages.values():
+            if (stage_summary['num_samples'] > 0 and stage_summary['total_time'] > 0):
+                stage_summary['msps'] = stage_summary['num_samples']/stage_summary['total_time']/1e6
+        return list(stages.values())
+
+    def formatSummary(self):
+        lines = ['{:<36} {:>6} {:>10} {:>12} {:>9} {:>10}'.format('Stage', 'Calls', 'Time [s]', 'Samples', 'MS/s', 'Peak [MB]')]
+        for stage_summary in self.summary():
+            lines.append('{:<36} {:>6} {:>10.4f} {:>12} {:>9} {:>10.1f}'.format(stage_summary['name'], stage_summary['calls'],
+                         stage_summary['total_time'], stage_summary['num_samples'],
+                         '-' if stage_summary['msps'] is None else '{:.2f}'.format(stage_summary['msps']),
+                         stage_summary['peak_bytes']/2**20))
+        return '\n'.join(lines)
+
+    def toChromeTrace(self):
+        '''Returns the events in the Chrome trace event format (complete events, times in microseconds)'''
+        pid = os.getpid()
+        trace_events = []
+        for event in self.events:
+            args = {'num_samples': event['num_samples'], 'peak_bytes': event['peak_bytes']}
+            if (event['num_samples'] > 0 and event['duration'] > 0):
+                args['msps'] = event['num_samples']/event['duration']/1e6
+            trace_events.append({'name': event['name'], 'ph': 'X', 'ts': event['start']*1e6, 'dur': event['duration']*1e6,
+                                 'pid': pid, 'tid': event['thread'], 'args': args})
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def saveJSON(self, Filename):
+        with open(Filename, 'w') as json_file:
+            json.dump({'stages': self.summary(), 'events': self.events}, json_file, indent=1)
+
+    def saveChromeTrace(self, Filename):
+        with open(Filename, 'w') as json_file:
+            json.dump(self.toChromeTrace(), json_file)
+
+    def save(self, Filename):
+        '''Saves a Chrome trace when Filename ends with .trace.json, and the JSON summary and events otherwise'''
+        if Filename.endswith('.trace.json'):
+            self.saveChromeTrace(Filename)
+        else:
+            self.saveJSON(Filename)
+
+
+def isProfiling():
+    return _active_profiler is not None
+
+
+def stage(name, num_samples=0):
+    '''Returns the context of a run of the stage (a shared do-nothing context when profiling is off)'''
+    if (_active_profiler is None):
+        return _NULL_STAGE
+    return _active_profiler.stage(name, num_samples)
+
+
+def profiled(name=None, samples_arg=None):
+    '''Decorator marking a function as a stage (named after the function by default). The number of samples
+        of a call is the size of its samples_arg argument - samples, carriers, LLRs or bytes'''
+    def decorator(function):
+        stage_name = function.__name__ if name is None else name
+        samples_index = None
+        if (samples_arg is not None):
+            samples_index = list(inspect.signature(function).parameters).index(samples_arg)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if (_active_profiler is None):
+                return function(*args, **kwargs)
+            num_samples = 0
+            if (samples_index is not None):
+                num_samples = np.size(args[samples_index] if samples_index < len(args) else kwargs.get(samples_arg, ()))
+            with _active_profiler.stage(stage_name, num_samples):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def profile(trace_memory=True):
+    '''Profiles the stages run in the with block - yields the Profiler'''
+    global _active_profiler
+    profiler = Profiler(trace_memory)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    previous_profiler = _active_profiler
+    _active_profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _active_profiler = previous_profiler
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def _profileRun(Filename):
+    '''Profiles the whole run (DVBT_PROFILE) and saves the profile to Filename at exit'''
+    global _active_profiler
+    tracemalloc.start()
+    _active_profiler = Profiler()
+    atexit.register(_active_profiler.save, os.path.abspath(Filename))
+
+if os.environ.get(PROFILE_ENV_VAR):
+    _profileRun(os.environ[PROFILE_ENV_VAR])
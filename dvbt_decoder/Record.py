@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+
+class Attributes:
+    def __init__(self,fc,fs,scale):
+        self.fc = fc
+        self.fs = fs
+        self.ts = 1/fs
+        self.scale = scale
+        
+        
+
+class XdatReader:
+    '''Memory-mapped reader of an interleaved int16 IQ XDAT recording.
+
+        Nothing is read from disk until samples are requested - view() returns zero-copy int16 views of
+        the file and read()/blocks() convert only the requested samples to complex64.
+        Offsets and counts are given in IQ samples (one I,Q pair = one sample).'''
+
+    def __init__(self, xdat_filename, block_size=2**20):
+        if (os.path.getsize(xdat_filename) == 0):
+            # An empty file cannot be memory-mapped - it is a recording of no samples
+            raw = np.zeros(0, dtype='int16')
+        else:
+            raw = np.memmap(xdat_filename, dtype='int16', mode='r')
+        self.num_samples = len(raw)//2
+        self.iq = raw[:2*self.num_samples].reshape(self.num_samples,2)
+        self.block_size = block_size
+
+    def __len__(self):
+        return self.num_samples
+
+    def _checkRange(self, offset, count):
+        if (offset < 0 or offset > self.num_samples):
+            raise ValueError("Invalid offset! Recording has {} samples".format(self.num_samples))
+        if (count is None):
+            return self.num_samples - offset
+        return min(count, self.num_samples - offset)
+
+    def view(self, offset=0, count=None):
+        '''Zero-copy (count,2) int16 view of the I,Q pairs starting at sample offset'''
+        count = self._checkRange(offset, count)
+        return self.iq[offset:offset+count]
+
+    def read(self, offset=0, count=None, out=None):
+        '''Convert count samples starting at sample offset to complex64.
+            If out is given (a complex64 array of at least count samples) it is filled in place.'''
+        iq = self.view(offset, count)
+        if (out is None):
+            out = np.empty(len(iq), dtype=np.complex64)
+        else:
+            out = out[:len(iq)]
+        out.view(np.float32).reshape(len(iq),2)[:] = iq
+        return out
+
+    def blocks(self, block_size=None, offset=0, count=None):
+        '''Yield consecutive complex64 blocks of block_size samples (the last block may be shorter)'''
+        if (block_size is None):
+            block_size = self.block_size
+        count = self._checkRange(offset, count)
+        end = offset + count
+        for start in range(offset, end, block_size):
+            yield self.read(start, min(block_size, end - start))
+
+
+def parse_xdat(xdat_filename, offset=0, count=None):
+    '''Returns count complex64 samples (default - all) starting at sample offset'''
+    return XdatReader(xdat_filename).read(offset, count)
+
+
+def parse_xhdr(xhdr_filename):
+    import lxml.etree as ET
+    try:
+        try:
+            xhdr = ET.parse(xhdr_filename).getroot()
+        except:
+            print('Error - invalid XHDR file')
+            return 0
+        fc = float(xhdr[0][0].attrib['center_frequency'])
+        fs = float(xhdr[0][0].attrib['sample_rate'])
+        scale = np.power(2,16) * float(xhdr[0][0].attrib['acq_scale_factor'])
+        prop = Attributes(fc,fs,scale)
+        return prop
+    except:
+        print('Error - invalid XHDR properites')
+        return 0
+    
+    
+class XdatWriter:
+    '''Streaming writer of an interleaved int16 IQ XDAT recording and its XHDR.
+
+        write() takes complex blocks of any size, scales them by 1/Attributes.scale (so parse_xdat(...)*scale
+        gives back the samples), rounds and clips them to int16 in a reusable buffer and appends them to
+        Filename.xdat. The XHDR, with the final sample count, is written by close() (or at the end of a
+        with block):
+
+            with XdatWriter('NewXdat', attributes) as writer:
+                for block in resampled_blocks:
+                    writer.write(block)
+
+        With append=True the samples are added to the end of an existing XDAT file.'''
+
+    def __init__(self, Filename, Attributes, append=False, block_size=2**20):
+        self.filename = Filename
+        self.attributes = Attributes
+        self.block_size = block_size
+        self.xdat_file = open(Filename + ".xdat", "ab" if append else "wb")
+        self.num_samples = self.xdat_file.tell()//4
+        self.inverse_scale = 1/float(Attributes.scale)
+        self.scaled_buffer = np.empty(2*block_size, dtype=np.float32)
+        self.int16_buffer = np.empty(2*block_size, dtype='int16')
+
+    def write(self, block):
+        block = np.ascontiguousarray(block)
+        if not np.iscomplexobj(block):
+            block = block.astype(np.complex64)
+        for start in range(0, len(block), self.block_size):
+            # A complex array viewed as floats is already interleaved I,Q
+            iq = block[start:start+self.block_size].view(block.real.dtype)
+            scaled = self.scaled_buffer[:len(iq)]
+            np.multiply(iq, self.inverse_scale, out=scaled, casting='unsafe')
+            np.rint(scaled, out=scaled)
+            np.clip(scaled, -32768, 32767, out=scaled)
+            interleaved = self.int16_buffer[:len(iq)]
+            np.copyto(interleaved, scaled, casting='unsafe')
+            interleaved.tofile(self.xdat_file)
+        self.num_samples += len(block)
+
+    def close(self):
+        if not self.xdat_file.closed:
+            self.xdat_file.close()
+            writeXhdr(self.filename, self.attributes, self.num_samples)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def writeXhdr(Filename,Attributes,num_samples):
+    import lxml.etree as ET
+    root = ET.Element("xcom_header")
+    root.set('header_version','1.0')
+    root.set('sw_version','1.1.0.0')
+    root.set('name',Filename)
+    
+    captures = ET.SubElement(root, "captures")
+    data_files = ET.SubElement(root, "data_files")
+    
+    ET.SubElement(captures, "capture",
+                  name= Filename,
+                  center_frequency=str(Attributes.fc),
+                  sample_rate=str(Attributes.fs),
+                  span=str(Attributes.fs),
+                  acq_scale_factor= str(float(Attributes.scale)/np.power(2,16)))
+
+    ET.SubElement(data_files, "data",
+                  channel_count="1",
+                  data_encoding="int16",
+                  iq_interleave="true",
+                  little_endian="true",
+                  name= Filename + ".xdat",
+                  protected="false",
+                  sample_resolution="16",
+                  samples= str(int(num_samples)),
+                  signed_type="true")
+
+    tree = ET.ElementTree(root)
+    xml_object = ET.tostring(tree,
+                             pretty_print=True,
+                             xml_declaration=True,
+                             encoding='UTF-8')
+
+    with open(Filename +".xhdr", "wb") as writter:
+        writter.write(xml_object)
+
+
+def CreateRecord(IQData,Filename,Attributes):
+    '''Writes IQData as Filename.xdat/.xhdr (the samples are scaled by 1/Attributes.scale, see XdatWriter)'''
+    with XdatWriter(Filename, Attributes) as writer:
+        writer.write(IQData)
+        
+        
+def FM_IQ_Demod(IQData):
+    from scipy import signal
+    b = signal.firls(29,[0,0.9],[0,1])
+    d = IQData/np.abs(IQData) #normalize the amplitude
+    iData = np.real(d)
+    qData = np.imag(d)
+    
+    FM_demodulated = (qData*signal.convolve(iData,b,'same')-iData*signal.convolve(qData,b,'same'))/(np.power(qData,2)+np.power(iData,2))
+    return FM_demodulated
\ No newline at end of file
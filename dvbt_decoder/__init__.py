@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+'''DVB-T (ETSI EN 300 744) detection, demodulation and decoding in NumPy.
+
+    Importing the package loads nothing - its modules are imported on first use (dvbt_decoder.MyDVBT works
+    right after import dvbt_decoder), and the modules themselves load only NumPy. SciPy is loaded by the
+    functions that design filters or build interpolators, lxml by the XHDR reader and writer of Record, and
+    matplotlib only by the Plotting submodule, which the DSP modules import when a plot is asked for. So worker
+    processes start fast:
+
+        from dvbt_decoder import MyDVBT, Pipeline
+
+        (is_DVBT, mode, cyclic_prefix, time_shift, freq_shift) = MyDVBT.findDVBTSignal(resampled_signal, N)
+
+    The top level modules of the same names (import MyDVBT, ...) are the same modules, for the scripts and
+    notebooks written before the package.
+'''
+import importlib
+
+SUBMODULES = ('DSPBlocks', 'DVBTDecoder', 'DVBTSynthesizer', 'MyDVBT', 'Pipeline', 'Plotting', 'Profiling', 'Record')
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(SUBMODULES))
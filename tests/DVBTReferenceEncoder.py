@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+'''Reference DVB-T transmitter (ETSI EN 300 744) for the decoder tests.
+
+    Written from the standard, one stage per function and without the decoder's tables, so the round trip
+    tests check DVBTDecoder against an independent implementation: energy dispersal, RS(204,188), outer
+    interleaver, convolutional code and puncturing, bit interleaver, symbol interleaver, QAM mapping and the
+    TPS (BCH code and DBPSK). Speed does not matter here - the stages are plain loops or NumPy expressions of
+    the formulas in the standard. The pilots and the carrier layout of a frame come from
+    DVBTSynthesizer.createDVBTFrameCarriers.
+'''
+import numpy as np
+from dvbt_decoder import DVBTSynthesizer, MyDVBT
+
+SYMBOLS_PER_FRAME = 68
+
+# GF(256) of RS(204,188): field generator polynomial x^8 + x^4 + x^3 + x^2 + 1 (section 4.3.2)
+GF_FIELD_POLYNOMIAL = 0b100011101
+
+
+def gfMultiply(a, b):
+    '''Carry-less multiplication of two bytes modulo the field generator polynomial'''
+    product = 0
+    while b:
+        if (b & 1):
+            product ^= a
+        b >>= 1
+        a <<= 1
+        if (a & 0x100):
+            a ^= GF_FIELD_POLYNOMIAL
+    return product
+
+
+GF_MULTIPLICATION_TABLE = np.array([[gfMultiply(a, b) for b in range(256)] for a in range(256)], dtype=np.uint8)
+
+
+def getRSGeneratorPolynomial():
+    '''g(x) = (x + lambda^0)(x + lambda^1)...(x + lambda^15), lambda = 0x02 - coefficients from x^16 down'''
+    generator = [1]
+    root = 1
+    for i in range(16):
+        # Multiply by (x + root)
+        generator = [coefficient ^ gfMultiply(previous, root) for (coefficient, previous) in zip(generator + [0], [0] + generator)]
+        root = gfMultiply(root, 2)
+    return np.array(generator, dtype=np.uint8)
+
+
+def rsEncode(packets):
+    '''Systematic RS(204,188) codewords of (num_packets, 188) bytes - the 16 parity bytes are the remainder of
+        the division of the packet (first byte the highest power) times x^16 by g(x). The shortened code is
+        the same as RS(255,239) with 51 leading zero bytes, which do not change the remainder.'''
+    generator = getRSGeneratorPolynomial()
+    remainder = np.zeros((len(packets), 16), dtype=np.uint8)
+    for i in range(packets.shape[1]):
+        feedback = packets[:, i] ^ remainder[:, 0]
+        remainder = np.concatenate((remainder[:, 1:], np.zeros((len(packets), 1), dtype=np.uint8)), axis=1)
+        remainder ^= GF_MULTIPLICATION_TABLE[feedback[:, None], generator[None, 1:]]
+    return np.concatenate((packets, remainder), axis=1)
+
+
+def energyScramble(packets):
+    '''Energy dispersal (section 4.3.1) of (num_packets, 188) packets with 0x47 sync bytes, in groups of 8
+        packets: the PRBS 1 + x^14 + x^15 is loaded with 100101010000000 at the start of every group, whose
+        first sync byte is inverted to 0xB8. The PRBS starts with the first bit after that sync byte and keeps
+        running during the next 7 sync bytes, which it does not scramble.'''
+    scrambled = packets.copy()
+    for group_start in range(0, len(packets) - len(packets) % 8, 8):
+        register = [1,0,0,1,0,1,0,1,0,0,0,0,0,0,0]
+        for packet in range(group_start, group_start + 8):
+            for byte_index in range(188):
+                if (packet == group_start and byte_index == 0):
+                    continue
+                prbs_byte = 0
+                for bit in range(8):
+                    output = register[13] ^ register[14]
+                    register = [output] + register[:-1]
+                    prbs_byte = (prbs_byte << 1) | output
+                if (byte_index > 0):
+                    scrambled[packet, byte_index] ^= prbs_byte
+        scrambled[group_start, 0] = 0xB8
+    return scrambled
+
+
+def outerInterleave(stream):
+    '''Convolutional (Forney) interleaver with I = 12 branches and M = 17 (section 4.3.2): byte n goes
+        through branch n % 12, a FIFO of (n % 12)*17 bytes of that branch, i.e. (n % 12)*17*12 bytes of the
+        stream. The FIFOs start with zeros.'''
+    interleaved = np.zeros_like(stream)
+    for n in range(len(stream)):
+        source = n - (n % 12)*17*12
+        if (source >= 0):
+            interleaved[n] = stream[source]
+    return interleaved
+
+
+# Mother convolutional code of rate 1/2 (section 4.3.3): G1 = 171 octal (X) and G2 = 133 octal (Y), the
+# coefficients of the input bit delayed by 0...6
+CONV_CODE_X_TAPS = [1,1,1,1,0,0,1]
+CONV_CODE_Y_TAPS = [1,0,1,1,0,1,1]
+
+# Transmitted sequences of the punctured codes (table 2), per puncturing period
+PUNCTURED_SEQUENCES = {'1/2': ['X1', 'Y1'],
+                       '2/3': ['X1', 'Y1', 'Y2'],
+                       '3/4': ['X1', 'Y1', 'Y2', 'X3'],
+                       '5/6': ['X1', 'Y1', 'Y2', 'X3', 'Y4', 'X5'],
+                       '7/8': ['X1', 'Y1', 'Y2', 'Y3', 'Y4', 'X5', 'Y6', 'X7']}
+
+
+def convolutionalEncode(bits, code_rate):
+    '''Returns the punctured coded bits of bits (the encoder starts in the all zero state)'''
+    x_bits = np.convolve(bits, CONV_CODE_X_TAPS)[:len(bits)] % 2
+    y_bits = np.convolve(bits, CONV_CODE_Y_TAPS)[:len(bits)] % 2
+    sequence = PUNCTURED_SEQUENCES[code_rate]
+    period = max(int(name[1:]) for name in sequence)
+    num_periods = len(bits)//period
+    outputs = {'X': x_bits[:num_periods*period].reshape(num_periods, period),
+               'Y': y_bits[:num_periods*period].reshape(num_periods, period)}
+    return np.stack([outputs[name[0]][:, int(name[1:]) - 1] for name in sequence], axis=1).reshape(-1)
+
+
+def bitInterleave(coded_bits, bits_per_cell):
+    '''Demultiplexing and bit-wise interleaving (section 4.3.4.1), non hierarchical: x0, x1, ... go to
+        b0,0 b2,0 b1,0 b3,0 (16QAM) etc., and sub-stream e is interleaved in blocks of 126 bits by
+        a_e,w = b_e,H_e(w). Returns the (num_words, v) words y_w = (a_0,w ... a_v-1,w).'''
+    demux = {2: [0, 1], 4: [0, 2, 1, 3], 6: [0, 2, 4, 1, 3, 5]}[bits_per_cell]
+    H = [lambda w: w, lambda w: (w + 63) % 126, lambda w: (w + 105) % 126,
+         lambda w: (w + 42) % 126, lambda w: (w + 21) % 126, lambda w: (w + 84) % 126]
+    num_blocks = len(coded_bits)//(126*bits_per_cell)
+    words = np.zeros((num_blocks*126, bits_per_cell), dtype=np.uint8)
+    for block in range(num_blocks):
+        x = coded_bits[block*126*bits_per_cell:(block + 1)*126*bits_per_cell]
+        b = np.zeros((bits_per_cell, 126), dtype=np.uint8)
+        for di in range(len(x)):
+            b[demux[di % bits_per_cell], di//bits_per_cell] = x[di]
+        for e in range(bits_per_cell):
+            for w in range(126):
+                words[block*126 + w, e] = b[e, H[e](w)]
+    return words
+
+
+# Symbol interleaver (section 4.3.4.2): the R'_i bit that goes to every R_i bit, listed as in tables 5 and 6
+# (R'_i bit positions from the highest down, and the R_i bit position each one goes to)
+SYMBOL_INTERLEAVER_BIT_TABLE = {2: ([9, 8, 7, 6, 5, 4, 3, 2, 1, 0], [0, 7, 5, 1, 8, 2, 6, 9, 3, 4]),
+                                8: ([11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1, 0], [5, 11, 3, 0, 10, 8, 6, 9, 2, 4, 1, 7])}
+
+
+def symbolInterleaverH(mode):
+    '''Returns H(q) for q = 0...Nmax-1 of the 2k or 8k symbol interleaver'''
+    (FFT_len, K, CP_len, N_max) = MyDVBT.DVBTModeParams(mode, 4)
+    Nr = FFT_len.bit_length() - 1
+    (primed_positions, positions) = SYMBOL_INTERLEAVER_BIT_TABLE[mode]
+    H = []
+    register = [0]*(Nr - 1)       # R'_i bits 0...Nr-2
+    for i in range(FFT_len):
+        if (i == 2):
+            register = [1] + [0]*(Nr - 2)
+        elif (i > 2):
+            previous = register
+            register = previous[1:] + [0]
+            if (mode == 2):
+                register[Nr - 2] = previous[0] ^ previous[3]
+            else:
+                register[Nr - 2] = previous[0] ^ previous[1] ^ previous[4] ^ previous[6]
+        R = [0]*(Nr - 1)
+        for (primed_position, position) in zip(primed_positions, positions):
+            R[position] = register[primed_position]
+        q = (i % 2)*2**(Nr - 1) + sum(R[j]*2**j for j in range(Nr - 1))
+        if (q < N_max):
+            H.append(q)
+    return np.array(H)
+
+
+def symbolInterleave(words, mode, first_symbol_index=0):
+    '''Interleaves the (num_symbols*N_max, v) words symbol by symbol: y_H(q) = y'_q in the even symbols and
+        y_q = y'_H(q) in the odd symbols of a frame'''
+    H = symbolInterleaverH(mode)
+    symbols = words.reshape(-1, len(H), words.shape[1])
+    interleaved = np.empty_like(symbols)
+    for (s, symbol) in enumerate(symbols):
+        if ((first_symbol_index + s) % 2 == 0):
+            interleaved[s, H] = symbol
+        else:
+            interleaved[s] = symbol[H]
+    return interleaved.reshape(-1, words.shape[1])
+
+
+# Levels of one axis of the constellation (figure 9), from the bits y0,y2,y4 (real) or y1,y3,y5 (imaginary)
+AXIS_LEVELS = {2: {(0,): 1, (1,): -1},
+               4: {(0, 0): 3, (0, 1): 1, (1, 0): -3, (1, 1): -1},
+               6: {(0, 0, 0): 7, (0, 0, 1): 5, (0, 1, 1): 3, (0, 1, 0): 1, (1, 1, 0): -1, (1, 1, 1): -3, (1, 0, 1): -5, (1, 0, 0): -7}}
+NORMALIZATION = {2: np.sqrt(2), 4: np.sqrt(10), 6: np.sqrt(42)}
+
+
+def mapWords(words):
+    '''Non hierarchical QAM mapping of (num_cells, v) words, normalized to an average power of 1'''
+    bits_per_cell = words.shape[1]
+    levels = AXIS_LEVELS[bits_per_cell]
+    real = np.array([levels[tuple(word[0::2])] for word in words])
+    imag = np.array([levels[tuple(word[1::2])] for word in words])
+    return (real + 1j*imag)/NORMALIZATION[bits_per_cell]
+
+
+# TPS (section 4.6.2)
+TPS_SYNC_WORD = [0,0,1,1,0,1,0,1,1,1,1,0,1,1,1,0]      # frames 1 and 3 - inverted in frames 2 and 4
+TPS_CONSTELLATION_BITS = {'QPSK': [0,0], '16QAM': [0,1], '64QAM': [1,0]}
+TPS_CODE_RATE_BITS = {'1/2': [0,0,0], '2/3': [0,0,1], '3/4': [0,1,0], '5/6': [0,1,1], '7/8': [1,0,0]}
+TPS_GUARD_INTERVAL_BITS = {32: [0,0], 16: [0,1], 8: [1,0], 4: [1,1]}
+TPS_MODE_BITS = {2: [0,0], 8: [0,1]}
+# BCH(67,53) shortened from BCH(127,113): h(x) = x^14 + x^9 + x^8 + x^6 + x^5 + x^4 + x^2 + x + 1
+TPS_BCH_POLYNOMIAL = [1,0,0,0,0,1,1,0,1,1,1,0,1,1,1]
+
+
+def tpsBits(frame_index, mode, cyclic_prefix, constellation, code_rate_HP, code_rate_LP='1/2', cell_id=None):
+    '''Returns the 68 TPS bits s0...s67 of frame frame_index (0-3) of a superframe, non hierarchical'''
+    bits = [0]
+    bits += TPS_SYNC_WORD if frame_index % 2 == 0 else [1 - bit for bit in TPS_SYNC_WORD]
+    bits += [0,1,0,1,1,1] if cell_id is None else [0,1,1,1,1,1]
+    bits += [(frame_index >> 1) & 1, frame_index & 1]
+    bits += TPS_CONSTELLATION_BITS[constellation]
+    bits += [0,0,0]
+    bits += TPS_CODE_RATE_BITS[code_rate_HP] + TPS_CODE_RATE_BITS[code_rate_LP]
+    bits += TPS_GUARD_INTERVAL_BITS[cyclic_prefix] + TPS_MODE_BITS[mode]
+    # Frames 1 and 3 carry bits 15-8 of the cell id, frames 2 and 4 its bits 7-0
+    cell_id_byte = 0 if cell_id is None else (cell_id >> (8 if frame_index % 2 == 0 else 0)) & 0xff
+    bits += [(cell_id_byte >> (7 - i)) & 1 for i in range(8)]
+    bits += [0]*6
+    # Systematic BCH parity of s1...s53: the remainder of s1...s53 times x^14 divided by h(x)
+    remainder = bits[1:] + [0]*14
+    for i in range(53):
+        if remainder[i]:
+            for (j, coefficient) in enumerate(TPS_BCH_POLYNOMIAL):
+                remainder[i + j] ^= coefficient
+    return np.array(bits + remainder[53:])
+
+
+def encodeTransportStream(packets, mode, constellation, code_rate, num_symbols):
+    '''Encodes (num_packets, 188) transport stream packets (0x47 sync bytes, a multiple of 8 packets) to the
+        data cells of num_symbols OFDM symbols from the start of a frame - (num_symbols, N_max) cells. There
+        must be packets enough for the symbols.'''
+    (FFT_len, K, CP_len, N_max) = MyDVBT.DVBTModeParams(mode, 4)
+    bits_per_cell = DVBTSynthesizer.BITS_PER_CELL[constellation]
+    stream = outerInterleave(rsEncode(energyScramble(packets)).reshape(-1))
+    coded_bits = convolutionalEncode(np.unpackbits(stream), code_rate)
+    num_coded_bits = num_symbols*N_max*bits_per_cell
+    if (len(coded_bits) < num_coded_bits):
+        raise ValueError("Not enough packets for {} symbols".format(num_symbols))
+    words = bitInterleave(coded_bits[:num_coded_bits], bits_per_cell)
+    return mapWords(symbolInterleave(words, mode)).reshape(num_symbols, N_max)
+
+
+def packetsForSymbols(mode, constellation, code_rate, num_symbols):
+    '''Returns the number of packets (a multiple of 8) encodeTransportStream needs for num_symbols symbols'''
+    (FFT_len, K, CP_len, N_max) = MyDVBT.DVBTModeParams(mode, 4)
+    sequence = PUNCTURED_SEQUENCES[code_rate]
+    period = max(int(name[1:]) for name in sequence)
+    num_info_bits = -(-num_symbols*N_max*DVBTSynthesizer.BITS_PER_CELL[constellation]*period // len(sequence))
+    num_packets = -(-num_info_bits // (204*8)) + 1
+    return -(-num_packets // 8)*8
+
+
+def createFrames(data_cells, mode, cyclic_prefix, constellation, code_rate, first_frame_index=0, cell_id=None):
+    '''Returns the (num_symbols, K) carriers of whole frames holding the data cells - the pilots and the
+        carrier layout are DVBTSynthesizer's, the TPS carriers are DBPSK modulated with tpsBits'''
+    (FFT_len, K, CP_len, N_max) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+    tables = MyDVBT.getPilotTables(K)
+    num_frames = len(data_cells)//SYMBOLS_PER_FRAME
+    carriers = np.empty((num_frames*SYMBOLS_PER_FRAME, K), dtype=complex)
+    for frame in range(num_frames):
+        frame_index = (first_frame_index + frame) % 4
+        frame_carriers = carriers[frame*SYMBOLS_PER_FRAME:(frame + 1)*SYMBOLS_PER_FRAME]
+        DVBTSynthesizer.createDVBTFrameCarriers(mode, cyclic_prefix, frame_index, constellation, code_rate_HP=code_rate,
+                                                data_cells=data_cells[frame*SYMBOLS_PER_FRAME:(frame + 1)*SYMBOLS_PER_FRAME].reshape(-1),
+                                                out=frame_carriers)
+        # DBPSK: s0 sets the reference phase of symbol 0, and every bit 1 inverts the phase of the next symbol
+        phase = 1
+        bits = tpsBits(frame_index, mode, cyclic_prefix, constellation, code_rate, cell_id=cell_id)
+        for symbol in range(SYMBOLS_PER_FRAME):
+            if (symbol > 0 and bits[symbol] == 1):
+                phase = -phase
+            frame_carriers[symbol, tables.TPS_pos] = phase*tables.TPS_reference
+    return carriers
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+'''Batch scanning of recordings written by Record.XdatWriter'''
+import csv
+import scipy.signal as sig
+import BatchScan
+from dvbt_decoder import DVBTSynthesizer, Record
+
+
+def writeRecording(path, fs=20e6):
+    '''Writes a 2k 1/8 DVB-T capture at fs (the XHDR gets the rate as str(fs), e.g. "20000000.0")'''
+    (signal, dvbt_fs) = DVBTSynthesizer.synthesizeDVBTSignal(2, 8, 1, snr_db=20, freq_offset=5000, time_offset=777, seed=1)
+    signal = sig.resample_poly(signal[:200000].astype(complex), 35, 16)
+    Record.CreateRecord(signal, str(path), Record.Attributes(600e6, fs, 1e-4))
+    return str(path) + '.xdat'
+
+
+def test_scanRecording_of_XdatWriter_recording(tmp_path):
+    xdat_path = writeRecording(tmp_path / 'capture')
+    row = BatchScan.scanRecording(xdat_path)
+    assert row['error'] == ''
+    assert (row['fs'], row['is_DVBT'], row['mode'], row['cyclic_prefix']) == (20000000, 1, 2, 8)
+
+
+def test_truncatePartialRow(tmp_path):
+    output_filename = tmp_path / 'scan.csv'
+    output_filename.write_bytes(b'xdat_path,error\r\na.xdat,\r\nb.xdat,Valu')
+    BatchScan.truncatePartialRow(str(output_filename))
+    assert output_filename.read_bytes() == b'xdat_path,error\r\na.xdat,\r\n'
+    # A partial header leaves an empty file, which gets a new header
+    output_filename.write_bytes(b'xdat_pa')
+    BatchScan.truncatePartialRow(str(output_filename))
+    assert output_filename.read_bytes() == b''
+
+
+def test_scanDirectory_resumes_after_partial_row(tmp_path):
+    xdat_path = writeRecording(tmp_path / 'capture')
+    output_filename = str(tmp_path / 'scan.csv')
+    # A scan killed while writing the recording's row - the row has its path but not all the fields
+    with open(output_filename, 'w', newline='') as results_file:
+        csv.DictWriter(results_file, BatchScan.RESULT_FIELDS).writeheader()
+        results_file.write(xdat_path + ',20000000')
+    assert BatchScan.scanDirectory(str(tmp_path), output_filename, num_workers=1, verbose=False) == 1
+    with open(output_filename, newline='') as results_file:
+        rows = list(csv.DictReader(results_file))
+    assert [row['xdat_path'] for row in rows] == [xdat_path]
+    assert rows[0]['is_DVBT'] == '1' and rows[0]['error'] == ''
+    assert BatchScan.scanDirectory(str(tmp_path), output_filename, num_workers=1, verbose=False) == 0
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+'''Smoke tests of the benchmark script - every benchmark runs once on a short capture'''
+import json
+import Benchmark
+
+
+def test_every_benchmark_runs():
+    assert Benchmark.main(['--sizes', '131072', '--repeat', '1', '--no-save']) == 0
+
+
+def test_runs_are_compared_with_the_history(tmp_path, capsys):
+    history_filename = str(tmp_path / 'history.jsonl')
+    argv = ['--filter', 'createPRBS', '--repeat', '1', '--history', history_filename]
+    assert Benchmark.main(argv) == 0
+    assert Benchmark.main(argv) == 0
+    assert 'Compared with the run of' in capsys.readouterr().out
+    with open(history_filename) as history_file:
+        runs = [json.loads(line) for line in history_file]
+    assert len(runs) == 2
+    assert [result['name'] for result in runs[1]['results']] == ['createPRBS', 'createPRBS']
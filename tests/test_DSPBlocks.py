@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+'''Stateful DSP blocks against their whole-signal SciPy equivalents'''
+import numpy as np
+import pytest
+import scipy.signal as sig
+from dvbt_decoder import DSPBlocks, MyDVBT
+
+
+def makeNoise(num_samples, dtype, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(num_samples) + 1j*rng.standard_normal(num_samples)).astype(dtype)
+
+
+@pytest.mark.parametrize('up, down', [(16, 35), (32, 35), (1, 2), (64, 175), (25, 168)])
+@pytest.mark.parametrize('dtype, tolerance', [(np.complex128, 1e-12), (np.complex64, 1e-5)])
+def test_PolyphaseResampler_in_blocks(up, down, dtype, tolerance):
+    x = makeNoise(50003, dtype)
+    taps = DSPBlocks.designResamplingFilter(up, down, 1)
+    resampler = DSPBlocks.PolyphaseResampler(up, down, taps, dtype=dtype)
+    resampled = np.concatenate([resampler.process(x[start:start+7777]) for start in range(0, len(x), 7777)] + [resampler.flush()])
+    expected = sig.upfirdn(taps, x.astype(complex), up, down)
+    assert resampled.dtype == dtype
+    num_compared = min(len(resampled), len(expected))
+    assert np.max(np.abs(resampled[:num_compared] - expected[:num_compared])) < tolerance*np.max(np.abs(expected))
+
+
+def test_resample_matches_resample_poly():
+    x = makeNoise(100000, complex)
+    assert np.allclose(DSPBlocks.resample(x, 20e6)[0], sig.resample_poly(x, 16, 35))
+
+
+@pytest.mark.parametrize('fs, bw', [(20e6, 8e6), (20e6, 20e6), (int(64e6/7), 20e6)])
+def test_filterAndResampleToDVBT_keeps_complex64(fs, bw):
+    x = makeNoise(200000, np.complex64)
+    (resampled_signal, fs_new, N) = MyDVBT.filterAndResampleToDVBT(x, fs, bw)
+    (expected_signal, fs_new, N) = MyDVBT.filterAndResampleToDVBT(x.astype(complex), fs, bw)
+    assert resampled_signal.dtype == np.complex64
+    assert np.max(np.abs(resampled_signal - expected_signal)) < 1e-5*np.max(np.abs(expected_signal))
+
+
+def test_NCO_in_blocks():
+    nco = DSPBlocks.NCO(1234.5, 1e5, phase=0.3, table_len=1000)
+    oscillator = np.concatenate([nco.generate(num_samples) for num_samples in (1, 999, 2500, 17)])
+    expected = np.exp(1j*(2*np.pi*1234.5/1e5*np.arange(len(oscillator)) + 0.3))
+    assert np.max(np.abs(oscillator - expected)) < 1e-5
+
+
+def test_NCO_setFrequency_continues_the_phase():
+    nco = DSPBlocks.NCO(1000, 1e5, table_len=512)
+    block_sizes = (700, 300, 1234)
+    frequencies = (1000, -2500.25, 40)
+    mixed = []
+    for (num_samples, frequency) in zip(block_sizes, frequencies):
+        nco.setFrequency(frequency)
+        mixed.append(nco.mix(np.ones(num_samples, dtype=complex)))
+    phase_steps = np.concatenate([np.full(num_samples, 2*np.pi*frequency/1e5) for (num_samples, frequency) in zip(block_sizes, frequencies)])
+    expected = np.exp(1j*np.concatenate(([0], np.cumsum(phase_steps)[:-1])))
+    assert np.max(np.abs(np.concatenate(mixed) - expected)) < 1e-12
+
+
+@pytest.mark.parametrize('num_samples', [1, 2, 17, 1705, 6817])
+def test_exponentialRamp(num_samples):
+    expected = np.exp(1j*(-0.0123*np.arange(num_samples) + 2.5))
+    assert np.max(np.abs(DSPBlocks.exponentialRamp(-0.0123, num_samples, 2.5) - expected)) < 1e-12
+
+
+def test_exponentialRamp_of_arrays():
+    phase_steps = np.array([-0.0123, 0.004, 0.3])
+    phases = np.array([2.5, -1, 0])
+    expected = np.exp(1j*(phase_steps[:, None]*np.arange(1705) + phases[:, None]))
+    assert np.max(np.abs(DSPBlocks.exponentialRamp(phase_steps, 1705, phases) - expected)) < 1e-12
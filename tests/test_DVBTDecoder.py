@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+'''Round trips of the DVB-T decoder stages through the reference transmitter of DVBTReferenceEncoder'''
+import numpy as np
+import pytest
+import DVBTReferenceEncoder as Reference
+from dvbt_decoder import DVBTDecoder, MyDVBT
+
+CODE_RATES = ['1/2', '2/3', '3/4', '5/6', '7/8']
+
+
+def makePackets(num_packets, seed=0):
+    packets = np.random.default_rng(seed).integers(0, 256, (num_packets, 188), dtype=np.uint8)
+    packets[:, 0] = 0x47
+    return packets
+
+
+def addNoise(carriers, snr_db, seed=0):
+    rng = np.random.default_rng(seed)
+    noise_std = np.sqrt(np.mean(np.abs(carriers)**2) / 10**(snr_db/10) / 2)
+    return carriers + noise_std*(rng.standard_normal(carriers.shape) + 1j*rng.standard_normal(carriers.shape))
+
+
+def assertConsecutivePackets(decoded_packets, packets, min_num_packets):
+    '''decoded_packets must be packets[first:first+len(decoded_packets)] for some first'''
+    assert len(decoded_packets) >= min_num_packets
+    first = np.flatnonzero(np.all(packets == decoded_packets[0], axis=1))
+    assert len(first) == 1
+    assert np.array_equal(decoded_packets, packets[first[0]:first[0] + len(decoded_packets)])
+
+
+def test_rsDecode_corrects_up_to_8_byte_errors():
+    rng = np.random.default_rng(1)
+    packets = makePackets(100)
+    codewords = Reference.rsEncode(packets)
+    num_errors = np.arange(len(packets)) % 10
+    for (codeword, count) in zip(codewords, num_errors):
+        codeword[rng.choice(204, count, replace=False)] ^= rng.integers(1, 256, count, dtype=np.uint8)
+
+    (decoded_packets, num_corrected_bytes) = DVBTDecoder.rsDecode(codewords)
+    correctable = num_errors <= 8
+    assert np.array_equal(num_corrected_bytes[correctable], num_errors[correctable])
+    assert np.array_equal(decoded_packets[correctable], packets[correctable])
+    assert np.all(num_corrected_bytes[~correctable] == -1)
+
+
+def test_energyDescramble_from_any_packet():
+    packets = makePackets(40)
+    scrambled = Reference.energyScramble(packets)
+    assert DVBTDecoder.findScramblingGroupStart(scrambled[3:]) == 5
+    assert np.array_equal(DVBTDecoder.energyDescramble(scrambled[3:].copy()), packets[8:40])
+
+
+def test_convolutionalDeinterleave():
+    stream = Reference.rsEncode(makePackets(40)).reshape(-1)
+    deinterleaved = DVBTDecoder.convolutionalDeinterleave(Reference.outerInterleave(stream))
+    # The last 11 packets are still in the deinterleaver
+    assert np.array_equal(deinterleaved, stream[:(40 - 11)*204])
+
+
+@pytest.mark.parametrize('bits_per_cell', [2, 4, 6])
+def test_bitDeinterleave(bits_per_cell):
+    coded_bits = np.random.default_rng(bits_per_cell).integers(0, 2, 5*126*bits_per_cell, dtype=np.uint8)
+    words = Reference.bitInterleave(coded_bits, bits_per_cell)
+    assert np.array_equal(DVBTDecoder.bitDeinterleave(words), coded_bits)
+
+
+@pytest.mark.parametrize('mode', [2, 8])
+@pytest.mark.parametrize('first_symbol_index', [0, 1, 66])
+def test_symbolDeinterleave(mode, first_symbol_index):
+    N_max = MyDVBT.DVBTModeParams(mode, 4)[3]
+    cells = np.arange(3*N_max)
+    interleaved = Reference.symbolInterleave(cells[:, None], mode, first_symbol_index).reshape(3, N_max)
+    assert np.array_equal(DVBTDecoder.symbolDeinterleave(interleaved, mode, first_symbol_index), cells.reshape(3, N_max))
+
+
+@pytest.mark.parametrize('code_rate', CODE_RATES)
+@pytest.mark.parametrize('noise_std', [0, 0.3])
+def test_viterbiDecode_punctured(code_rate, noise_std):
+    rng = np.random.default_rng(2)
+    bits = rng.integers(0, 2, 30000, dtype=np.uint8)
+    coded_bits = Reference.convolutionalEncode(bits, code_rate)
+    llrs = 1 - 2.0*coded_bits + noise_std*rng.standard_normal(len(coded_bits))
+    decoded_bits = DVBTDecoder.viterbiDecode(DVBTDecoder.depuncture(llrs, code_rate), block_len=1000)
+    # The stream is not terminated, so the last bits are not decided by the code
+    assert np.array_equal(decoded_bits[:-100], bits[:len(decoded_bits) - 100])
+
+
+@pytest.mark.parametrize('mode, cyclic_prefix, constellation, code_rate, first_frame_index, cell_id', [
+    (2, 4, 'QPSK', '1/2', 0, None),
+    (2, 32, '64QAM', '7/8', 3, 0x1234),
+    (8, 8, '16QAM', '2/3', 1, 0x1234),
+])
+def test_decodeTPS(mode, cyclic_prefix, constellation, code_rate, first_frame_index, cell_id):
+    N_max = MyDVBT.DVBTModeParams(mode, cyclic_prefix)[3]
+    rng = np.random.default_rng(3)
+    data_cells = np.exp(0.5j*np.pi*(rng.integers(0, 4, (2*68, N_max)) + 0.5))
+    carriers = Reference.createFrames(data_cells, mode, cyclic_prefix, constellation, code_rate, first_frame_index, cell_id)
+    # Start in the middle of the first frame, with a phase rotation and noise
+    symbols = addNoise(carriers[10:]*np.exp(1j), 3)
+
+    tps = DVBTDecoder.decodeTPS(symbols, mode)
+    assert tps.frame_start == 58
+    assert tps.symbol_index_in_frame == 10
+    assert tps.frame_index == (first_frame_index + 1) % 4
+    assert (tps.mode, tps.cyclic_prefix, tps.constellation, tps.code_rate_HP, tps.hierarchy) == (mode, cyclic_prefix, constellation, code_rate, None)
+    expected_cell_id = None if cell_id is None else (cell_id >> (8 if tps.frame_index % 2 == 0 else 0)) & 0xff
+    assert tps.cell_id == expected_cell_id
+
+
+@pytest.mark.parametrize('mode, cyclic_prefix, constellation, code_rate, snr_db', [
+    (2, 4, 'QPSK', '1/2', None),
+    (2, 8, '16QAM', '2/3', None),
+    (2, 32, '64QAM', '3/4', None),
+    (2, 4, '16QAM', '5/6', None),
+    (2, 4, '64QAM', '7/8', None),
+    (2, 4, 'QPSK', '1/2', 6),
+    (2, 4, '16QAM', '2/3', 14),
+    (2, 4, '64QAM', '3/4', 20),
+    (8, 8, 'QPSK', '1/2', None),
+])
+def test_decodeTransportStream_round_trip(mode, cyclic_prefix, constellation, code_rate, snr_db):
+    num_packets = Reference.packetsForSymbols(mode, constellation, code_rate, 68)
+    packets = makePackets(num_packets, seed=mode)
+    data_cells = Reference.encodeTransportStream(packets, mode, constellation, code_rate, 68)
+    carriers = Reference.createFrames(data_cells, mode, cyclic_prefix, constellation, code_rate)
+    if (snr_db is not None):
+        carriers = addNoise(carriers, snr_db)
+
+    # The constellation, code rate and symbol index come from the TPS
+    (decoded_packets, num_corrected_bytes) = DVBTDecoder.decodeTransportStream(carriers, mode)
+    # Packets are lost in the outer deinterleaver, to the scrambling groups and at the end of the stream
+    assertConsecutivePackets(decoded_packets, packets, num_packets - 11 - 2*8)
+    assert np.all(num_corrected_bytes >= 0)
+    if (snr_db is None):
+        assert np.all(num_corrected_bytes == 0)
+
+
+def test_decodeTransportStream_through_OFDM():
+    (mode, cyclic_prefix, constellation, code_rate) = (2, 8, '16QAM', '2/3')
+    (FFT_len, K, CP_len, N_max) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+    num_packets = Reference.packetsForSymbols(mode, constellation, code_rate, 68)
+    packets = makePackets(num_packets, seed=4)
+    data_cells = Reference.encodeTransportStream(packets, mode, constellation, code_rate, 68)
+    carriers = Reference.createFrames(data_cells, mode, cyclic_prefix, constellation, code_rate)
+    signal = addNoise(MyDVBT.modulateOFDMSymbols(FFT_len, K, CP_len, carriers), 14 + 10*np.log10(K/FFT_len))
+
+    symbols = MyDVBT.getFreqDomOFDMSymbolsFromTimeDom(FFT_len, K, CP_len, signal)
+    equalized_signal = MyDVBT.removeChannelResponse(FFT_len, CP_len, symbols)
+    (decoded_packets, num_corrected_bytes) = DVBTDecoder.decodeTransportStream(equalized_signal, mode, constellation, code_rate, 0)
+    assertConsecutivePackets(decoded_packets, packets, num_packets - 11 - 2*8)
+    assert np.all(num_corrected_bytes >= 0)
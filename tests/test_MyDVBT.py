@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+'''Detection and synchronization on synthetic captures (DVBTSynthesizer)'''
+import numpy as np
+import pytest
+from dvbt_decoder import DVBTSynthesizer, MyDVBT
+
+TIME_OFFSET = 777
+CAPTURE_LEN = 262144
+
+
+def makeCapture(mode, cyclic_prefix, freq_offset, snr_db=None):
+    (signal, fs) = DVBTSynthesizer.synthesizeDVBTSignal(mode, cyclic_prefix, 1, snr_db=snr_db, freq_offset=freq_offset,
+                                                        time_offset=TIME_OFFSET, seed=mode*10 + cyclic_prefix)
+    return signal[:CAPTURE_LEN]
+
+
+@pytest.mark.parametrize('mode, cyclic_prefix', [(2, 4), (2, 32), (8, 4), (8, 8), (8, 32)])
+@pytest.mark.parametrize('freq_offset', [0, 3348.2, 5000, -12000.5, 30000])
+@pytest.mark.parametrize('snr_db', [None, 0])
+def test_findDVBTSignal_with_frequency_offset(mode, cyclic_prefix, freq_offset, snr_db):
+    # 3348.2 Hz and 5000 Hz are whole carrier spacings in 8k and 2k mode plus a fraction
+    signal = makeCapture(mode, cyclic_prefix, freq_offset, snr_db)
+    (is_DVBT, found_mode, found_cyclic_prefix, time_shift, freq_shift) = MyDVBT.findDVBTSignal(signal, len(signal))
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+    assert is_DVBT
+    assert (found_mode, found_cyclic_prefix) == (mode, cyclic_prefix)
+    assert time_shift == TIME_OFFSET % (FFT_len + CP_len)
+    # Well under a carrier spacing (1116 Hz in 8k mode)
+    assert abs(freq_shift - freq_offset) < 50
+
+
+def test_findDVBTSignal_noise_only():
+    rng = np.random.default_rng(0)
+    noise = (rng.standard_normal(CAPTURE_LEN) + 1j*rng.standard_normal(CAPTURE_LEN)).astype(np.complex64)
+    assert not MyDVBT.findDVBTSignal(noise, len(noise))[0]
+
+
+def test_isAnyDVBTSignal_synchronizes():
+    signal = makeCapture(2, 8, 5000, snr_db=20)
+    (is_DVBT, mode, cyclic_prefix, synchronized_signal) = MyDVBT.isAnyDVBTSignal(signal, DVBTSynthesizer.DVBT_FS, 8e6, len(signal))
+    assert (is_DVBT, mode, cyclic_prefix) == (True, 2, 8)
+    # After synchronization the continuous pilots of every symbol are at their places with no phase rotation
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(2, 8)
+    symbol_len_with_cp = FFT_len + CP_len
+    num_symbols = 8
+    carriers = MyDVBT.getFreqDomOFDMSymbolsFromTimeDom(FFT_len, K, CP_len, synchronized_signal[:num_symbols*symbol_len_with_cp]).reshape(num_symbols, K)
+    tables = MyDVBT.getPilotTables(K)
+    channel_at_pilots = carriers[:, tables.continuous_pilots_pos] / tables.continuous_pilots_values
+    phase_steps = np.angle(np.sum(channel_at_pilots[1:]*np.conj(channel_at_pilots[:-1]), axis=1))
+    assert np.all(np.abs(phase_steps) < 0.1)
+
+
+@pytest.mark.parametrize('mode, cyclic_prefix', [(2, 4), (8, 8)])
+def test_DVBTSynchronizationTracker_converges(mode, cyclic_prefix):
+    # Acquisition leaves a residual frequency offset - the tracker pulls it in and removes the phase it adds up to
+    freq_offset = 3348.2
+    signal = makeCapture(mode, cyclic_prefix, freq_offset, snr_db=25)
+    (FFT_len, K, CP_len, data_carriers_per_symbol) = MyDVBT.DVBTModeParams(mode, cyclic_prefix)
+    tracker = MyDVBT.DVBTSynchronizationTracker(mode, cyclic_prefix, DVBTSynthesizer.DVBT_FS, freq_offset + 20)
+    signal = signal[TIME_OFFSET:]
+    symbols = np.concatenate([tracker.process(signal[start:start+10000]) for start in range(0, len(signal), 10000)]).reshape(-1, K)
+    assert len(symbols) == len(signal)//(FFT_len + CP_len)
+    assert abs(tracker.frequency_offset - freq_offset) < 2
+    assert abs(tracker.sampling_offset_ppm) < 5
+    # The phase of the continuous pilots is held at the first symbol's - the offset left adds no rotation
+    tables = MyDVBT.getPilotTables(K)
+    channel_at_pilots = symbols[:, tables.continuous_pilots_pos] / tables.continuous_pilots_values
+    phases = np.angle(np.sum(channel_at_pilots * np.conj(channel_at_pilots[0]), axis=1))
+    assert np.all(np.abs(phases) < 0.1)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+'''The streaming receive chain on synthetic captures (DVBTSynthesizer) split into blocks'''
+import numpy as np
+from dvbt_decoder import DVBTSynthesizer, Pipeline
+
+
+def splitIntoBlocks(signal, block_size):
+    return (signal[start:start + block_size] for start in range(0, len(signal), block_size))
+
+
+def test_receiveStream_does_not_depend_on_the_block_size():
+    (signal, fs) = DVBTSynthesizer.synthesizeDVBTSignal(2, 8, 1, snr_db=20, freq_offset=5000, time_offset=777, seed=28)
+    signal = signal[:200000]
+    results = []
+    for block_size in (4096, 50000, 123457):
+        (is_DVBT, mode, cyclic_prefix, equalized_blocks) = Pipeline.receiveStream(splitIntoBlocks(signal, block_size), fs, 8e6)
+        results.append((is_DVBT, mode, cyclic_prefix, np.concatenate(list(equalized_blocks))))
+
+    (is_DVBT, mode, cyclic_prefix, equalized_signal) = results[0]
+    assert (is_DVBT, mode, cyclic_prefix) == (True, 2, 8)
+    for result in results[1:]:
+        assert result[:3] == results[0][:3]
+        assert result[3].shape == equalized_signal.shape
+        assert np.allclose(result[3], equalized_signal, atol=1e-4)